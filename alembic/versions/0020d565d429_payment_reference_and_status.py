@@ -0,0 +1,38 @@
+"""payment reference and status
+
+Revision ID: 0020d565d429
+Revises: c207dc3ff9d1
+Create Date: 2026-10-19 14:32:40.771930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0020d565d429'
+down_revision: Union[str, None] = 'c207dc3ff9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('payment', sa.Column('reference', sa.String(length=255), nullable=True))
+    op.add_column(
+        'payment',
+        sa.Column(
+            'status',
+            sa.String(length=50),
+            nullable=False,
+            server_default='pending',
+        ),
+    )
+    op.create_unique_constraint('payment_reference_key', 'payment', ['reference'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('payment_reference_key', 'payment', type_='unique')
+    op.drop_column('payment', 'status')
+    op.drop_column('payment', 'reference')
@@ -0,0 +1,38 @@
+"""supplier search indexes
+
+Revision ID: 2550fba47e65
+Revises: cda2d6b3a08e
+Create Date: 2026-10-19 10:03:51.527334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2550fba47e65'
+down_revision: Union[str, None] = 'cda2d6b3a08e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_profiles_country_id_state_id',
+        'profiles',
+        ['country_id', 'state_id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_profiles_factory_capacity',
+        'profiles',
+        ['factory_capacity'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profiles_factory_capacity', table_name='profiles')
+    op.drop_index('ix_profiles_country_id_state_id', table_name='profiles')
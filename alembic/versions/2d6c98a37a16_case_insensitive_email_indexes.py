@@ -0,0 +1,67 @@
+"""case insensitive email indexes
+
+Revision ID: 2d6c98a37a16
+Revises: 2550fba47e65
+Create Date: 2026-10-19 11:41:27.904316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d6c98a37a16'
+down_revision: Union[str, None] = '2550fba47e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backfill: emails are stored lowercased from now on. Mixed-case duplicates in
+    # users would violate users_companyemail_key here and must be merged by hand.
+    op.execute(
+        "UPDATE users SET companyemail = lower(companyemail) "
+        "WHERE companyemail <> lower(companyemail)"
+    )
+    # The waitlist never had a unique constraint; keep the earliest signup per email.
+    op.execute(
+        "DELETE FROM waitlist w USING waitlist d "
+        "WHERE lower(w.workemail) = lower(d.workemail) "
+        "AND (w.createdat, w.id) > (d.createdat, d.id)"
+    )
+    op.execute(
+        "UPDATE waitlist SET workemail = lower(workemail) "
+        "WHERE workemail <> lower(workemail)"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_companyemail_lower',
+            'users',
+            [sa.text('lower(companyemail)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_waitlist_workemail_lower',
+            'waitlist',
+            [sa.text('lower(workemail)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_waitlist_workemail_lower',
+            table_name='waitlist',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_users_companyemail_lower',
+            table_name='users',
+            postgresql_concurrently=True,
+        )
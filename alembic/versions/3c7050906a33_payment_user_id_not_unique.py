@@ -0,0 +1,29 @@
+"""payment user_id not unique
+
+Revision ID: 3c7050906a33
+Revises: a3f1c9e0d6b4
+Create Date: 2026-10-19 19:05:41.530127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7050906a33'
+down_revision: Union[str, None] = 'a3f1c9e0d6b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_payment_user_id', 'payment', ['user_id'], unique=False)
+    op.drop_constraint('payment_user_id_key', 'payment', type_='unique')
+
+
+def downgrade() -> None:
+    # Fails if a user already has more than one payment.
+    op.create_unique_constraint('payment_user_id_key', 'payment', ['user_id'])
+    op.drop_index('ix_payment_user_id', table_name='payment')
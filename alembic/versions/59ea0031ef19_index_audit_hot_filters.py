@@ -0,0 +1,52 @@
+"""index audit for hot filters
+
+Revision ID: 59ea0031ef19
+Revises: 2d6c98a37a16
+Create Date: 2026-10-19 12:20:55.361870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '59ea0031ef19'
+down_revision: Union[str, None] = '2d6c98a37a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # waitlist.workemail is already covered by ix_waitlist_workemail_lower, which
+    # every waitlist lookup goes through.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_state_country_id',
+            'state',
+            ['country_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_product_user_id_id',
+            'product',
+            ['user_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_product_user_id_id',
+            table_name='product',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_state_country_id',
+            table_name='state',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,52 @@
+"""idempotency keys and payment webhooks
+
+Revision ID: 78ea26546bed
+Revises: 0020d565d429
+Create Date: 2026-10-19 15:10:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '78ea26546bed'
+down_revision: Union[str, None] = '0020d565d429'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_key',
+    sa.Column('id', postgresql.UUID(), nullable=False),
+    sa.Column('user_id', postgresql.UUID(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('response_body', sa.Text(), nullable=True),
+    sa.Column('createdat', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'key')
+    )
+    op.create_table('payment_webhook',
+    sa.Column('id', postgresql.UUID(), nullable=False),
+    sa.Column('event_id', sa.String(length=255), nullable=False),
+    sa.Column('reference', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('createdat', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('processedat', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id')
+    )
+    op.create_index('ix_payment_webhook_pending', 'payment_webhook', ['reference', 'createdat'], unique=False, postgresql_where=sa.text('processedat IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_webhook_pending', table_name='payment_webhook', postgresql_where=sa.text('processedat IS NULL'))
+    op.drop_table('payment_webhook')
+    op.drop_table('idempotency_key')
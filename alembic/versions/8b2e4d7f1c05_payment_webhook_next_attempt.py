@@ -0,0 +1,26 @@
+"""payment webhook next attempt
+
+Revision ID: 8b2e4d7f1c05
+Revises: 3c7050906a33
+Create Date: 2026-10-19 21:12:08.204519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d7f1c05'
+down_revision: Union[str, None] = '3c7050906a33'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('payment_webhook', sa.Column('nextattemptat', sa.TIMESTAMP(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('payment_webhook', 'nextattemptat')
@@ -0,0 +1,32 @@
+"""job watermark
+
+Revision ID: a3f1c9e0d6b4
+Revises: 78ea26546bed
+Create Date: 2026-10-19 16:02:51.208734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c9e0d6b4'
+down_revision: Union[str, None] = '78ea26546bed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('job_watermark',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('cursor', sa.String(length=255), nullable=True),
+    sa.Column('completedat', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('updatedat', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_watermark')
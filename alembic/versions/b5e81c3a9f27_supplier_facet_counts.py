@@ -0,0 +1,41 @@
+"""supplier facet counts
+
+Revision ID: b5e81c3a9f27
+Revises: 8b2e4d7f1c05
+Create Date: 2026-10-19 21:48:33.615072
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e81c3a9f27'
+down_revision: Union[str, None] = '8b2e4d7f1c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('supplier_facet',
+    sa.Column('country_id', postgresql.UUID(), nullable=False),
+    sa.Column('state_id', postgresql.UUID(), nullable=False),
+    sa.Column('product', sa.String(), nullable=False),
+    sa.Column('profiles', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['country_id'], ['country.id'], ),
+    sa.ForeignKeyConstraint(['state_id'], ['state.id'], ),
+    sa.PrimaryKeyConstraint('country_id', 'state_id', 'product')
+    )
+    op.execute(
+        "INSERT INTO supplier_facet (country_id, state_id, product, profiles) "
+        "SELECT country_id, state_id, product, count(DISTINCT id) "
+        "FROM profiles CROSS JOIN LATERAL unnest(products) AS product "
+        "GROUP BY country_id, state_id, product"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('supplier_facet')
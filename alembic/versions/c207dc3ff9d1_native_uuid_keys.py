@@ -0,0 +1,193 @@
+"""native uuid primary and foreign keys
+
+Revision ID: c207dc3ff9d1
+Revises: 59ea0031ef19
+Create Date: 2026-10-19 13:05:12.640981
+
+The conversion runs online so the site stays up:
+
+1. Add a nullable `<column>_uuid` shadow column for every key column, a NOT VALID
+   `IS NOT NULL` check on it, and a trigger that keeps it in sync on writes.
+2. Backfill the shadow columns in small autocommitted batches, validate the
+   checks and build the future primary key, unique and secondary indexes
+   concurrently.
+3. In one short transaction, swap the shadow columns in: drop the text columns
+   (which drops their constraints), rename, and attach the prebuilt indexes as
+   constraints. Foreign keys are re-added NOT VALID.
+4. Validate the foreign keys without blocking writes.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c207dc3ff9d1'
+down_revision: Union[str, None] = '59ea0031ef19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+# Parents come before the tables referencing them.
+KEY_COLUMNS = {
+    'users': ['id'],
+    'country': ['id'],
+    'state': ['id', 'country_id'],
+    'allproducts': ['id'],
+    'profiles': ['id', 'user_id', 'country_id', 'state_id'],
+    'payment': ['id', 'user_id'],
+    'product': ['id', 'user_id'],
+    'waitlist': ['id', 'country_id', 'state_id'],
+}
+
+FOREIGN_KEYS = [
+    ('state', 'country_id', 'country'),
+    ('profiles', 'user_id', 'users'),
+    ('profiles', 'country_id', 'country'),
+    ('profiles', 'state_id', 'state'),
+    ('payment', 'user_id', 'users'),
+    ('product', 'user_id', 'users'),
+    ('waitlist', 'country_id', 'country'),
+    ('waitlist', 'state_id', 'state'),
+]
+
+UNIQUE_COLUMNS = [
+    ('profiles', 'user_id'),
+    ('payment', 'user_id'),
+    ('product', 'user_id'),
+]
+
+INDEXES = [
+    ('ix_state_country_id', 'state', ['country_id']),
+    ('ix_profiles_country_id_state_id', 'profiles', ['country_id', 'state_id']),
+    ('ix_product_user_id_id', 'product', ['user_id', 'id']),
+]
+
+# Original types, for the downgrade.
+TEXT_TYPES = {
+    'id': 'VARCHAR',
+    'user_id': 'VARCHAR',
+    'country_id': 'VARCHAR(255)',
+    'state_id': 'VARCHAR(255)',
+}
+
+
+def _add_shadow_columns(table, columns):
+    for column in columns:
+        op.execute(f'ALTER TABLE {table} ADD COLUMN {column}_uuid uuid')
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_uuid_not_null '
+            f'CHECK ({column}_uuid IS NOT NULL) NOT VALID'
+        )
+    assignments = ' '.join(
+        f'NEW.{column}_uuid := NEW.{column}::uuid;' for column in columns
+    )
+    op.execute(
+        f'CREATE FUNCTION {table}_uuid_sync() RETURNS trigger AS $$ '
+        f'BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    op.execute(
+        f'CREATE TRIGGER {table}_uuid_sync BEFORE INSERT OR UPDATE ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION {table}_uuid_sync()'
+    )
+
+
+def _backfill(bind, table, columns):
+    assignments = ', '.join(f'{column}_uuid = {column}::uuid' for column in columns)
+    statement = sa.text(
+        f'UPDATE {table} SET {assignments} WHERE ctid = ANY(ARRAY('
+        f'SELECT ctid FROM {table} WHERE id_uuid IS NULL LIMIT :batch_size))'
+    )
+    while bind.execute(statement, {'batch_size': BATCH_SIZE}).rowcount:
+        pass
+
+
+def _swap_columns(table, columns):
+    op.execute(f'DROP TRIGGER {table}_uuid_sync ON {table}')
+    op.execute(f'DROP FUNCTION {table}_uuid_sync()')
+    for column in columns:
+        # Uses the validated check constraint, so no table scan under the lock.
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column}_uuid SET NOT NULL')
+        op.execute(
+            f'ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_uuid_not_null'
+        )
+        op.execute(f'ALTER TABLE {table} DROP COLUMN {column} CASCADE')
+        op.execute(f'ALTER TABLE {table} RENAME COLUMN {column}_uuid TO {column}')
+    op.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey '
+        f'PRIMARY KEY USING INDEX {table}_id_uuid_key'
+    )
+
+
+def upgrade() -> None:
+    for table, columns in KEY_COLUMNS.items():
+        _add_shadow_columns(table, columns)
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for table, columns in KEY_COLUMNS.items():
+            _backfill(bind, table, columns)
+            for column in columns:
+                op.execute(
+                    f'ALTER TABLE {table} VALIDATE CONSTRAINT '
+                    f'{table}_{column}_uuid_not_null'
+                )
+            op.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY {table}_id_uuid_key '
+                f'ON {table} (id_uuid)'
+            )
+        for table, column in UNIQUE_COLUMNS:
+            op.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY {table}_{column}_uuid_key '
+                f'ON {table} ({column}_uuid)'
+            )
+        for name, table, columns in INDEXES:
+            shadow_columns = ', '.join(f'{column}_uuid' for column in columns)
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY {name}_uuid ON {table} ({shadow_columns})'
+            )
+
+    op.execute(
+        f'LOCK TABLE {", ".join(KEY_COLUMNS)} IN ACCESS EXCLUSIVE MODE'
+    )
+    for table, columns in KEY_COLUMNS.items():
+        _swap_columns(table, columns)
+    for table, column in UNIQUE_COLUMNS:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_key '
+            f'UNIQUE USING INDEX {table}_{column}_uuid_key'
+        )
+    for name, table, columns in INDEXES:
+        op.execute(f'ALTER INDEX {name}_uuid RENAME TO {name}')
+    for table, column, referred in FOREIGN_KEYS:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES {referred} (id) NOT VALID'
+        )
+
+    with op.get_context().autocommit_block():
+        for table, column, referred in FOREIGN_KEYS:
+            op.execute(
+                f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey'
+            )
+
+
+def downgrade() -> None:
+    # Not online: rewrites every table under lock, which is acceptable for a rollback.
+    for table, column, referred in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_fkey')
+    for table, columns in KEY_COLUMNS.items():
+        for column in columns:
+            op.execute(
+                f'ALTER TABLE {table} ALTER COLUMN {column} '
+                f'TYPE {TEXT_TYPES[column]} USING {column}::text'
+            )
+    for table, column, referred in FOREIGN_KEYS:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES {referred} (id)'
+        )
@@ -0,0 +1,51 @@
+"""profile products to native array
+
+Revision ID: cda2d6b3a08e
+Revises: d475837d79c1
+Create Date: 2026-10-19 09:12:04.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cda2d6b3a08e'
+down_revision: Union[str, None] = 'd475837d79c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The column holds Postgres array literals such as '{HDPE,"Cold Washed Flakes"}',
+    # so a plain cast parses them (including quoted elements) into text[].
+    op.alter_column(
+        'profiles',
+        'products',
+        existing_type=sa.String(length=255),
+        type_=postgresql.ARRAY(sa.String()),
+        existing_nullable=False,
+        postgresql_using='products::text[]',
+    )
+    op.create_index(
+        'ix_profiles_products',
+        'profiles',
+        ['products'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profiles_products', table_name='profiles', postgresql_using='gin')
+    op.alter_column(
+        'profiles',
+        'products',
+        existing_type=postgresql.ARRAY(sa.String()),
+        type_=sa.String(length=255),
+        existing_nullable=False,
+        postgresql_using='products::text',
+    )
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import math
+import random
+from typing import List, Optional
+
+from sqlalchemy import func, select
+
+from .database import SessionLocal, advisory_lock
+from ..models import models
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits before retrying while another one rebuilds a filter.
+REBUILD_RETRY_SECONDS = (1.0, 5.0)
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over strings, backed by a bytearray.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class EmailPrefilter:
+    """
+    Answers "might this email already exist?" for one email column without a query.
+
+    A miss is definite, so callers can skip their existence check; a hit still needs
+    the database. Until the first build finishes every email is reported as a
+    possible hit. Inserts made by other workers are only picked up by the periodic
+    rebuild, so callers must still rely on the unique index for correctness.
+    """
+
+    def __init__(self, column, error_rate: float = 0.01):
+        self.column = column
+        self.cache_name = f"{column.table.name}_email_prefilter"
+        self.error_rate = error_rate
+        self.checks = 0
+        self.misses = 0
+        self._filter: Optional[BloomFilter] = None
+        self._added_during_build: Optional[List[str]] = None
+
+    def might_exist(self, email: str) -> bool:
+        """
+        Checks whether the email may already be stored.
+
+        Args:
+            email (str): The email address.
+
+        Returns:
+            bool: False if the email is definitely not stored, True otherwise.
+        """
+        self.checks += 1
+        if self._filter is None or email.lower() in self._filter:
+            # Counted as a cache miss: the caller still has to query the database.
+            metrics.cache_requests.inc(self.cache_name, "miss")
+            return True
+        self.misses += 1
+        metrics.cache_requests.inc(self.cache_name, "hit")
+        return False
+
+    def add(self, email: str):
+        """
+        Records a newly inserted email.
+
+        Args:
+            email (str): The email address.
+        """
+        email = email.lower()
+        if self._added_during_build is not None:
+            self._added_during_build.append(email)
+        if self._filter is not None:
+            self._filter.add(email)
+
+    def _build(self) -> BloomFilter:
+        with SessionLocal() as db:
+            total = db.scalar(select(func.count()).select_from(self.column.table))
+            bloom = BloomFilter(
+                capacity=max(total * 2, 1024), error_rate=self.error_rate
+            )
+            rows = db.execute(
+                select(func.lower(self.column)).execution_options(yield_per=5000)
+            )
+            for (email,) in rows:
+                bloom.add(email)
+        return bloom
+
+    async def rebuild(self):
+        """
+        Rebuilds the filter from a streaming query and swaps it in.
+
+        Emails added while the query runs are replayed into the new filter.
+        """
+        self._added_during_build = []
+        try:
+            bloom = await asyncio.to_thread(self._build)
+            for email in self._added_during_build:
+                bloom.add(email)
+            self._filter = bloom
+        finally:
+            self._added_during_build = None
+
+    def stats(self) -> dict:
+        """
+        Returns the size and effectiveness of the filter.
+        """
+        bloom = self._filter
+        return {
+            "entries": bloom.count if bloom else 0,
+            "memory_bytes": bloom.memory_bytes if bloom else 0,
+            "false_positive_rate": bloom.false_positive_rate if bloom else 1.0,
+            "checks": self.checks,
+            "definite_misses": self.misses,
+        }
+
+
+async def rebuild_periodically(prefilters: List[EmailPrefilter], interval: float):
+    """
+    Rebuilds the given prefilters now and then every `interval` seconds.
+
+    Each worker keeps its own filters, so every worker rebuilds them, but a
+    per-filter advisory lock lets only one worker scan a table at a time; the
+    others retry a few seconds later.
+
+    Args:
+        prefilters (List[EmailPrefilter]): The prefilters to rebuild.
+        interval (float): The number of seconds between rebuilds.
+    """
+    while True:
+        for prefilter in prefilters:
+            try:
+                await _rebuild_exclusively(prefilter)
+            except Exception:
+                logger.exception("Rebuilding the %s prefilter failed", prefilter.column)
+        await asyncio.sleep(interval)
+
+
+async def _rebuild_exclusively(prefilter: EmailPrefilter):
+    while True:
+        async with advisory_lock(prefilter.cache_name) as locked:
+            if locked:
+                await prefilter.rebuild()
+                return
+        await asyncio.sleep(random.uniform(*REBUILD_RETRY_SECONDS))
+
+
+user_emails = EmailPrefilter(models.User.companyemail)
+waitlist_emails = EmailPrefilter(models.Waitlist.workemail)
+
+prefilters = [user_emails, waitlist_emails]
+
+
+def _prefilter_stat(name: str):
+    def samples():
+        for prefilter in prefilters:
+            yield (prefilter.column.table.name,), prefilter.stats()[name]
+
+    return samples
+
+
+metrics.Gauge(
+    "email_prefilter_memory_bytes",
+    "Memory held by the bit array of each email prefilter.",
+    ["table"],
+    function=_prefilter_stat("memory_bytes"),
+)
+metrics.Gauge(
+    "email_prefilter_false_positive_rate",
+    "Estimated false positive rate of each email prefilter at its current fill.",
+    ["table"],
+    function=_prefilter_stat("false_positive_rate"),
+)
@@ -0,0 +1,349 @@
+"""
+Two-tier read cache shared by every worker process.
+
+Each namespace (users, profiles, products, countries, states, suppliers) has an
+in-process LRU with a TTL as its first tier. When CACHE_REDIS_URL is set, a
+Redis server (or anything speaking its protocol) is the second tier, so a value
+loaded by one Uvicorn worker is served to the others without a query.
+
+Writes in crud.py call `notify()` inside their transaction. It sends a Postgres
+NOTIFY on the cache_invalidation channel, which is delivered when the
+transaction commits. Every worker runs an InvalidationListener holding a
+LISTEN connection; on each notification it drops the key from its own LRU and
+from the shared tier. A read that races a write can still store the old value,
+so CACHE_TTL_SECONDS bounds how stale an entry can get. Cached values are shared
+between requests and must be treated as read-only.
+"""
+import asyncio
+import collections
+import json
+import logging
+import select
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import engine
+from .responses import orjson_default
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+MISSING = object()
+
+cache_shared_requests = metrics.Counter(
+    "cache_shared_requests",
+    "Lookups in the shared second cache tier after a local miss, by namespace and result.",
+    ["cache", "result"],
+)
+cache_invalidations = metrics.Counter(
+    "cache_invalidations",
+    "Invalidation notifications applied, by namespace.",
+    ["cache"],
+)
+
+
+class LocalTier:
+    """
+    A thread-safe LRU of at most `maxsize` entries, each expiring after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedTier:
+    """
+    The second tier, on a client with the redis-py interface (get, set, delete, scan_iter).
+
+    The client is synchronous, so `Cache` calls these methods through
+    `asyncio.to_thread` to keep the round trips off the event loop; the
+    invalidation listener calls them from its own thread. Values are stored as JSON, so they come back with UUIDs, datetimes and Decimals
+    as strings and floats; callers pass them through their response schema, which
+    parses them again. The shared tier is best effort: any error from the client
+    is counted and treated as a miss, so an unreachable server only costs the
+    round trip.
+    """
+
+    def __init__(self, client, ttl: int, prefix: str = "revas:cache"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Any:
+        try:
+            raw = self.client.get(self._key(namespace, key))
+        except Exception:
+            cache_shared_requests.inc(namespace, "error")
+            return MISSING
+        if raw is None:
+            cache_shared_requests.inc(namespace, "miss")
+            return MISSING
+        cache_shared_requests.inc(namespace, "hit")
+        return orjson.loads(raw)
+
+    def set(self, namespace: str, key: str, value: Any):
+        try:
+            self.client.set(
+                self._key(namespace, key),
+                orjson.dumps(value, default=orjson_default),
+                ex=self.ttl,
+            )
+        except Exception:
+            cache_shared_requests.inc(namespace, "error")
+
+    def delete(self, namespace: str, key: Optional[str] = None):
+        try:
+            if key is not None:
+                self.client.delete(self._key(namespace, key))
+                return
+            keys = list(self.client.scan_iter(match=self._key(namespace, "*")))
+            if keys:
+                self.client.delete(*keys)
+        except Exception:
+            cache_shared_requests.inc(namespace, "error")
+
+
+def _shared_tier_from_settings() -> Optional[SharedTier]:
+    if not settings.CACHE_REDIS_URL:
+        return None
+    import redis
+
+    client = redis.Redis.from_url(
+        settings.CACHE_REDIS_URL, socket_timeout=0.1, socket_connect_timeout=0.1
+    )
+    return SharedTier(client, settings.CACHE_TTL_SECONDS)
+
+
+shared_tier = _shared_tier_from_settings()
+
+caches: Dict[str, "Cache"] = {}
+
+
+class Cache:
+    """
+    One cache namespace: the local LRU in front of the optional shared tier.
+
+    Lookups are counted in `cache_requests_total` under the namespace; a value
+    found in either tier is a hit.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 1024):
+        self.namespace = namespace
+        self.local = LocalTier(maxsize, settings.CACHE_TTL_SECONDS)
+        self._subscribers: List[Callable[[Optional[str]], None]] = []
+        caches[namespace] = self
+
+    async def get(self, key: str) -> Any:
+        """
+        Returns the cached value for `key`, or MISSING.
+        """
+        value = self.local.get(key)
+        if value is MISSING and shared_tier is not None:
+            value = await asyncio.to_thread(shared_tier.get, self.namespace, key)
+            if value is not MISSING:
+                self.local.set(key, value)
+        metrics.cache_requests.inc(
+            self.namespace, "miss" if value is MISSING else "hit"
+        )
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if shared_tier is not None:
+            await asyncio.to_thread(shared_tier.set, self.namespace, key, value)
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value for `key`, awaiting `load()` and caching its result on a miss.
+
+        None results are not cached, so a row created later is found at once.
+        """
+        value = await self.get(key)
+        if value is MISSING:
+            value = await load()
+            if value is not None:
+                await self.set(key, value)
+        return value
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]):
+        """
+        Calls `callback(key)` whenever this namespace receives an invalidation.
+
+        For in-process caches kept outside this module, such as the reference ids.
+        The key is None when the whole namespace is invalidated.
+        """
+        self._subscribers.append(callback)
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        Drops `key`, or the whole namespace when no key is given, from both tiers.
+        """
+        if key is None:
+            self.local.clear()
+        else:
+            self.local.delete(key)
+        if shared_tier is not None:
+            shared_tier.delete(self.namespace, key)
+        for callback in self._subscribers:
+            callback(key)
+        cache_invalidations.inc(self.namespace)
+
+
+users = Cache("users", maxsize=10000)
+profiles = Cache("profiles", maxsize=5000)
+products = Cache("products", maxsize=5000)
+countries = Cache("countries", maxsize=16)
+states = Cache("states", maxsize=512)
+suppliers = Cache("suppliers", maxsize=1024)
+
+
+def notify(db: Session, namespace: str, key: Optional[str] = None):
+    """
+    Queues an invalidation of `key` (or the whole namespace) for every worker.
+
+    Call it inside the writing transaction, before the commit: Postgres delivers
+    the notification only if the transaction commits. The entry is also dropped
+    from this process at once.
+
+    Args:
+        db (Session): The session of the writing transaction.
+        namespace (str): The cache namespace, e.g. "profiles".
+        key (str, optional): The key to drop. Defaults to the whole namespace.
+    """
+    payload = json.dumps({"namespace": namespace, "key": key})
+    db.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+    if key is None:
+        caches[namespace].local.clear()
+    else:
+        caches[namespace].local.delete(key)
+
+
+def _dispatch(payload: str):
+    try:
+        message = json.loads(payload)
+        cache = caches[message["namespace"]]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed cache invalidation %r", payload)
+        return
+    cache.invalidate(message.get("key"))
+
+
+class InvalidationListener:
+    """
+    Daemon thread applying invalidations sent on the cache_invalidation channel.
+
+    It holds one connection of its own, detached from the engine's pool. If the
+    connection drops, notifications sent meanwhile are lost, so every local tier
+    is cleared before listening again.
+    """
+
+    def __init__(self, poll_seconds: float = 1.0, retry_seconds: float = 5.0):
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cache-invalidation", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _connect(self):
+        connection = engine.raw_connection()
+        connection.detach()
+        dbapi_connection = connection.dbapi_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return dbapi_connection
+
+    def _run(self):
+        reconnecting = False
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                if reconnecting:
+                    for cache in caches.values():
+                        cache.local.clear()
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], self.poll_seconds)[0]:
+                        connection.poll()
+                        while connection.notifies:
+                            _dispatch(connection.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Cache invalidation listener failed; reconnecting")
+                reconnecting = True
+                self._stop.wait(self.retry_seconds)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+cache_listener = InvalidationListener()
+
+
+def _cache_entries():
+    for namespace, cache in sorted(caches.items()):
+        yield (namespace,), len(cache.local)
+
+
+cache_entries = metrics.Gauge(
+    "cache_entries",
+    "Entries held in the local tier of each cache namespace.",
+    ["cache"],
+    function=_cache_entries,
+)
@@ -0,0 +1,184 @@
+"""
+Adaptive concurrency limits per route class, with fast load shedding.
+
+Requests are sorted into classes by path and method: auth_cpu (the bcrypt
+routes), db_write, db_read and static (docs and schema). Each class has a limit
+on requests in flight that adapts with AIMD: while requests finish under the
+class's target latency and without a server error, the limit grows by about one
+per `limit` requests; when one is slower or fails, the limit is cut by
+BACKOFF, at most once per cooldown so a single slow batch does not collapse
+it. A request arriving with its class at the limit gets 503 at once, with
+Retry-After: 1, instead of queueing for a database connection.
+
+/api/check and /metrics are never limited, so health checks and scrapes still
+answer under overload.
+"""
+import time
+from typing import Dict, Optional
+
+from .config import settings
+from . import metrics
+
+
+PRIORITY_PATHS = frozenset(("/api/check", "/metrics"))
+STATIC_PATHS = frozenset(("/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"))
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+BACKOFF = 0.9
+
+concurrency_rejected = metrics.Counter(
+    "concurrency_rejected_requests",
+    "Requests shed with 503 because their route class was at its concurrency limit.",
+    ["route_class"],
+)
+
+
+class AIMDLimiter:
+    """
+    An additive-increase, multiplicative-decrease limit on concurrent requests.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        target_latency: float,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: float, failed: bool):
+        """
+        Frees the slot and adjusts the limit from the request's outcome.
+        """
+        self.in_flight -= 1
+        if failed or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.limit = max(self.minimum, self.limit * BACKOFF)
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow while the limit is actually reached; idle classes keep theirs.
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+limiters: Dict[str, AIMDLimiter] = {
+    "auth_cpu": AIMDLimiter(initial=8, minimum=2, maximum=32, target_latency=0.75),
+    "db_write": AIMDLimiter(initial=20, minimum=4, maximum=100, target_latency=0.5),
+    "db_read": AIMDLimiter(initial=40, minimum=4, maximum=200, target_latency=0.25),
+    "static": AIMDLimiter(initial=20, minimum=2, maximum=100, target_latency=0.1),
+}
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """
+    Returns the route class of a request, or None for priority traffic.
+    """
+    if path in PRIORITY_PATHS:
+        return None
+    if path in STATIC_PATHS:
+        return "static"
+    if path.startswith("/api/auths/") and method == "POST":
+        return "auth_cpu"
+    if method in WRITE_METHODS:
+        return "db_write"
+    return "db_read"
+
+
+concurrency_limit = metrics.Gauge(
+    "concurrency_limit",
+    "Current adaptive limit on requests in flight, by route class.",
+    ["route_class"],
+    function=lambda: [((name,), limiter.limit) for name, limiter in limiters.items()],
+)
+concurrency_in_flight = metrics.Gauge(
+    "concurrency_in_flight",
+    "Requests in flight, by route class.",
+    ["route_class"],
+    function=lambda: [
+        ((name,), limiter.in_flight) for name, limiter in limiters.items()
+    ],
+)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI middleware holding each request to its route class's concurrency limit.
+
+    Latency is sampled, and the slot freed, when the last chunk of the response
+    body is sent, so background tasks that run afterwards (such as the signup
+    email) neither count towards it nor hold the slot. Responses with a 5xx
+    status count as failures.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.CONCURRENCY_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        limiter = limiters.get(name)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not limiter.try_acquire():
+            concurrency_rejected.inc(name)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"retry-after", b"1"),
+                    ],
+                }
+            )
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b'{"detail":"Server is busy, please try again shortly"}',
+                }
+            )
+            return
+
+        status_code = 500
+        released = False
+        started = time.perf_counter()
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                limiter.release(time.perf_counter() - started, status_code >= 500)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # No complete response was sent, e.g. the app raised.
+            release()
@@ -6,6 +6,7 @@ from pydantic import EmailStr, BaseSettings
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Revas Exchange"
     PROJECT_VERSION: str = "1.0.0"
+    ENVIRONMENT: str = "production"
 
     DATABASE_PORT: int
     POSTGRES_PASSWORD: str
@@ -29,6 +30,44 @@ class Settings(BaseSettings):
     MAIL_PASSWORD: str
     MAIL_FROM: EmailStr
 
+    EMAIL_PREFILTER_REBUILD_SECONDS: int = 3600
+
+    ADMIN_TOKEN: str = ""
+    SERVER_TIMING_ENABLED: bool = False
+    PROFILER_INTERVAL_MS: float = 5.0
+
+    TRACE_EXPORTER: str = "none"
+    TRACE_FILE: str = "traces.jsonl"
+    TRACE_SAMPLE_RATE: float = 0.01
+
+    SLOW_QUERY_MS: float = 200.0
+
+    CACHE_TTL_SECONDS: int = 60
+    CACHE_REDIS_URL: str = ""
+
+    RATE_LIMIT_ENABLED: bool = True
+    TRUSTED_PROXY_HOPS: int = 0
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+
+    PEPPEREST_BASE_URL: str = "http://v2.pepperest.com/EscrowBackend/api/ThirdParty"
+    PEPPEREST_API_KEY: str = ""
+    PEPPEREST_TIMEOUT_SECONDS: float = 10.0
+    PEPPEREST_WEBHOOK_SECRET: str = ""
+
+    IDEMPOTENCY_CLAIM_TTL_SECONDS: int = 300
+
+    WEBHOOK_POLL_SECONDS: float = 1.0
+    WEBHOOK_BATCH_SIZE: int = 100
+    WEBHOOK_UNMATCHED_MAX_AGE_SECONDS: int = 86400
+
+    WAITLIST_MAX_PENDING: int = 10000
+
+    RECONCILE_INTERVAL_SECONDS: int = 900
+    RECONCILE_FULL_SWEEP_SECONDS: int = 86400
+    RECONCILE_PAGE_SIZE: int = 200
+    RECONCILE_CONCURRENCY: int = 10
+    RECONCILE_RATE_PER_SECOND: float = 20.0
+
     class Config:
         env_file = "./.env"
 
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from .config import settings
+from . import metrics, timing, tracing
+from .querylog import query_log
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
 # SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -11,7 +18,53 @@ SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POST
 #     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 # )  # only needed for sqlite
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.db_pool_wait.observe(time.perf_counter() - started)
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_span"] = tracing.start_span(
+        "db.query", **{"db.statement": statement[:1000]}
+    )
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"]
+    metrics.db_query_duration.observe(elapsed)
+    query_log.record(statement, parameters, elapsed)
+    timing.record("db", elapsed)
+    span = conn.info.pop("query_span", None)
+    if span is not None:
+        span.end()
+    stats = metrics.current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    span = context.connection.info.pop("query_span", None)
+    if span is not None:
+        span.error = context.original_exception.__class__.__name__
+        span.end()
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -27,3 +80,40 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# The first key of the two-key advisory locks taken by `advisory_lock`, so job
+# locks never collide with the single-key locks taken on payment references.
+JOB_LOCK_CLASS = 1
+
+
+@asynccontextmanager
+async def advisory_lock(name: str):
+    """
+    Tries to take a cross-worker lock named `name` for the `async with` block.
+
+    Yields True if this process holds the lock and False if another one does.
+    The lock is a session-level Postgres advisory lock held on a dedicated
+    connection; it is released when the block exits, or by Postgres if the
+    process dies.
+    """
+    key = (JOB_LOCK_CLASS, func.hashtext(name))
+    connection = await asyncio.to_thread(engine.connect)
+    locked = False
+    try:
+        locked = await asyncio.to_thread(
+            connection.scalar, select(func.pg_try_advisory_lock(*key))
+        )
+        yield locked
+    finally:
+        try:
+            if locked:
+                await asyncio.to_thread(
+                    connection.scalar, select(func.pg_advisory_unlock(*key))
+                )
+        except Exception:
+            # A pooled connection must not keep holding the lock.
+            connection.invalidate()
+            raise
+        finally:
+            await asyncio.to_thread(connection.close)
@@ -0,0 +1,56 @@
+import hashlib
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from ..models import crud
+
+
+def request_hash(body: BaseModel) -> str:
+    """
+    Returns a stable hash of a request body, used to detect a reused key.
+    """
+    return hashlib.sha256(body.json(sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def claim_or_replay(
+    db: Session, user_id: str, key: str, body: BaseModel
+) -> Optional[Response]:
+    """
+    Claims an idempotency key, or returns the stored response of its first use.
+
+    Args:
+        db (Session): The database session.
+        user_id (str): The ID of the user sending the request.
+        key (str): The client-supplied Idempotency-Key header.
+        body (BaseModel): The request body.
+
+    Returns:
+        Response or None: The cached response if the key was already used, or None if the caller now owns the key.
+
+    Raises:
+        HTTPException 422: If the key was used with a different request body.
+        HTTPException 409: If the first request with this key is still in progress and its claim has not expired.
+    """
+    fingerprint = request_hash(body)
+    if await crud.claim_idempotency_key(db, user_id, key, fingerprint):
+        return None
+
+    existing = await crud.get_idempotency_key(db, user_id, key)
+    if existing is not None and existing.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    if existing is None or existing.status_code is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress",
+        )
+    return Response(
+        content=existing.response_body,
+        status_code=existing.status_code,
+        media_type="application/json",
+    )
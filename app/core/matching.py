@@ -0,0 +1,275 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import models
+from . import cache, metrics
+
+
+MATERIAL_WEIGHT = 0.6
+COUNTRY_WEIGHT = 0.2
+STATE_WEIGHT = 0.1
+CAPACITY_WEIGHT = 0.1
+MAX_SUGGESTIONS = 50
+
+
+@dataclass(frozen=True)
+class ProfileFeatures:
+    id: str
+    user_id: str
+    role: str
+    products: FrozenSet[str]
+    country_id: str
+    state_id: str
+    factory_capacity: float
+
+
+def _features(profile) -> ProfileFeatures:
+    """
+    Extracts the matching features from a profile row joined with its user's role.
+    """
+    return ProfileFeatures(
+        id=str(profile.id),
+        user_id=str(profile.user_id),
+        role=profile.role,
+        products=frozenset(profile.products or ()),
+        country_id=str(profile.country_id),
+        state_id=str(profile.state_id),
+        factory_capacity=float(profile.factory_capacity or 0),
+    )
+
+
+class MatchIndex:
+    """
+    In-process inverted index from material to profiles, used to suggest counterparties.
+
+    Only profiles whose user has the other role are suggested: buyers get
+    suppliers and suppliers get buyers.
+
+    The index is loaded at startup (or on first use) and then kept current
+    incrementally. Profiles created, edited or deleted here, and those named by
+    other workers' invalidations of the profiles cache namespace, are marked
+    stale and reread, in one query, before the next suggestions are served.
+    Suggestions are cached per profile and a cached list is only dropped when a
+    profile sharing a material with it changes.
+
+    Loading and rereading query the database, so `suggestions()` is meant to
+    run in a worker thread; `_lock` serializes the threads using the index.
+    """
+
+    def __init__(self):
+        self._profiles: Dict[str, ProfileFeatures] = {}
+        self._by_material: Dict[str, Set[str]] = {}
+        self._suggestions: Dict[str, List[dict]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Written by the event loop and the cache invalidation thread.
+        self._stale: Set[str] = set()
+        self._stale_lock = threading.Lock()
+
+    def _select(self):
+        return select(
+            models.Profile.id,
+            models.Profile.user_id,
+            models.User.role,
+            models.Profile.products,
+            models.Profile.country_id,
+            models.Profile.state_id,
+            models.Profile.factory_capacity,
+        ).join(models.User, models.User.id == models.Profile.user_id)
+
+    def load(self, db: Session):
+        """
+        Builds the index from every profile in the database.
+
+        Args:
+            db (Session): The database session.
+        """
+        with self._lock:
+            self._load(db)
+
+    def _load(self, db: Session):
+        with self._stale_lock:
+            self._stale.clear()
+        rows = db.execute(self._select())
+        self._profiles.clear()
+        self._by_material.clear()
+        self._suggestions.clear()
+        for row in rows:
+            self._add(_features(row))
+        self._loaded = True
+
+    def _add(self, features: ProfileFeatures):
+        self._profiles[features.id] = features
+        for material in features.products:
+            self._by_material.setdefault(material, set()).add(features.id)
+
+    def _discard(self, profile_id: str) -> Optional[ProfileFeatures]:
+        features = self._profiles.pop(profile_id, None)
+        if features:
+            for material in features.products:
+                holders = self._by_material.get(material)
+                if holders:
+                    holders.discard(profile_id)
+                    if not holders:
+                        del self._by_material[material]
+        return features
+
+    def _invalidate(self, profile_id: str, products: FrozenSet[str]):
+        self._suggestions.pop(profile_id, None)
+        for material in products:
+            for other_id in self._by_material.get(material, ()):
+                self._suggestions.pop(other_id, None)
+
+    def upsert(self, profile):
+        """
+        Marks a profile as created or edited, to be reread with its user's role.
+
+        Args:
+            profile (models.Profile): The profile as stored in the database.
+        """
+        self.invalidate(str(profile.id))
+
+    def remove(self, profile_id: str):
+        """
+        Marks a deleted profile, to be dropped from the index.
+
+        Args:
+            profile_id (str): The ID of the deleted profile.
+        """
+        self.invalidate(str(profile_id))
+
+    def invalidate(self, profile_id: Optional[str] = None):
+        """
+        Marks a profile, or the whole index when no ID is given, as changed elsewhere.
+
+        Subscribed to the profiles cache namespace, so it also runs on the cache
+        invalidation thread; the rows are reread on the next call to suggestions().
+
+        Args:
+            profile_id (str, optional): The ID of the changed profile. Defaults to all profiles.
+        """
+        with self._stale_lock:
+            if profile_id is None:
+                self._loaded = False
+            elif self._loaded:
+                self._stale.add(profile_id)
+
+    def _refresh(self, db: Session):
+        with self._stale_lock:
+            stale, self._stale = self._stale, set()
+        if not stale:
+            return
+        rows = {
+            str(row.id): row
+            for row in db.execute(
+                self._select().where(models.Profile.id.in_(list(stale)))
+            )
+        }
+        for profile_id in stale:
+            previous = self._discard(profile_id)
+            if previous:
+                self._invalidate(previous.id, previous.products)
+            row = rows.get(profile_id)
+            if row is not None:
+                features = _features(row)
+                self._add(features)
+                self._invalidate(features.id, features.products)
+
+    def _score(self, target: ProfileFeatures, limit: int) -> List[dict]:
+        overlap: Dict[str, int] = {}
+        for material in target.products:
+            for other_id in self._by_material.get(material, ()):
+                if self._profiles[other_id].role != target.role:
+                    overlap[other_id] = overlap.get(other_id, 0) + 1
+        if not overlap:
+            return []
+
+        candidates = [self._profiles[other_id] for other_id in overlap]
+        shared = np.fromiter(overlap.values(), dtype=np.float64, count=len(overlap))
+        sizes = np.fromiter(
+            (len(c.products) for c in candidates), dtype=np.float64, count=len(overlap)
+        )
+        same_country = np.fromiter(
+            (c.country_id == target.country_id for c in candidates),
+            dtype=np.float64,
+            count=len(overlap),
+        )
+        same_state = np.fromiter(
+            (c.state_id == target.state_id for c in candidates),
+            dtype=np.float64,
+            count=len(overlap),
+        )
+        capacity = np.fromiter(
+            (c.factory_capacity for c in candidates),
+            dtype=np.float64,
+            count=len(overlap),
+        )
+
+        jaccard = shared / (len(target.products) + sizes - shared)
+        larger = np.maximum(capacity, target.factory_capacity)
+        capacity_fit = np.divide(
+            np.minimum(capacity, target.factory_capacity),
+            larger,
+            out=np.zeros_like(larger),
+            where=larger > 0,
+        )
+        scores = (
+            MATERIAL_WEIGHT * jaccard
+            + COUNTRY_WEIGHT * same_country
+            + STATE_WEIGHT * same_country * same_state
+            + CAPACITY_WEIGHT * capacity_fit
+        )
+
+        k = min(limit, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "profile_id": candidates[i].id,
+                "user_id": candidates[i].user_id,
+                "score": round(float(scores[i]), 4),
+                "shared_products": sorted(candidates[i].products & target.products),
+            }
+            for i in top
+        ]
+
+    def suggestions(self, db: Session, profile_id: str, limit: int = 10):
+        """
+        Returns the suggested counterparties for a profile.
+
+        Blocks on the database when the index is not loaded or has stale
+        profiles, so call it from a worker thread.
+
+        Args:
+            db (Session): The database session, used to load or refresh the index.
+            profile_id (str): The ID of the profile to suggest counterparties for.
+            limit (int, optional): The maximum number of suggestions, at most MAX_SUGGESTIONS. Defaults to 10.
+
+        Returns:
+            List[dict] or None: The suggestions ranked by score, or None if the profile does not exist.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+            else:
+                self._refresh(db)
+            target = self._profiles.get(str(profile_id))
+            if target is None:
+                return None
+            cached = self._suggestions.get(target.id)
+            if cached is None:
+                metrics.cache_requests.inc("suggestions", "miss")
+                cached = self._score(target, MAX_SUGGESTIONS)
+                self._suggestions[target.id] = cached
+            else:
+                metrics.cache_requests.inc("suggestions", "hit")
+            return cached[:limit]
+
+
+match_index = MatchIndex()
+cache.profiles.subscribe(match_index.invalidate)
@@ -0,0 +1,310 @@
+"""
+In-process metrics exposed in the Prometheus text format on /metrics.
+
+Counters and histograms are plain Python numbers updated in place, without
+locks: an update costs a dict lookup and an addition. Updates from the event
+loop cannot interleave, and for the few made from threadpool workers the
+worst case is a lost increment, which is acceptable for metrics.
+"""
+import bisect
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_metrics: List["Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self.samples():
+            names = self.labelnames + (
+                ("le",) if len(labels) > len(self.labelnames) else ()
+            )
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, labels)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing count, e.g. cache hits.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(f"{name}_total", documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield "", labels, value
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down.
+
+    Either set directly, or computed at scrape time by `function`, which returns a
+    number (no labels) or an iterable of (label values, number) pairs.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def samples(self):
+        if self.function is None:
+            values = list(self._values.items())
+        elif self.labelnames:
+            values = [(tuple(labels), value) for labels, value in self.function()]
+        else:
+            values = [((), self.function())]
+        for labels, value in values:
+            yield "", labels, value
+
+
+class Histogram(Metric):
+    """
+    Observations counted into cumulative buckets, with their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values.setdefault(
+                labels, [[0] * (len(self.buckets) + 1), 0.0]
+            )
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Observes the wall-clock duration of the `with` block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", labels + (_format_value(bound),), cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+def render() -> str:
+    """
+    Returns every registered metric in the Prometheus text exposition format.
+    """
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+class RequestStats:
+    """
+    Database work done while serving one request.
+    """
+
+    __slots__ = ("queries", "db_seconds", "budget")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.budget: Optional[int] = None
+
+
+current_request: contextvars.ContextVar[
+    Optional[RequestStats]
+] = contextvars.ContextVar("current_request", default=None)
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template and status code.",
+    ["method", "route", "status"],
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements executed per request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+db_time_per_request = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL per request.",
+    ["route"],
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements."
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled database connection."
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or checking a password with bcrypt.",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+email_send_duration = Histogram(
+    "email_send_duration_seconds",
+    "Time spent sending an email over SMTP.",
+    ["template"],
+)
+auth_failures = Counter(
+    "auth_failures",
+    "Rejected authentications by error class.",
+    ["error"],
+)
+cache_requests = Counter(
+    "cache_requests",
+    "Lookups per in-process cache, split into hits and misses.",
+    ["cache", "result"],
+)
+
+
+def _cache_hit_ratios():
+    caches = {labels[0] for labels in list(cache_requests._values)}
+    for cache in sorted(caches):
+        hits = cache_requests.value(cache, "hit")
+        total = hits + cache_requests.value(cache, "miss")
+        yield (cache,), hits / total if total else 0.0
+
+
+cache_hit_ratio = Gauge(
+    "cache_hit_ratio",
+    "Share of lookups served from each in-process cache.",
+    ["cache"],
+    function=_cache_hit_ratios,
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency and per-request database work.
+
+    Requests are labelled with the matched route template (e.g.
+    /api/profiles/profile) rather than the raw path, so the number of series stays
+    bounded; requests that match no route share the "unmatched" label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or "unmatched"
+            http_request_duration.observe(
+                elapsed, scope["method"], template, str(status_code)
+            )
+            db_queries_per_request.observe(stats.queries, template)
+            db_time_per_request.observe(stats.db_seconds, template)
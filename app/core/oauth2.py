@@ -1,12 +1,13 @@
 import base64
-from typing import List
-from fastapi import Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import Depends, HTTPException, Header, status
 from fastapi_jwt_auth import AuthJWT
 from pydantic import BaseModel
 
 from .config import settings
 from ..models import crud
 from .database import get_db
+from . import metrics, timing, tracing
 from sqlalchemy.orm import Session
 
 
@@ -44,6 +45,7 @@ class UserNotFound(Exception):
     pass
 
 
+@tracing.traced
 async def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
     """
     Asynchronously retrieves a user from the database based on the provided JWT token.
@@ -59,17 +61,16 @@ async def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depen
     :rtype: int
     """
     try:
-        Authorize.jwt_refresh_token_required()
-        user_id = Authorize.get_jwt_subject()
+        with timing.phase("jwt"):
+            Authorize.jwt_refresh_token_required()
+            user_id = Authorize.get_jwt_subject()
 
         if not user_id:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not refresh access token",
             )
-        user = await crud.get_user(db, user_id=user_id)
-
-        if not user:
+        if not await crud.user_exists(db, user_id=user_id):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="The user belonging to this token no logger exist",
@@ -77,7 +78,7 @@ async def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depen
 
     except Exception as e:
         error = e.__class__.__name__
-        print(error)
+        metrics.auth_failures.inc(error)
         if error == "MissingTokenError":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="You are not logged in"
@@ -96,4 +97,16 @@ async def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depen
             detail="Token is invalid or has expired",
         )
 
-    return user.id
+    return user_id
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Allows the request only when the X-Admin-Token header matches ADMIN_TOKEN.
+
+    :raises HTTPException 403: If the token is missing or wrong, or no ADMIN_TOKEN is configured.
+    """
+    if not timing.is_admin(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
@@ -0,0 +1,206 @@
+"""
+On-demand statistical profiling of individual requests.
+
+An admin arms the profiler for the next N requests to a route template (or sends
+X-Profile: 1 together with X-Admin-Token on a single request). While a profiled
+request is in flight a sampler thread reads the stack of every thread with
+`sys._current_frames()` at a fixed interval. It sees the event loop and the
+threadpool workers, so time inside SQLAlchemy, psycopg2 and bcrypt shows up.
+Samples are stored as collapsed stacks ("frame;frame;frame count"), the input
+format of flamegraph.pl and speedscope.
+
+Samples cover the whole process, so requests running at the same time as a
+profiled one appear in its profile. With no route armed, the middleware only
+checks the armed routes and, when ADMIN_TOKEN is set, looks for the X-Profile header.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Deque, Dict, List, Optional
+
+from starlette.routing import Match
+
+from .config import settings
+from .timing import ADMIN_TOKEN_HEADER, is_admin
+
+
+PROFILE_HEADER = b"x-profile"
+MAX_STORED_PROFILES = 20
+
+# Leaf frames of threads that are parked and not doing any work.
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: collections.Counter = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.items())
+
+
+class RequestProfiler:
+    """
+    Holds the armed routes and the most recent profiles.
+    """
+
+    def __init__(self):
+        # route template -> [remaining requests, sampling interval in seconds]
+        self.armed: Dict[str, list] = {}
+        self.profiles: Deque[dict] = collections.deque(maxlen=MAX_STORED_PROFILES)
+
+    def arm(self, route: str, requests: int, interval: float):
+        """
+        Profiles the next `requests` requests to the route template `route`.
+        """
+        self.armed[route] = [requests, interval]
+
+    def disarm(self, route: Optional[str] = None):
+        """
+        Stops profiling one route, or every route when none is given.
+        """
+        if route is None:
+            self.armed.clear()
+        else:
+            self.armed.pop(route, None)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        for profile in self.profiles:
+            if profile["id"] == profile_id:
+                return profile
+        return None
+
+    def summaries(self) -> List[dict]:
+        return [
+            {key: value for key, value in profile.items() if key != "stacks"}
+            for profile in self.profiles
+        ]
+
+    def _claim(self, scope) -> Optional[tuple]:
+        """
+        Returns (route template, interval) if this request should be profiled.
+        """
+        if self.armed:
+            for route in scope["app"].router.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    entry = self.armed.get(route.path_format)
+                    if entry is not None:
+                        entry[0] -= 1
+                        if entry[0] <= 0:
+                            self.armed.pop(route.path_format, None)
+                        return route.path_format, entry[1]
+                    break
+
+        if settings.ADMIN_TOKEN:
+            headers = dict(scope["headers"])
+            if headers.get(PROFILE_HEADER) == b"1" and is_admin(
+                headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+            ):
+                return scope["path"], settings.PROFILER_INTERVAL_MS / 1000
+        return None
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware running a StackSampler around requests picked for profiling.
+
+    A profiled response carries an X-Profile-Id header naming its stored profile.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler = request_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (
+            not self.profiler.armed and not settings.ADMIN_TOKEN
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        claim = self.profiler._claim(scope)
+        if claim is None:
+            await self.app(scope, receive, send)
+            return
+
+        route, interval = claim
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", []))
+                    + [(b"x-profile-id", profile_id.encode("latin-1"))],
+                }
+            await send(message)
+
+        sampler = StackSampler(interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            self.profiler.profiles.append(
+                {
+                    "id": profile_id,
+                    "route": route,
+                    "method": scope["method"],
+                    "status": status_code,
+                    "duration_ms": (time.perf_counter() - started) * 1000,
+                    "samples": sum(sampler.samples.values()),
+                    "stacks": sampler.collapsed(),
+                }
+            )
@@ -0,0 +1,201 @@
+"""
+Slow-query log, statement fingerprints and per-route query budgets.
+
+Every statement is timed by the engine events in `database.py` and recorded
+here under its fingerprint: the SQL with parameters and literals replaced by
+`?` and IN lists collapsed. Statements slower than SLOW_QUERY_MS are logged
+with their fingerprint and the types of their bound parameters, never the
+values. The fingerprints with the most total time are listed on
+/api/admin/slow-queries.
+
+Routes declare a budget with `dependencies=[Depends(query_budget(n))]`. Any
+request that runs more statements than its budget is counted in
+`query_budget_exceeded_total`. In development and test it is also logged and
+flagged with an X-Query-Budget-Exceeded response header.
+"""
+import functools
+import logging
+import re
+from typing import Dict, List, Optional
+
+from .config import settings
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+FLAG_ENVIRONMENTS = ("development", "test")
+MAX_FINGERPRINTS = 1000
+
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.I)
+_SPACE = re.compile(r"\s+")
+
+query_budget_exceeded = metrics.Counter(
+    "query_budget_exceeded",
+    "Requests that ran more SQL statements than their route's budget.",
+    ["route"],
+)
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes a statement so executions with different parameters group together.
+    """
+    sql = _PARAM.sub("?", statement)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _VALUES.sub(r"\1", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def parameter_shapes(parameters) -> object:
+    """
+    Describes bound parameters by type only, so no values end up in the log.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"rows": len(parameters), "row": parameter_shapes(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryStats:
+    __slots__ = ("count", "slow", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.slow = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class QueryLog:
+    """
+    In-memory aggregate of statement timings by fingerprint.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.fingerprints: Dict[str, QueryStats] = {}
+
+    def record(self, statement: str, parameters, seconds: float):
+        key = fingerprint(statement)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            if len(self.fingerprints) >= MAX_FINGERPRINTS:
+                # Keep memory bounded; unseen statements past the cap are only logged.
+                stats = QueryStats()
+            else:
+                stats = self.fingerprints.setdefault(key, QueryStats())
+        stats.count += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        if seconds >= self.threshold:
+            stats.slow += 1
+            logger.warning(
+                "Slow query (%.1f ms): %s parameters=%s",
+                seconds * 1000,
+                key,
+                parameter_shapes(parameters),
+            )
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """
+        Returns the fingerprints with the most total time, slowest first.
+        """
+        ranked = sorted(
+            self.fingerprints.items(),
+            key=lambda item: item[1].total_seconds,
+            reverse=True,
+        )
+        return [
+            {
+                "fingerprint": key,
+                "count": stats.count,
+                "slow": stats.slow,
+                "total_ms": stats.total_seconds * 1000,
+                "mean_ms": stats.total_seconds * 1000 / stats.count,
+                "max_ms": stats.max_seconds * 1000,
+            }
+            for key, stats in ranked[:limit]
+        ]
+
+    def reset(self):
+        self.fingerprints = {}
+
+
+query_log = QueryLog(settings.SLOW_QUERY_MS / 1000)
+
+
+def query_budget(limit: int):
+    """
+    Returns a route dependency declaring that a request may run at most `limit` statements.
+
+    Args:
+        limit (int): The number of SQL statements the route is expected to need.
+    """
+
+    async def declare_budget():
+        stats = metrics.current_request.get()
+        if stats is not None:
+            stats.budget = limit
+
+    return declare_budget
+
+
+class QueryBudgetMiddleware:
+    """
+    ASGI middleware checking each response against its route's query budget.
+
+    It reads the per-request statement count kept by MetricsMiddleware, so it must
+    be added inside it. Statements run after the response starts, such as in
+    background tasks, do not count towards the budget.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stats = metrics.current_request.get()
+        if scope["type"] != "http" or stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if (
+                message["type"] == "http.response.start"
+                and stats.budget is not None
+                and stats.queries > stats.budget
+            ):
+                flag = self._exceeded(stats, scope)
+                if flag is not None:
+                    message = {
+                        **message,
+                        "headers": list(message.get("headers", []))
+                        + [(b"x-query-budget-exceeded", flag)],
+                    }
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _exceeded(stats: metrics.RequestStats, scope) -> Optional[bytes]:
+        route = getattr(scope.get("route"), "path_format", None) or "unmatched"
+        query_budget_exceeded.inc(route)
+        if settings.ENVIRONMENT not in FLAG_ENVIRONMENTS:
+            return None
+        logger.warning(
+            "%s ran %d SQL statements, over its budget of %d",
+            route,
+            stats.queries,
+            stats.budget,
+        )
+        return f"{stats.queries}/{stats.budget}".encode("latin-1")
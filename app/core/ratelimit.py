@@ -0,0 +1,336 @@
+"""
+Rate limiting for the anonymous routes that hash passwords, send email or write.
+
+Each limited route has a budget per client IP and per email address in the JSON
+body. For login the email budget is kept per (email, client IP), so failed
+logins from one address cannot lock the account's owner out elsewhere.
+
+Requests are counted in sliding windows approximated from two fixed windows:
+the count of the previous window, weighted by how much of it still overlaps
+the sliding window, plus the count of the current one. A key costs three
+numbers however many requests it makes.
+
+RateLimitMiddleware checks the limits before the request reaches the router, so
+a rejected request does no database, bcrypt or SMTP work. It is answered with
+429 and a Retry-After header. When the cache has a shared Redis tier the
+counters live there, so the limits hold across workers; if Redis fails, the
+in-process counters are used.
+
+Behind a reverse proxy the socket peer is the proxy, so the client IP is taken
+from X-Forwarded-For. Only the TRUSTED_PROXY_HOPS entries appended by our own
+proxies are believed; anything to their left was sent by the client.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+from . import cache, metrics
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_LOCAL_KEYS = 100000
+
+rate_limited = metrics.Counter(
+    "rate_limited_requests",
+    "Requests rejected with 429, by route and the key whose limit was hit.",
+    ["route", "key"],
+)
+
+
+class RateLimitRule:
+    __slots__ = ("path", "email_field", "per_ip", "per_email", "window", "email_per_ip")
+
+    def __init__(
+        self,
+        path: str,
+        email_field: Optional[str],
+        per_ip: int,
+        per_email: int,
+        window: float = 60.0,
+        email_per_ip: bool = False,
+    ):
+        self.path = path
+        self.email_field = email_field
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self.window = window
+        self.email_per_ip = email_per_ip
+
+
+RULES: Dict[str, RateLimitRule] = {
+    rule.path: rule
+    for rule in (
+        RateLimitRule(
+            "/api/auths/login",
+            "companyemail",
+            per_ip=20,
+            per_email=5,
+            email_per_ip=True,
+        ),
+        RateLimitRule("/api/auths/signup", "companyemail", per_ip=10, per_email=3),
+        RateLimitRule(
+            "/api/auths/resend-token", "companyemail", per_ip=10, per_email=3
+        ),
+        RateLimitRule("/api/waitlists/waitlist", "workemail", per_ip=10, per_email=3),
+    )
+}
+
+
+def retry_after(
+    previous: float, current: float, elapsed: float, limit: int, window: float
+) -> int:
+    """
+    Returns the whole seconds until the sliding-window count leaves room for one
+    more request under `limit`.
+
+    Args:
+        previous (float): The count of the previous fixed window.
+        current (float): The count of the current fixed window.
+        elapsed (float): Seconds since the current fixed window started.
+        limit (int): The number of requests allowed per window.
+        window (float): The window length in seconds.
+    """
+    room = limit - 1
+    if current <= room and previous:
+        # The previous window's weight decays linearly until the estimate fits.
+        wait = window * (1 - (room - current) / previous) - elapsed
+    else:
+        # The current window becomes the previous one and then has to decay.
+        wait = window - elapsed + window * (1 - room / current)
+    return max(1, math.ceil(wait))
+
+
+class SlidingWindowCounter:
+    """
+    In-process sliding-window counters, one per key.
+    """
+
+    def __init__(self, max_keys: int = MAX_LOCAL_KEYS):
+        self.max_keys = max_keys
+        # key -> [fixed window index, count in that window, count in the one before]
+        self._windows: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, window: float, now: float) -> Tuple[float, float]:
+        """
+        Counts a request and returns the (previous, current) window counts including it.
+        """
+        index = int(now // window)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None:
+                if len(self._windows) >= self.max_keys:
+                    self._prune(index)
+                entry = self._windows[key] = [index, 0, 0]
+            elif entry[0] != index:
+                entry[2] = entry[1] if entry[0] == index - 1 else 0
+                entry[0], entry[1] = index, 0
+            entry[1] += 1
+            return entry[2], entry[1]
+
+    def _prune(self, index: int):
+        # Keys untouched for two windows count nothing in the sliding window.
+        self._windows = {
+            key: entry for key, entry in self._windows.items() if entry[0] >= index - 1
+        }
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+class SharedWindowCounter:
+    """
+    Sliding-window counters kept in the shared cache tier's Redis server.
+    """
+
+    def __init__(self, client, prefix: str = "revas:ratelimit"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, window: float, now: float) -> Tuple[float, float]:
+        index = int(now // window)
+        current_key = f"{self.prefix}:{key}:{index}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.expire(current_key, math.ceil(window * 2))
+        pipe.get(f"{self.prefix}:{key}:{index - 1}")
+        current, _, previous = pipe.execute()
+        return int(previous or 0), int(current)
+
+
+class RateLimiter:
+    """
+    Checks requests against RULES, in Redis when available and otherwise in process.
+    """
+
+    def __init__(self, rules: Dict[str, RateLimitRule]):
+        self.rules = rules
+        self.local = SlidingWindowCounter()
+        self.shared = (
+            SharedWindowCounter(cache.shared_tier.client)
+            if cache.shared_tier is not None
+            else None
+        )
+
+    async def _hit(self, key: str, window: float, now: float) -> Tuple[float, float]:
+        if self.shared is not None:
+            try:
+                # The redis client is synchronous; keep its round trip off the loop.
+                return await asyncio.to_thread(self.shared.hit, key, window, now)
+            except Exception:
+                logger.warning("Shared rate limit counter failed; counting in process")
+        return self.local.hit(key, window, now)
+
+    async def check(
+        self, rule: RateLimitRule, ip: str, email: Optional[str]
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Counts a request to `rule` and returns (limited key, Retry-After seconds) if it is over a limit.
+        """
+        now = time.time()
+        elapsed = now % rule.window
+        weight = 1 - elapsed / rule.window
+        keys = [("ip", ip, rule.per_ip)]
+        if email:
+            if rule.email_per_ip:
+                email = f"{email}|{ip}"
+            keys.append(("email", email, rule.per_email))
+        for kind, value, limit in keys:
+            previous, current = await self._hit(
+                f"{rule.path}:{kind}:{value}", rule.window, now
+            )
+            if previous * weight + current > limit:
+                return kind, retry_after(previous, current, elapsed, limit, rule.window)
+        return None
+
+
+rate_limiter = RateLimiter(RULES)
+
+tracked_keys = metrics.Gauge(
+    "rate_limit_tracked_keys",
+    "Keys with an in-process rate limit counter.",
+    function=lambda: len(rate_limiter.local),
+)
+
+
+def client_ip(scope, trusted_hops: int) -> str:
+    """
+    Returns the client address, skipping the `trusted_hops` proxies in front of the app.
+
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For, so the client is the `trusted_hops`-th entry from the right.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if trusted_hops <= 0:
+        return peer
+    forwarded = [
+        value.decode("latin-1")
+        for name, value in scope["headers"]
+        if name == b"x-forwarded-for"
+    ]
+    hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+    if not hops:
+        return peer
+    return hops[-min(trusted_hops, len(hops))]
+
+
+def _email(body: bytes, field: str) -> Optional[str]:
+    try:
+        value = json.loads(body).get(field)
+    except (ValueError, AttributeError):
+        return None
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests over their route's rate limits with 429.
+
+    For limited routes the JSON body is read here to find the email, then
+    replayed to the application unchanged.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        rule = (
+            self.limiter.rules.get(scope.get("path"))
+            if scope["type"] == "http"
+            else None
+        )
+        if rule is None or scope["method"] != "POST" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        email = None
+        if rule.email_field is not None:
+            body, receive = await self._buffer_body(receive)
+            if body is not None:
+                email = _email(body, rule.email_field)
+
+        limited = await self.limiter.check(
+            rule, client_ip(scope, settings.TRUSTED_PROXY_HOPS), email
+        )
+        if limited is None:
+            await self.app(scope, receive, send)
+            return
+
+        kind, wait = limited
+        rate_limited.inc(rule.path, kind)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(wait).encode("latin-1")),
+                ],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b'{"detail":"Too many requests, please try again later"}',
+            }
+        )
+
+    @staticmethod
+    async def _buffer_body(receive):
+        """
+        Reads the request body and returns it with a receive callable that replays it.
+
+        Reading stops past MAX_BODY_BYTES; the body is then None, and the part read
+        is replayed before the rest is received as usual.
+        """
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                chunks.append(message)
+                break
+            chunks.append(message)
+            size += len(message.get("body", b""))
+            if not message.get("more_body", False) or size > MAX_BODY_BYTES:
+                break
+
+        replay = list(chunks)
+
+        async def replay_receive():
+            if replay:
+                return replay.pop(0)
+            return await receive()
+
+        if size > MAX_BODY_BYTES or chunks[-1]["type"] != "http.request":
+            return None, replay_receive
+        return b"".join(chunk.get("body", b"") for chunk in chunks), replay_receive
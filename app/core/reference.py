@@ -0,0 +1,75 @@
+import uuid
+from typing import Dict, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import models
+from . import cache, metrics
+
+
+class ReferenceCache:
+    """
+    In-memory copy of the country and state ids used to validate locations.
+
+    Countries and states only change when the populators run, so the ids are
+    loaded once per process and cleared whenever the countries or states caches
+    are invalidated, in this worker or any other.
+    """
+
+    def __init__(self):
+        self._countries: Set[str] = set()
+        self._states: Dict[str, str] = {}
+        self._loaded = False
+
+    def load(self, db: Session):
+        """
+        Loads every country id and state id from the database.
+
+        Args:
+            db (Session): The database session.
+        """
+        self._countries = set(db.scalars(select(models.Country.id)))
+        self._states = dict(
+            db.execute(select(models.State.id, models.State.country_id)).tuples()
+        )
+        self._loaded = True
+
+    def clear(self):
+        """
+        Drops the cached ids so they are reloaded on next use.
+        """
+        self._countries = set()
+        self._states = {}
+        self._loaded = False
+
+    def is_valid_location(self, db: Session, country_id: str, state_id: str) -> bool:
+        """
+        Checks that the country exists and that the state belongs to it.
+
+        Args:
+            db (Session): The database session, used to load the cache on first use.
+            country_id (str): The ID of the country.
+            state_id (str): The ID of the state.
+
+        Returns:
+            bool: True if the location is valid, False otherwise.
+        """
+        if self._loaded:
+            metrics.cache_requests.inc("reference", "hit")
+        else:
+            metrics.cache_requests.inc("reference", "miss")
+            self.load(db)
+        try:
+            country_id = str(uuid.UUID(str(country_id)))
+            state_id = str(uuid.UUID(str(state_id)))
+        except ValueError:
+            return False
+        return (
+            country_id in self._countries and self._states.get(state_id) == country_id
+        )
+
+
+reference_cache = ReferenceCache()
+cache.countries.subscribe(lambda key: reference_cache.clear())
+cache.states.subscribe(lambda key: reference_cache.clear())
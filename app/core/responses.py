@@ -0,0 +1,32 @@
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+
+def orjson_default(obj: Any):
+    if isinstance(obj, Mapping):
+        # SQLAlchemy RowMapping, returned by the Core fast paths in crud.
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """
+    The default response class.
+
+    Encodes with orjson and additionally accepts SQLAlchemy Core row mappings and
+    Decimal values, so list routes can return rows from `crud` directly instead of
+    validating every row through a pydantic `orm_mode` schema first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .database import SessionLocal
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+singleflight_calls = metrics.Counter(
+    "singleflight_calls",
+    "Coalesced reads by group: calls that ran the query (leader), shared an in-flight one, or timed out waiting.",
+    ["group", "result"],
+)
+
+
+def _run_with_session(fn: Callable, args: tuple):
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads into one database call.
+
+    The first caller for a key (the leader) runs the read in a worker thread with
+    its own session; callers arriving while it is in flight await the same
+    future and receive the same result, or the same exception. A follower waits
+    at most `timeout` seconds and then runs the read itself, so a stuck leader
+    cannot hold requests indefinitely. Results are shared between requests and
+    must be treated as read-only; ORM objects are returned detached, with only
+    the attributes the read loaded.
+    """
+
+    def __init__(self, group: str, timeout: float = 5.0):
+        self.group = group
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable, *args) -> Any:
+        """
+        Returns `fn(db, *args)`, sharing the call with concurrent callers of the same key.
+
+        Args:
+            key (Hashable): Identifies identical reads, e.g. ("product", product_id, detail).
+            fn (Callable): A synchronous read taking a session as its first argument.
+            *args: The remaining arguments of `fn`.
+        """
+        in_flight = self._calls.get(key)
+        if in_flight is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(in_flight), self.timeout)
+            except asyncio.TimeoutError:
+                singleflight_calls.inc(self.group, "timeout")
+                return await asyncio.to_thread(_run_with_session, fn, args)
+            singleflight_calls.inc(self.group, "shared")
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        singleflight_calls.inc(self.group, "leader")
+        try:
+            result = await asyncio.to_thread(_run_with_session, fn, args)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no follower was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+reads = SingleFlight("reads")
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import pathlib
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from .database import SessionLocal, engine
+from .matching import match_index
+from .reference import reference_cache
+
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = pathlib.Path(__file__).resolve().parents[2] / "alembic"
+
+
+class SchemaOutOfDateError(RuntimeError):
+    pass
+
+
+def check_schema_revision():
+    """
+    Checks that the database is migrated to the alembic head revision.
+
+    This replaces creating tables at import: it reads the head from the migration
+    scripts and the current revision from `alembic_version`, without introspecting
+    any table. The connection it opens is returned to the pool for reuse.
+
+    Raises:
+        SchemaOutOfDateError: If the database is not at the head revision.
+    """
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    expected = set(ScriptDirectory.from_config(config).get_heads())
+
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+
+    if current != expected:
+        raise SchemaOutOfDateError(
+            f"Database is at revision {sorted(current) or 'base'}, expected "
+            f"{sorted(expected)}; run `alembic upgrade head`"
+        )
+
+
+def load_templates():
+    """
+    Compiles every email template so the first email does not pay for it.
+    """
+    from ..mailHandler import email, waitlistmail
+
+    for env in (email.env, waitlistmail.env):
+        for name in env.list_templates():
+            env.get_template(name)
+
+
+def load_reference_cache():
+    """
+    Loads the country and state ids used to validate locations.
+    """
+    with SessionLocal() as db:
+        reference_cache.load(db)
+
+
+def load_match_index():
+    """
+    Builds the counterparty match index, so the first suggestions request does not.
+    """
+    with SessionLocal() as db:
+        match_index.load(db)
+
+
+async def warmup():
+    """
+    Verifies the schema revision and warms the pool, templates, reference cache and match index concurrently.
+
+    Only a schema mismatch stops startup; any other warmup failure is logged and
+    the cache involved fills on first use instead.
+    """
+    results = await asyncio.gather(
+        asyncio.to_thread(check_schema_revision),
+        asyncio.to_thread(load_templates),
+        asyncio.to_thread(load_reference_cache),
+        asyncio.to_thread(load_match_index),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, SchemaOutOfDateError):
+            raise result
+        if isinstance(result, Exception):
+            logger.error("Startup warmup step failed", exc_info=result)
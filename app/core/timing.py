@@ -0,0 +1,111 @@
+"""
+Per-request phase timings, reported in the Server-Timing response header.
+
+Code marks a phase with `with phase("bcrypt"):`; outside a timed request this
+is a near no-op. Timing is enabled for every request with SERVER_TIMING_ENABLED,
+or per request by sending the X-Admin-Token header with the ADMIN_TOKEN value,
+and the breakdown then shows up in the browser devtools network panel.
+"""
+import contextvars
+import hmac
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .config import settings
+from . import tracing
+
+
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+_phases: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "server_timing_phases", default=None
+)
+
+
+def record(name: str, seconds: float):
+    """
+    Adds `seconds` to the named phase of the current request, if it is timed.
+    """
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the `with` block as (part of) the named phase of the current request.
+
+    The block also runs in a tracing span of the same name.
+    """
+    with tracing.span(name):
+        if _phases.get() is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record(name, time.perf_counter() - started)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """
+    Checks a token against ADMIN_TOKEN; always False while no token is configured.
+    """
+    return bool(settings.ADMIN_TOKEN) and hmac.compare_digest(
+        token or "", settings.ADMIN_TOKEN
+    )
+
+
+def _header(phases: Dict[str, float], total: float) -> bytes:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware collecting phase timings and adding the Server-Timing header.
+
+    Only phases finished before the response starts are reported, so work left to
+    background tasks (such as the signup email) does not appear.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _enabled(self, scope) -> bool:
+        if settings.SERVER_TIMING_ENABLED:
+            return True
+        for name, value in scope["headers"]:
+            if name == ADMIN_TOKEN_HEADER:
+                return is_admin(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._enabled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, float] = {}
+        token = _phases.set(phases)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", _header(phases, time.perf_counter() - started))
+                )
+                headers.append(
+                    (b"timing-allow-origin", settings.CLIENT_ORIGIN.encode("latin-1"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _phases.reset(token)
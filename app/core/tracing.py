@@ -0,0 +1,301 @@
+"""
+Lightweight request tracing.
+
+Each sampled request gets a root span from TracingMiddleware. Code opens child
+spans with `with span("name"):` or the `@traced` decorator. The trace id comes
+from an incoming W3C `traceparent` header when there is one, and is passed on to
+Pepperest calls. Finished spans are queued and exported in batches from a
+background thread by a pluggable exporter (JSON lines file or in-memory).
+
+The sampling decision is made once per request at the root: the parent's
+sampled flag when a traceparent is sent, otherwise TRACE_SAMPLE_RATE. Unsampled
+requests create no spans at all, and the export queue is bounded, so a burst of
+spans is dropped rather than growing memory.
+"""
+import collections
+import contextvars
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        """
+        Finishes the span and hands it to the exporter.
+        """
+        self.end_ns = time.time_ns()
+        processor.submit(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "duration_ns": self.end_ns - self.start_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class InMemoryExporter:
+    """
+    Keeps exported spans in a list; meant for tests and local debugging.
+    """
+
+    def __init__(self):
+        self.spans: List[dict] = []
+
+    def export(self, spans: List[dict]):
+        self.spans.extend(spans)
+
+
+class FileExporter:
+    """
+    Appends exported spans to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[dict]):
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for span in spans:
+                fh.write(json.dumps(span, default=str) + "\n")
+
+
+class BatchSpanProcessor:
+    """
+    Queues finished spans and exports them in batches from a daemon thread.
+    """
+
+    def __init__(
+        self,
+        exporter=None,
+        batch_size: int = 512,
+        max_queue: int = 4096,
+        interval: float = 2.0,
+    ):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.interval = interval
+        self.dropped = 0
+        self._queue: collections.deque = collections.deque()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, span: Span):
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="span-exporter", daemon=True
+            )
+            self._thread.start()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Exports everything queued so far.
+        """
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft().as_dict())
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                logger.exception("Exporting %d spans failed", len(batch))
+
+
+def _exporter_from_settings():
+    if settings.TRACE_EXPORTER == "file":
+        return FileExporter(settings.TRACE_FILE)
+    if settings.TRACE_EXPORTER == "memory":
+        return InMemoryExporter()
+    return None
+
+
+processor = BatchSpanProcessor(_exporter_from_settings())
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """
+    Starts a child of the current span without making it current.
+
+    Returns None when the current request is not traced. Used for leaf spans whose
+    start and end happen in separate callbacks, such as SQL statements.
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace_id, parent.span_id, name, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Runs the `with` block inside a child span of the current span.
+
+    Yields the span, or None when the current request is not traced.
+    """
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = e.__class__.__name__
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def traced(fn=None, *, name: Optional[str] = None):
+    """
+    Decorates an async function so each call runs in its own span.
+
+    The span is named "<module>.<function>" unless `name` is given.
+    """
+
+    def decorate(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            with span(span_name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
+
+
+def propagation_headers() -> Dict[str, str]:
+    """
+    Returns the traceparent header for an outgoing call, if the request is traced.
+    """
+    current = _current.get()
+    return {"traceparent": current.traceparent} if current is not None else {}
+
+
+def _root_span(headers: Dict[bytes, bytes]) -> Optional[Span]:
+    parent = TRACEPARENT_RE.match(headers.get(b"traceparent", b"").decode("latin-1"))
+    if parent:
+        trace_id, parent_id, flags = parent.groups()
+        if not int(flags, 16) & 1:
+            return None
+    elif random.random() < settings.TRACE_SAMPLE_RATE:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+    else:
+        return None
+    return Span(trace_id, parent_id, "request", {})
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each sampled request.
+
+    The root span is named after the matched route template and records the
+    method and status; its traceparent is returned in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or processor.exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        root = _root_span(dict(scope["headers"]))
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", []))
+                    + [(b"traceparent", root.traceparent.encode("latin-1"))],
+                }
+            await send(message)
+
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = e.__class__.__name__
+            raise
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path_format", None) or "unmatched"
+            root.name = f"{scope['method']} {route}"
+            root.attributes["http.method"] = scope["method"]
+            root.attributes["http.route"] = route
+            root.end()
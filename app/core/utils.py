@@ -1,12 +1,16 @@
 import bcrypt
 
+from . import metrics, timing
+
 
 def hash_password(password):
     salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
+    with metrics.password_hash_duration.time("hash"), timing.phase("bcrypt"):
+        hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
     return hashed_password
 
 
 def verify_password(password: str, hashed_password: str):
     hashed_password = hashed_password.encode("utf-8")
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password)
\ No newline at end of file
+    with metrics.password_hash_duration.time("verify"), timing.phase("bcrypt"):
+        return bcrypt.checkpw(password.encode("utf-8"), hashed_password)
\ No newline at end of file
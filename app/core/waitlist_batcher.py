@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from pydantic import EmailStr
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from .config import settings
+from .database import SessionLocal
+from .bloom import waitlist_emails
+from . import metrics
+from ..models import models, schemas
+from ..mailHandler.waitlistmail import Email
+
+
+logger = logging.getLogger(__name__)
+
+# Errors that say nothing about the rows: the database is unreachable or restarting.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, TimeoutError)
+
+
+class WaitlistQueueFull(Exception):
+    """
+    Raised by WaitlistBatcher.submit when `max_pending` signups are already waiting.
+    """
+
+
+class WaitlistBatcher:
+    """
+    Buffers waitlist signups in memory and writes them in multi-row inserts.
+
+    Submissions are deduplicated by email while they wait. The first submission
+    after an idle period starts a `flush_interval` timer, and when it fires (or
+    as soon as `max_batch` rows are pending) the pending rows are written with one
+    INSERT ... ON CONFLICT (lower(workemail)) DO NOTHING. Welcome emails are only sent for rows that were actually inserted.
+
+    When a batch is rejected because of its data (a name too long for its column,
+    a state deleted since validation), it is split in halves and each half is
+    retried, down to single rows, so only the rows that fail on their own are
+    dropped; each is logged as an error with its email so it can be replayed by
+    hand. When the database is unreachable the batch is queued again whole.
+
+    At most `max_pending` signups wait in memory. Past that, submit() refuses new
+    ones, so an outage turns into 503s instead of unbounded memory growth and
+    acknowledgements for signups that may never be written.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.005,
+        max_batch: int = 500,
+        max_pending: int = settings.WAITLIST_MAX_PENDING,
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending: Dict[str, dict] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._mail_tasks = set()
+
+    def submit(self, waitlist: schemas.WaitlistBaseSchema) -> Optional[str]:
+        """
+        Queues a waitlist signup for the next batch.
+
+        Args:
+            waitlist (schemas.WaitlistBaseSchema): The validated signup, with a lowercased email.
+
+        Returns:
+            str or None: The ID the row will be stored under, or None if the email is already pending.
+
+        Raises:
+            WaitlistQueueFull: If `max_pending` signups are already waiting.
+        """
+        if waitlist.workemail in self._pending:
+            return None
+        if len(self._pending) >= self.max_pending:
+            raise WaitlistQueueFull()
+        row = waitlist.dict()
+        row["id"] = str(uuid.uuid4())
+        row["createdat"] = datetime.datetime.utcnow()
+        self._pending[waitlist.workemail] = row
+        if self._wakeup:
+            self._wakeup.set()
+        return row["id"]
+
+    async def start(self):
+        """
+        Starts the background flush loop.
+        """
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the flush loop and writes whatever is still pending.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            while self._pending:
+                await self.flush()
+        except Exception:
+            logger.exception("Dropping %d pending waitlist signups", len(self._pending))
+        if self._mail_tasks:
+            await asyncio.gather(*self._mail_tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if len(self._pending) < self.max_batch:
+                # Give concurrent signups a moment to join the batch.
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Waitlist batch flush failed")
+                await asyncio.sleep(1)
+            if self._pending:
+                self._wakeup.set()
+
+    async def flush(self):
+        """
+        Writes up to `max_batch` pending signups, in a single statement unless a row is rejected.
+        """
+        if not self._pending:
+            return
+        emails = list(self._pending)[: self.max_batch]
+        batch = [self._pending.pop(email) for email in emails]
+        settled: List[dict] = []
+        inserted: list = []
+        try:
+            await self._insert_isolating(batch, settled, inserted)
+        except Exception:
+            done = {id(row) for row in settled}
+            for row in batch:
+                if id(row) not in done:
+                    self._pending.setdefault(row["workemail"], row)
+            raise
+        finally:
+            self._welcome(inserted)
+
+    async def _insert_isolating(
+        self, batch: List[dict], settled: List[dict], inserted: list
+    ):
+        """
+        Inserts `batch`, bisecting it on a data error until the failing rows are isolated.
+
+        Rows that were written, skipped as duplicates or dropped are appended to
+        `settled`, and the inserted ones to `inserted`, as they go, so a transient
+        error part way through only requeues the rest.
+        """
+        try:
+            inserted.extend(await asyncio.to_thread(self._insert, batch))
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(
+                    "Dropping waitlist signup for %s: %s",
+                    batch[0]["workemail"],
+                    getattr(e, "orig", e),
+                )
+            else:
+                middle = len(batch) // 2
+                await self._insert_isolating(batch[:middle], settled, inserted)
+                await self._insert_isolating(batch[middle:], settled, inserted)
+                return
+        settled.extend(batch)
+
+    def _welcome(self, inserted: list):
+        for row in inserted:
+            waitlist_emails.add(row.workemail)
+            task = asyncio.create_task(
+                Email(
+                    user=row.lastname, email=[EmailStr(row.workemail)]
+                ).sendWaitlistEmail()
+            )
+            self._mail_tasks.add(task)
+            task.add_done_callback(self._mail_sent)
+
+    def _mail_sent(self, task: asyncio.Task):
+        self._mail_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Waitlist email failed: %s", task.exception())
+
+    @staticmethod
+    def _insert(batch: List[dict]):
+        stmt = (
+            insert(models.Waitlist)
+            .values(batch)
+            .on_conflict_do_nothing(
+                index_elements=[func.lower(models.Waitlist.workemail)]
+            )
+            .returning(models.Waitlist.workemail, models.Waitlist.lastname)
+        )
+        with SessionLocal() as db:
+            inserted = db.execute(stmt).all()
+            db.commit()
+        return inserted
+
+
+waitlist_batcher = WaitlistBatcher()
+
+waitlist_pending = metrics.Gauge(
+    "waitlist_pending",
+    "Waitlist signups acknowledged but not yet written.",
+    function=lambda: len(waitlist_batcher._pending),
+)
@@ -5,6 +5,7 @@ from jinja2 import Environment, select_autoescape, PackageLoader
 
 
 from ..core.config import settings
+from ..core import metrics, timing
 
 
 env = Environment(
@@ -55,15 +56,17 @@ class Email:
             VALIDATE_CERTS=True,
         )
 
-        template = env.get_template(f"{template}.html")
-        html = template.render(token=self.token, name=self.name, subject=subject)
+        with timing.phase("template"):
+            template = env.get_template(f"{template}.html")
+            html = template.render(token=self.token, name=self.name, subject=subject)
 
         message = MessageSchema(
             subject=subject, recipients=self.email, body=html, subtype="html"
         )
 
         fm = FastMail(conf)
-        await fm.send_message(message)
+        with metrics.email_send_duration.time(template.name), timing.phase("smtp"):
+            await fm.send_message(message)
 
     async def sendVerificationEmail(self):
         """
@@ -1,12 +1,21 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import delete, func, select, true, update
+from sqlalchemy.dialects.postgresql import insert
 from pydantic import EmailStr
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta
 import json
 
 
 from ..models import models, schemas
+from ..core.config import settings
+from ..core.matching import match_index
+from ..core.tracing import traced
+from ..core.singleflight import reads
+from ..core import cache
 
 
+@traced
 async def get_user(db: Session, user_id: str):
     """
     Asynchronously retrieves a user from the database based on the provided user_id.
@@ -21,18 +30,42 @@ async def get_user(db: Session, user_id: str):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
+@traced
+async def user_exists(db: Session, user_id: str) -> bool:
+    """
+    Asynchronously checks that a user exists, through the users cache.
+
+    Args:
+        db (Session): The database session, used on a cache miss.
+        user_id (str): The unique identifier of the user.
+
+    Returns:
+        bool: True if the user exists, False otherwise.
+    """
+
+    async def load():
+        return db.scalar(select(models.User.id).where(models.User.id == user_id))
+
+    return await cache.users.get_or_load(str(user_id), load) is not None
+
+
+@traced
 async def get_user_by_email(db: Session, email: EmailStr):
     """
     Asynchronous function to retrieve a user from the database by email.
 
     Args:
         db (Session): The database session.
-        email (EmailStr): The email address of the user.
+        email (EmailStr): The email address of the user, matched case-insensitively.
 
     Returns:
         models.User: The user corresponding to the given email, or None if not found.
     """
-    return db.query(models.User).filter(models.User.companyemail == email).first()
+    return (
+        db.query(models.User)
+        .filter(func.lower(models.User.companyemail) == email.lower())
+        .first()
+    )
 
 
 # async def get_users(db: Session, skip: int = 0, limit: int = 100):
@@ -50,24 +83,56 @@ async def get_user_by_email(db: Session, email: EmailStr):
 #     return db.query(models.User).offset(skip).limit(limit).all()
 
 
+@traced
 async def create_user(db: Session, user: schemas.CreateUserSchema):
     """
     Asynchronously creates a new user in the database.
 
+    The user is written with a single INSERT ... ON CONFLICT (companyemail) DO NOTHING
+    RETURNING statement, so an existing email is detected by the unique constraint
+    rather than by a separate lookup.
+
     Parameters:
     - db: Session object representing the database session
     - user: CreateUserSchema object containing the user information to be created
 
     Returns:
-    - User object representing the newly created user
+    - Row representing the newly created user, or None if the email already exists
     """
-    db_user = models.User(**user.dict())
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    stmt = (
+        insert(models.User)
+        .values(**user.dict())
+        .on_conflict_do_nothing(index_elements=[models.User.companyemail])
+        .returning(*models.User.__table__.c)
+    )
+    try:
+        db_user = db.execute(stmt).first()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     return db_user
 
 
+# The owner fields embedded in cached profile and product details.
+OWNER_SUMMARY_FIELDS = ("firstname", "lastname", "companyname", "role")
+
+
+def _notify_owner_changed(db: Session, user_id: str):
+    """
+    Invalidates the cached profile and products that embed a user's owner summary.
+    """
+    for profile_id in db.scalars(
+        select(models.Profile.id).where(models.Profile.user_id == user_id)
+    ):
+        cache.notify(db, "profiles", str(profile_id))
+    for product_id in db.scalars(
+        select(models.Product.id).where(models.Product.user_id == user_id)
+    ):
+        cache.notify(db, "products", str(product_id))
+
+
+@traced
 async def update_user(db: Session, users: schemas.UpdateUserSchema):
     """
     Asynchronously updates a user in the database.
@@ -81,11 +146,14 @@ async def update_user(db: Session, users: schemas.UpdateUserSchema):
     """
     db_user = db.query(models.User).filter(models.User.id == users.id).first()
     if db_user:
+        summary = [getattr(db_user, field) for field in OWNER_SUMMARY_FIELDS]
         for field_name, value in users.__dict__.items():
             if not field_name.startswith(
                 "_"
             ):  # Ignore private fields (starting with _)
                 setattr(db_user, field_name, value)
+        if summary != [getattr(db_user, field) for field in OWNER_SUMMARY_FIELDS]:
+            _notify_owner_changed(db, db_user.id)
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -93,6 +161,7 @@ async def update_user(db: Session, users: schemas.UpdateUserSchema):
         return None
 
 
+@traced
 async def delete_user(db: Session, user_id: str):
     """
     An asynchronous function to delete a user from the database.
@@ -107,12 +176,15 @@ async def delete_user(db: Session, user_id: str):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user:
         db.delete(db_user)
+        cache.notify(db, "users", str(user_id))
+        _notify_owner_changed(db, user_id)
         db.commit()
         return True
     else:
         return False
 
 
+@traced
 async def update_email_verified(db: Session, user: schemas.VerifyEmailSchema):
     """
     An asynchronous function to update the email verification status of a user in the database.
@@ -126,7 +198,7 @@ async def update_email_verified(db: Session, user: schemas.VerifyEmailSchema):
     """
     db_user = (
         db.query(models.User)
-        .filter(models.User.companyemail == user.companyemail)
+        .filter(func.lower(models.User.companyemail) == user.companyemail.lower())
         .first()
     )
     if db_user:
@@ -164,29 +236,43 @@ async def update_email_verified(db: Session, user: schemas.VerifyEmailSchema):
 #         return None
 
 
+@traced
 async def create_profile(db: Session, profile: schemas.ProfileBaseSchema):
     """
     An asynchronous function to create a new profile in the database.
 
+    The insert relies on the unique constraint on `profiles.user_id`: it is a single
+    INSERT ... ON CONFLICT DO NOTHING RETURNING statement, so a concurrent second
+    profile for the same user is rejected by the database instead of a prior check.
+
     Args:
         db (Session): The database session.
         profile (schemas.ProfileBaseSchema): The profile data to be created.
 
-    Returns:CreateProfileSchema
-        models.Profile: The newly created profile object.
+    Returns:
+        Row: The newly created profile row, or None if the user already has a profile.
     """
-    db_profile = models.Profile(**profile.dict())
-    db.add(db_profile)
+    stmt = (
+        insert(models.Profile)
+        .values(**profile.dict())
+        .on_conflict_do_nothing(index_elements=[models.Profile.user_id])
+        .returning(*models.Profile.__table__.c)
+    )
+    db_profile = db.execute(stmt).first()
+    if db_profile:
+        _count_supplier_facets(
+            db, db_profile.country_id, db_profile.state_id, db_profile.products, 1
+        )
+        # Tells the other workers' match indexes about the new profile.
+        cache.notify(db, "profiles", str(db_profile.id))
+        cache.notify(db, "suppliers")
     db.commit()
-    db.refresh(db_profile)
-
     if db_profile:
-        products_string = db_profile.products.strip("{}")
-        products_list = products_string.split(",")  # Remove braces and split
-        db_profile.products = products_list
+        match_index.upsert(db_profile)
     return db_profile
 
 
+@traced
 async def edit_profile(db: Session, user_id: str, profile: schemas.UpdateProfileSchema):
     """
     An asynchronous function to update an existing profile in the database.
@@ -206,40 +292,72 @@ async def edit_profile(db: Session, user_id: str, profile: schemas.UpdateProfile
     )
     if db_profile:
         del profile.id
+        before = _facet_key(db_profile)
         for key, value in profile.dict(exclude_unset=True).items():
             setattr(db_profile, key, value)
+        after = _facet_key(db_profile)
+        if after != before:
+            _count_supplier_facets(db, *before, -1)
+            _count_supplier_facets(db, *after, 1)
+        cache.notify(db, "profiles", str(db_profile.id))
+        cache.notify(db, "suppliers")
         db.commit()
         db.refresh(db_profile)
-
-        if db_profile:
-            products_string = db_profile.products.strip("{}")
-            products_list = products_string.split(",")  # Remove braces and split
-            db_profile.products = products_list
-            return db_profile
+        match_index.upsert(db_profile)
+        return db_profile
     else:
         return None
 
 
-async def get_profile(db: Session, profile_id: str):
+def _query_profile(db: Session, profile_id: str, detail: bool):
+    query = db.query(models.Profile)
+    if detail:
+        query = query.options(
+            joinedload(models.Profile.country),
+            joinedload(models.Profile.state),
+            joinedload(models.Profile.user),
+        )
+    return query.filter(models.Profile.id == profile_id).first()
+
+
+@traced
+async def get_profile(
+    db: Session,
+    profile_id: str,
+    detail: bool = False,
+    coalesce: bool = False,
+    cached: bool = False,
+):
     """
     An asynchronous function to retrieve a profile from the database.
 
     Args:
         db (Session): The database session.
-        user_id (str): The ID of the user whose profile is being retrieved.
+        profile_id (str): The ID of the profile being retrieved.
+        detail (bool, optional): Whether to load the country, state and owner in the same query. Defaults to False.
+        coalesce (bool, optional): Whether to share the query with concurrent reads of the same profile. The result is then detached and must not be modified. Defaults to False.
+        cached (bool, optional): Whether to serve the profile from the profiles cache. The result is then a read-only dict in the shape of schemas.ProfileDetailResponseSchema. Defaults to False.
 
     Returns:
         models.Profile: The profile object if found, otherwise None.
     """
-    profile = db.query(models.Profile).filter(models.Profile.id == profile_id).first()
-    if profile:
-        products_string = profile.products.strip("{}")
-        products_list = products_string.split(",")  # Remove braces and split
-        profile.products = products_list
+    if cached:
+
+        async def load():
+            profile = await get_profile(db, profile_id, detail=True, coalesce=True)
+            if profile is None:
+                return None
+            return schemas.ProfileDetailResponseSchema.from_orm(profile).dict()
 
-    return profile
+        return await cache.profiles.get_or_load(str(profile_id), load)
+    if coalesce:
+        return await reads.do(
+            ("profile", str(profile_id), detail), _query_profile, profile_id, detail
+        )
+    return _query_profile(db, profile_id, detail)
 
 
+@traced
 async def get_profile_by_user(db: Session, user_id: str):
     """
     Asynchronously retrieves a profile from the database by the given user ID.
@@ -251,13 +369,244 @@ async def get_profile_by_user(db: Session, user_id: str):
     Returns:
         models.Profile: The profile object if found, otherwise None.
     """
-    profile = db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
-    if profile:
-        products_string = profile.products.strip("{}")
-        products_list = products_string.split(",")  # Remove braces and split
-        profile.products = products_list
+    return db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
+
+
+def _supplier_filters(
+    products: Optional[List[str]],
+    country_id: Optional[str],
+    state_id: Optional[str],
+    min_capacity: Optional[float],
+):
+    """
+    Builds the WHERE clauses shared by the supplier search and its facets.
+    """
+    filters = []
+    if products:
+        filters.append(models.Profile.products.overlap(products))
+    if country_id:
+        filters.append(models.Profile.country_id == country_id)
+    if state_id:
+        filters.append(models.Profile.state_id == state_id)
+    if min_capacity is not None:
+        filters.append(models.Profile.factory_capacity >= min_capacity)
+    return filters
+
+
+def _facet_key(profile):
+    return str(profile.country_id), str(profile.state_id), frozenset(profile.products)
+
+
+def _count_supplier_facets(
+    db: Session, country_id: str, state_id: str, products, delta: int
+):
+    """
+    Adds `delta` to the supplier facet counts of a profile's location and materials.
+
+    Run it in the transaction writing the profile, so the counts commit with it.
+    """
+    rows = [
+        {
+            "country_id": country_id,
+            "state_id": state_id,
+            "product": product,
+            "profiles": delta,
+        }
+        # Sorted, so concurrent writers lock the rows in the same order.
+        for product in sorted(set(products or ()))
+    ]
+    if not rows:
+        return
+    stmt = insert(models.SupplierFacet).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[
+                models.SupplierFacet.country_id,
+                models.SupplierFacet.state_id,
+                models.SupplierFacet.product,
+            ],
+            set_={"profiles": models.SupplierFacet.profiles + stmt.excluded.profiles},
+        )
+    )
+
+
+async def rebuild_supplier_facets(db: Session):
+    """
+    Recomputes every supplier facet count from the profiles table.
+
+    For profiles written without the crud functions, e.g. by a bulk import.
 
-    return profile
+    Args:
+        db (Session): The database session.
+    """
+    material = (
+        func.unnest(models.Profile.products).table_valued("name").render_derived()
+    )
+    counts = (
+        select(
+            models.Profile.country_id,
+            models.Profile.state_id,
+            material.c.name,
+            func.count(models.Profile.id.distinct()),
+        )
+        .select_from(models.Profile)
+        .join(material, true())
+        .group_by(models.Profile.country_id, models.Profile.state_id, material.c.name)
+    )
+    db.execute(delete(models.SupplierFacet))
+    db.execute(
+        insert(models.SupplierFacet).from_select(
+            ["country_id", "state_id", "product", "profiles"], counts
+        )
+    )
+    cache.notify(db, "suppliers")
+    db.commit()
+
+
+@traced
+async def search_suppliers(
+    db: Session,
+    products: Optional[List[str]] = None,
+    country_id: Optional[str] = None,
+    state_id: Optional[str] = None,
+    min_capacity: Optional[float] = None,
+    limit: int = 20,
+    cached: bool = False,
+):
+    """
+    Asynchronously searches supplier profiles by material, location and capacity.
+
+    Results are ranked by the number of requested materials a profile handles and
+    then by factory capacity, so the first `limit` rows are the top-k by capacity
+    among the best material matches. The material filter is served by the GIN index
+    on `profiles.products` and the location filter by the (country_id, state_id)
+    index. The match count is computed per row, so no index yields rows in rank
+    order: the filtered rows are sorted with a bounded top-k sort, and the
+    factory_capacity index only serves `min_capacity`.
+
+    Without a material or capacity filter the product facet is read from the
+    `supplier_facet` counts instead of unnesting every matching profile.
+
+    Args:
+        db (Session): The database session.
+        products (List[str], optional): Materials the supplier must handle (any of).
+        country_id (str, optional): The country the supplier must be located in.
+        state_id (str, optional): The state the supplier must be located in.
+        min_capacity (float, optional): The minimum factory capacity.
+        limit (int, optional): The maximum number of results. Defaults to 20.
+        cached (bool, optional): Whether to serve the response from the suppliers cache, as a read-only dict of plain rows. Each search is computed once and dropped whenever a profile is created, edited or deleted. Defaults to False.
+
+    Returns:
+        dict: The ranked "results" and the "facets" counts per country and product.
+    """
+    if cached:
+
+        async def load():
+            found = await search_suppliers(
+                db, products, country_id, state_id, min_capacity, limit
+            )
+            return {
+                "results": [dict(row) for row in found["results"]],
+                "facets": {
+                    name: [dict(row) for row in rows]
+                    for name, rows in found["facets"].items()
+                },
+            }
+
+        key = "|".join(
+            (
+                ",".join(sorted(set(products or ()))),
+                str(country_id or ""),
+                str(state_id or ""),
+                "" if min_capacity is None else str(min_capacity),
+                str(limit),
+            )
+        )
+        return await cache.suppliers.get_or_load(key, load)
+
+    filters = _supplier_filters(products, country_id, state_id, min_capacity)
+
+    if products:
+        material = (
+            func.unnest(models.Profile.products).table_valued("name").render_derived()
+        )
+        match_count = (
+            select(func.count())
+            .select_from(material)
+            .where(material.c.name.in_(products))
+            .scalar_subquery()
+        )
+    else:
+        match_count = func.cardinality(models.Profile.products)
+
+    results = db.execute(
+        select(
+            models.Profile.id,
+            models.Profile.user_id,
+            models.Profile.country_id,
+            models.Country.name.label("country"),
+            models.Profile.state_id,
+            models.State.name.label("state"),
+            models.Profile.factory_capacity,
+            models.Profile.products,
+            match_count.label("match_count"),
+        )
+        .join(models.Country, models.Country.id == models.Profile.country_id)
+        .join(models.State, models.State.id == models.Profile.state_id)
+        .where(*filters)
+        .order_by(
+            match_count.desc(),
+            models.Profile.factory_capacity.desc(),
+            models.Profile.id,
+        )
+        .limit(limit)
+    ).mappings()
+
+    country_facets = db.execute(
+        select(
+            models.Profile.country_id.label("id"),
+            models.Country.name,
+            func.count().label("count"),
+        )
+        .join(models.Country, models.Country.id == models.Profile.country_id)
+        .where(*filters)
+        .group_by(models.Profile.country_id, models.Country.name)
+        .order_by(func.count().desc())
+    ).mappings()
+
+    if products or min_capacity is not None:
+        material = func.unnest(models.Profile.products).label("name")
+        filtered = select(material).where(*filters).subquery()
+        product_facets = db.execute(
+            select(filtered.c.name, func.count().label("count"))
+            .group_by(filtered.c.name)
+            .order_by(func.count().desc())
+        ).mappings()
+    else:
+        profiles = func.sum(models.SupplierFacet.profiles)
+        facet_filters = []
+        if country_id:
+            facet_filters.append(models.SupplierFacet.country_id == country_id)
+        if state_id:
+            facet_filters.append(models.SupplierFacet.state_id == state_id)
+        product_facets = db.execute(
+            select(
+                models.SupplierFacet.product.label("name"),
+                profiles.label("count"),
+            )
+            .where(*facet_filters)
+            .group_by(models.SupplierFacet.product)
+            .having(profiles > 0)
+            .order_by(profiles.desc())
+        ).mappings()
+
+    return {
+        "results": results.all(),
+        "facets": {
+            "countries": country_facets.all(),
+            "products": product_facets.all(),
+        },
+    }
 
 
 # async def get_profiles(db: Session, skip: int = 0, limit: int = 100):
@@ -275,6 +624,7 @@ async def get_profile_by_user(db: Session, user_id: str):
 #     return db.query(models.Profile).offset(skip).limit(limit).all()
 
 
+@traced
 async def delete_profile(db: Session, profile_id: str, user_id: str):
     """
     An asynchronous function to delete a profile from the database.
@@ -293,13 +643,204 @@ async def delete_profile(db: Session, profile_id: str, user_id: str):
         .first()
     )
     if db_profile:
+        _count_supplier_facets(db, *_facet_key(db_profile), -1)
         db.delete(db_profile)
+        cache.notify(db, "profiles", str(profile_id))
+        cache.notify(db, "suppliers")
         db.commit()
+        match_index.remove(profile_id)
         return True
     else:
         return False
 
 
+@traced
+async def create_payment(
+    db: Session,
+    payment: schemas.CreatePaymentSchema,
+    user_id: str,
+    reference: str | None,
+    status: str = "pending",
+):
+    """
+    Asynchronously stores a payment.
+
+    Args:
+        db (Session): The database session.
+        payment (schemas.CreatePaymentSchema): The payment data sent to the gateway.
+        user_id (str): The ID of the paying user.
+        reference (str): The gateway reference of the payment, or None before the gateway call.
+        status (str, optional): The payment status. Defaults to "pending".
+
+    Returns:
+        models.Payment: The newly created payment object.
+    """
+    db_payment = models.Payment(
+        **payment.dict(exclude={"start_date", "end_date"}),
+        user_id=user_id,
+        reference=reference,
+        status=status,
+    )
+    db.add(db_payment)
+    db.commit()
+    db.refresh(db_payment)
+    return db_payment
+
+
+@traced
+async def update_payment(
+    db: Session, payment_id: str, status: str, reference: str | None = None
+):
+    """
+    Asynchronously records the outcome of a payment's gateway call.
+
+    Args:
+        db (Session): The database session.
+        payment_id (str): The ID of the payment.
+        status (str): The new payment status.
+        reference (str, optional): The gateway reference, when the gateway created the payment.
+
+    Returns:
+        models.Payment: The updated payment object if found, otherwise None.
+    """
+    db_payment = db.get(models.Payment, payment_id)
+    if db_payment is None:
+        return None
+    db_payment.status = status
+    if reference is not None:
+        db_payment.reference = reference
+    db.commit()
+    db.refresh(db_payment)
+    return db_payment
+
+
+@traced
+async def claim_idempotency_key(db: Session, user_id: str, key: str, request_hash: str):
+    """
+    Asynchronously claims an idempotency key for a user.
+
+    A claim whose request never completed (for instance because the process
+    died) expires after IDEMPOTENCY_CLAIM_TTL_SECONDS and can be claimed again.
+
+    Args:
+        db (Session): The database session.
+        user_id (str): The ID of the user sending the request.
+        key (str): The client-supplied Idempotency-Key header.
+        request_hash (str): A hash of the request body.
+
+    Returns:
+        bool: True if the key was claimed, False if it was already used.
+    """
+    now = datetime.utcnow()
+    stmt = insert(models.IdempotencyKey).values(
+        user_id=user_id, key=key, request_hash=request_hash, createdat=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.IdempotencyKey.user_id, models.IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "createdat": stmt.excluded.createdat,
+        },
+        where=models.IdempotencyKey.status_code.is_(None)
+        & (
+            models.IdempotencyKey.createdat
+            < now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TTL_SECONDS)
+        ),
+    ).returning(models.IdempotencyKey.id)
+    claimed = db.execute(stmt).first()
+    db.commit()
+    return claimed is not None
+
+
+@traced
+async def get_idempotency_key(db: Session, user_id: str, key: str):
+    """
+    Asynchronously retrieves a used idempotency key with its stored response.
+
+    Args:
+        db (Session): The database session.
+        user_id (str): The ID of the user sending the request.
+        key (str): The client-supplied Idempotency-Key header.
+
+    Returns:
+        models.IdempotencyKey: The key if found, otherwise None.
+    """
+    return (
+        db.query(models.IdempotencyKey)
+        .filter(models.IdempotencyKey.user_id == user_id)
+        .filter(models.IdempotencyKey.key == key)
+        .first()
+    )
+
+
+@traced
+async def complete_idempotency_key(
+    db: Session, user_id: str, key: str, status_code: int, response_body: str
+):
+    """
+    Asynchronously stores the response of the request that claimed a key.
+
+    Args:
+        db (Session): The database session.
+        user_id (str): The ID of the user sending the request.
+        key (str): The client-supplied Idempotency-Key header.
+        status_code (int): The HTTP status code of the response.
+        response_body (str): The JSON-encoded response body.
+    """
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(models.IdempotencyKey.user_id == user_id)
+        .where(models.IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=response_body)
+    )
+    db.commit()
+
+
+@traced
+async def release_idempotency_key(db: Session, user_id: str, key: str):
+    """
+    Asynchronously releases a claimed key after its request failed, so it can be retried.
+
+    Args:
+        db (Session): The database session.
+        user_id (str): The ID of the user sending the request.
+        key (str): The client-supplied Idempotency-Key header.
+    """
+    db.rollback()
+    db.execute(
+        delete(models.IdempotencyKey)
+        .where(models.IdempotencyKey.user_id == user_id)
+        .where(models.IdempotencyKey.key == key)
+        .where(models.IdempotencyKey.status_code.is_(None))
+    )
+    db.commit()
+
+
+@traced
+async def create_payment_webhook(db: Session, webhook: dict):
+    """
+    Asynchronously queues a gateway webhook for the webhook worker.
+
+    Webhooks are deduplicated on their event id, so a redelivered event is ignored.
+
+    Args:
+        db (Session): The database session.
+        webhook (dict): The event_id, reference, status and raw payload of the webhook.
+
+    Returns:
+        bool: True if the webhook was queued, False if it was a duplicate.
+    """
+    stmt = (
+        insert(models.PaymentWebhook)
+        .values(**webhook)
+        .on_conflict_do_nothing(index_elements=[models.PaymentWebhook.event_id])
+        .returning(models.PaymentWebhook.id)
+    )
+    queued = db.execute(stmt).first()
+    db.commit()
+    return queued is not None
+
+
 # async def create_transaction(db: Session, transaction: schemas.CreateTransactionSchema):
 #     db_transaction = models.Transaction(**transaction.dict())
 #     db.add(db_transaction)
@@ -308,22 +849,26 @@ async def delete_profile(db: Session, profile_id: str, user_id: str):
 #     return db_transaction
 
 
+@traced
 async def get_waitlist_by_email(db: Session, workemail: EmailStr):
     """
     Asynchronous function to retrieve a waitlisted user from the database by email.
 
     Args:
         db (Session): The database session.
-        email (EmailStr): The email address of the user.
+        email (EmailStr): The email address of the user, matched case-insensitively.
 
     Returns:
         models.User: The user corresponding to the given email, or None if not found.
     """
     return (
-        db.query(models.Waitlist).filter(models.Waitlist.workemail == workemail).first()
+        db.query(models.Waitlist)
+        .filter(func.lower(models.Waitlist.workemail) == workemail.lower())
+        .first()
     )
 
 
+@traced
 async def create_waitlist_user(db: Session, user: schemas.WaitlistBaseSchema):
     """
     Asynchronously creates a new waitlist user in the database.
@@ -342,6 +887,7 @@ async def create_waitlist_user(db: Session, user: schemas.WaitlistBaseSchema):
     return db_user
 
 
+@traced
 async def create_state(db: Session, states: dict):
     """
     An asynchronous function to create a new state in the database.
@@ -355,33 +901,55 @@ async def create_state(db: Session, states: dict):
     """
     db_state = models.State(**states)
     db.add(db_state)
+    cache.notify(db, "states")
     db.commit()
     db.refresh(db_state)
     return db_state
 
 
-async def get_states(db: Session, country_id: int, skip: int = 0, limit: int = 500):
+@traced
+async def get_states(
+    db: Session,
+    country_id: int,
+    skip: int = 0,
+    limit: int = 500,
+    cached: bool = False,
+):
     """
     Asynchronously retrieves a list of states from the database based on the provided country ID.
 
+    The rows are read with a Core select, so no ORM objects are built for them.
+
     Parameters:
     - db: The database session
     - country_id: The ID of the country for which states are being retrieved
     - skip: The number of records to skip (default: 0)
     - limit: The maximum number of records to retrieve (default: 500)
+    - cached: Whether to serve the rows from the states cache, as read-only dicts (default: False)
 
     Returns:
-    - A list of state objects from the database that belong to the specified country
+    - A list of state rows (id, name, country_id) that belong to the specified country
     """
+    if cached:
+
+        async def load():
+            rows = await get_states(db, country_id, skip, limit)
+            return [dict(row) for row in rows]
+
+        return await cache.states.get_or_load(f"{country_id}:{skip}:{limit}", load)
     return (
-        db.query(models.State)
-        .filter(models.State.country_id == country_id)
-        .offset(skip)
-        .limit(limit)
+        db.execute(
+            select(models.State.id, models.State.name, models.State.country_id)
+            .where(models.State.country_id == country_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        .mappings()
         .all()
     )
 
 
+@traced
 async def create_country(db: Session, countries: dict):
     """
     Asynchronously creates a new country in the database.
@@ -395,11 +963,13 @@ async def create_country(db: Session, countries: dict):
     """
     db_country = models.Country(**countries)
     db.add(db_country)
+    cache.notify(db, "countries")
     db.commit()
     db.refresh(db_country)
     return db_country
 
 
+@traced
 async def populate_products(db: Session, products: dict):
     """
     Asynchronously creates a new country in the database.
@@ -418,21 +988,59 @@ async def populate_products(db: Session, products: dict):
     return db_country
 
 
-async def get_countries(db: Session, skip: int = 0, limit: int = 500):
+def _query_countries(db: Session, skip: int, limit: int):
+    return (
+        db.execute(
+            select(
+                models.Country.id,
+                models.Country.name,
+                models.Country.alpha_2,
+                models.Country.alpha_3,
+            )
+            .offset(skip)
+            .limit(limit)
+        )
+        .mappings()
+        .all()
+    )
+
+
+@traced
+async def get_countries(
+    db: Session,
+    skip: int = 0,
+    limit: int = 500,
+    coalesce: bool = False,
+    cached: bool = False,
+):
     """
     Asynchronously retrieves a list of countries from the database.
 
+    The rows are read with a Core select, so no ORM objects are built for them.
+
     Args:
         db (Session): The database session.
         skip (int, optional): The number of records to skip. Defaults to 0.
-        limit (int, optional): The maximum number of records to retrieve. Defaults to 100.
+        limit (int, optional): The maximum number of records to retrieve. Defaults to 500.
+        coalesce (bool, optional): Whether to share the query with concurrent identical reads. Defaults to False.
+        cached (bool, optional): Whether to serve the rows from the countries cache, as read-only dicts. Defaults to False.
 
     Returns:
-        List[models.Profile]: A list of profile objects representing the countries retrieved from the database.
+        List[RowMapping]: The country rows (id, name, alpha_2, alpha_3).
     """
-    return db.query(models.Country).offset(skip).limit(limit).all()
+    if cached:
 
+        async def load():
+            rows = await get_countries(db, skip, limit, coalesce=True)
+            return [dict(row) for row in rows]
 
+        return await cache.countries.get_or_load(f"{skip}:{limit}", load)
+    if coalesce:
+        return await reads.do(("countries", skip, limit), _query_countries, skip, limit)
+    return _query_countries(db, skip, limit)
+
+
+@traced
 async def create_product(db: Session, product: schemas.ProductBaseSchema):
     """
     Asynchronously creates a new product in the database.
@@ -451,6 +1059,7 @@ async def create_product(db: Session, product: schemas.ProductBaseSchema):
     return db_product
 
 
+@traced
 async def edit_product(db: Session, user_id: str, product: schemas.UpdateProductSchema):
     """
     An asynchronous function to edit a product in the database.
@@ -475,6 +1084,7 @@ async def edit_product(db: Session, user_id: str, product: schemas.UpdateProduct
                 "_"
             ):  # Ignore private fields (starting with _)
                 setattr(db_product, field_name, value)
+        cache.notify(db, "products", str(product.id))
         db.commit()
         db.refresh(db_product)
         return db_product
@@ -482,21 +1092,54 @@ async def edit_product(db: Session, user_id: str, product: schemas.UpdateProduct
         return None
 
 
-async def get_product(db: Session, product_id: str):
+def _query_product(db: Session, product_id: str, detail: bool):
+    query = db.query(models.Product)
+    if detail:
+        query = query.options(joinedload(models.Product.user))
+    return query.filter(models.Product.id == product_id).first()
+
+
+@traced
+async def get_product(
+    db: Session,
+    product_id: str,
+    detail: bool = False,
+    coalesce: bool = False,
+    cached: bool = False,
+):
     """
     Asynchronously retrieves a product from the database based on the provided product ID.
 
     Args:
         db (Session): The database session.
         product_id (str): The ID of the product to retrieve.
+        detail (bool, optional): Whether to load the owner in the same query. Defaults to False.
+        coalesce (bool, optional): Whether to share the query with concurrent reads of the same product. The result is then detached and must not be modified. Defaults to False.
+        cached (bool, optional): Whether to serve the product from the products cache. The result is then a read-only dict in the shape of schemas.ProductDetailResponseSchema. Defaults to False.
 
     Returns:
         models.Product or None: The retrieved product if found, otherwise None.
     """
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
-
-
-async def get_products(db: Session, skip: int = 0, limit: int = 100):
+    if cached:
+
+        async def load():
+            product = await get_product(db, product_id, detail=True, coalesce=True)
+            if product is None:
+                return None
+            return schemas.ProductDetailResponseSchema.from_orm(product).dict()
+
+        return await cache.products.get_or_load(str(product_id), load)
+    if coalesce:
+        return await reads.do(
+            ("product", str(product_id), detail), _query_product, product_id, detail
+        )
+    return _query_product(db, product_id, detail)
+
+
+@traced
+async def get_products(
+    db: Session, skip: int = 0, limit: int = 100, detail: bool = False
+):
     """
     Asynchronously retrieves a list of products from the database.
 
@@ -504,13 +1147,61 @@ async def get_products(db: Session, skip: int = 0, limit: int = 100):
         db (Session): The database session.
         skip (int, optional): The number of records to skip. Defaults to 0.
         limit (int, optional): The maximum number of records to retrieve. Defaults to 100.
+        detail (bool, optional): Whether to load the owners with one extra IN query. Defaults to False.
 
     Returns:
         List[models.Product]: A list of product objects retrieved from the database.
     """
-    return db.query(models.Product).offset(skip).limit(limit).all()
+    query = db.query(models.Product)
+    if detail:
+        query = query.options(selectinload(models.Product.user))
+    return query.offset(skip).limit(limit).all()
+
+
+@traced
+async def get_product_rows(db: Session, skip: int = 0, limit: int = 100):
+    """
+    Asynchronously retrieves products with their owner summaries as plain dicts.
+
+    This is the fast path behind the product list route: a single Core join, with
+    the owner columns nested into a "user" dict, and no ORM or pydantic objects.
+
+    Args:
+        db (Session): The database session.
+        skip (int, optional): The number of records to skip. Defaults to 0.
+        limit (int, optional): The maximum number of records to retrieve. Defaults to 100.
+
+    Returns:
+        List[dict]: The products in the shape of schemas.ProductDetailResponseSchema.
+    """
+    product = models.Product.__table__
+    owner = (
+        models.User.id,
+        models.User.firstname,
+        models.User.lastname,
+        models.User.companyname,
+        models.User.role,
+    )
+    rows = db.execute(
+        select(product, *owner)
+        .join(models.User, models.User.id == product.c.user_id)
+        .offset(skip)
+        .limit(limit)
+    ).all()
+
+    width = len(product.c)
+    product_keys = product.c.keys()
+    owner_keys = [column.key for column in owner]
+    return [
+        {
+            **dict(zip(product_keys, row[:width])),
+            "user": dict(zip(owner_keys, row[width:])),
+        }
+        for row in rows
+    ]
 
 
+@traced
 async def delete_product(db: Session, product_id: str, user_id: str):
     """
     Asynchronously deletes a product from the database.
@@ -531,6 +1222,7 @@ async def delete_product(db: Session, product_id: str, user_id: str):
     )
     if db_product:
         db.delete(db_product)
+        cache.notify(db, "products", str(product_id))
         db.commit()
         return True
     else:
@@ -9,6 +9,10 @@ from sqlalchemy import (
     Boolean,
     Numeric,
     Integer,
+    Index,
+    Text,
+    UniqueConstraint,
+    func,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -30,8 +34,9 @@ def current_time():
 
 class User(Base):
     __tablename__ = "users"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
     firstname = Column(String(255), nullable=False)
     lastname = Column(String(255), nullable=False)
     role = Column(String(255), nullable=False)
@@ -50,16 +55,22 @@ class User(Base):
     )
     verificationtoken = Column(String(255), nullable=True)
     emailverified = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_users_companyemail_lower", func.lower(companyemail), unique=True),
+    )
     # profiles = relationship("Profile", back_populates="user", cascade="all, delete-orphan")
 
 
 class Profile(Base):
     __tablename__ = "profiles"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    # user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True)
-    user = relationship("User")
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id = Column(
+        UUID(as_uuid=False), ForeignKey("users.id"), nullable=False, unique=True
+    )
+    user = relationship("User", lazy="raise_on_sql")
     createdat = Column(
         TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
     )
@@ -69,22 +80,39 @@ class Profile(Base):
         default=current_time,
         onupdate=current_time,
     )
-    country_id = Column(String(255), ForeignKey("country.id"), nullable=False)
-    country = relationship("Country")
-    state_id = Column(String(255), ForeignKey("state.id"), nullable=False)
-    state = relationship("State")
+    country_id = Column(UUID(as_uuid=False), ForeignKey("country.id"), nullable=False)
+    country = relationship("Country", lazy="raise_on_sql")
+    state_id = Column(UUID(as_uuid=False), ForeignKey("state.id"), nullable=False)
+    state = relationship("State", lazy="raise_on_sql")
     factory_capacity = Column(Numeric, nullable=False)
-    products = Column(String(255), nullable=False)
-    # products = Column(ARRAY(String), nullable=False)
+    products = Column(ARRAY(String), nullable=False)
+
+    __table_args__ = (
+        Index("ix_profiles_products", "products", postgresql_using="gin"),
+        Index("ix_profiles_country_id_state_id", "country_id", "state_id"),
+        Index("ix_profiles_factory_capacity", "factory_capacity"),
+    )
+
+
+class SupplierFacet(Base):
+    # Profiles per location and material, kept current by the crud profile
+    # functions so the product facet of a supplier search needs no unnest scan.
+    __tablename__ = "supplier_facet"
+    country_id = Column(UUID(as_uuid=False), ForeignKey("country.id"), primary_key=True)
+    state_id = Column(UUID(as_uuid=False), ForeignKey("state.id"), primary_key=True)
+    product = Column(String, primary_key=True)
+    profiles = Column(Integer, nullable=False)
 
 
 class Payment(Base):
     __tablename__ = "payment"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    # user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True)
-    user = relationship("User")
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id = Column(
+        UUID(as_uuid=False), ForeignKey("users.id"), nullable=False, index=True
+    )
+    user = relationship("User", lazy="raise_on_sql")
     createdat = Column(
         TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
     )
@@ -101,15 +129,74 @@ class Payment(Base):
     name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False)
     phone = Column(String(255), nullable=False)
+    reference = Column(String(255), nullable=True, unique=True)
+    status = Column(String(50), nullable=False, default="pending")
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    createdat = Column(
+        TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
+    )
+
+    __table_args__ = (UniqueConstraint("user_id", "key"),)
+
+
+class PaymentWebhook(Base):
+    __tablename__ = "payment_webhook"
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    event_id = Column(String(255), nullable=False, unique=True)
+    reference = Column(String(255), nullable=False)
+    status = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    createdat = Column(
+        TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
+    )
+    processedat = Column(TIMESTAMP(timezone=True), nullable=True)
+    nextattemptat = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_payment_webhook_pending",
+            "reference",
+            "createdat",
+            postgresql_where=processedat.is_(None),
+        ),
+    )
+
+
+class JobWatermark(Base):
+    __tablename__ = "job_watermark"
+    name = Column(String(100), primary_key=True)
+    cursor = Column(String(255), nullable=True)
+    completedat = Column(TIMESTAMP(timezone=True), nullable=True)
+    updatedat = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        default=current_time,
+        onupdate=current_time,
+    )
 
 
 class Product(Base):
     __tablename__ = "product"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    # user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True)
-    user = relationship("User")
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id = Column(
+        UUID(as_uuid=False), ForeignKey("users.id"), nullable=False, unique=True
+    )
+    user = relationship("User", lazy="raise_on_sql")
     createdat = Column(
         TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
     )
@@ -127,11 +214,14 @@ class Product(Base):
     shippingterms = Column(String(255), nullable=False)
     location = Column(String(255), nullable=False)
 
+    __table_args__ = (Index("ix_product_user_id_id", "user_id", "id"),)
+
 
 class Country(Base):
     __tablename__ = "country"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
     name = Column(String(255), nullable=False)
     alpha_2 = Column(String(255), nullable=False, unique=True)
     alpha_3 = Column(String(255), nullable=False, unique=True)
@@ -139,17 +229,21 @@ class Country(Base):
 
 class State(Base):
     __tablename__ = "state"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
     name = Column(String, nullable=False)
-    country_id = Column(String(255), ForeignKey("country.id"), nullable=False)
-    country = relationship("Country")
+    country_id = Column(
+        UUID(as_uuid=False), ForeignKey("country.id"), nullable=False, index=True
+    )
+    country = relationship("Country", lazy="raise_on_sql")
 
 
 class AllProducts(Base):
     __tablename__ = "allproducts"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
     name = Column(String(255), nullable=False)
     description = Column(String(255), nullable=False, unique=True)
     createdat = Column(
@@ -165,15 +259,20 @@ class AllProducts(Base):
 
 class Waitlist(Base):
     __tablename__ = "waitlist"
-    # id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
     workemail = Column(String(255), nullable=False)
     firstname = Column(String(255), nullable=False)
     lastname = Column(String(255), nullable=False)
-    country_id = Column(String(255), ForeignKey("country.id"), nullable=False)
-    country = relationship("Country")
-    state_id = Column(String(255), ForeignKey("state.id"), nullable=False)
-    state = relationship("State")
+    country_id = Column(UUID(as_uuid=False), ForeignKey("country.id"), nullable=False)
+    country = relationship("Country", lazy="raise_on_sql")
+    state_id = Column(UUID(as_uuid=False), ForeignKey("state.id"), nullable=False)
+    state = relationship("State", lazy="raise_on_sql")
     createdat = Column(
         TIMESTAMP(timezone=True), nullable=False, default=datetime.datetime.utcnow
     )
+
+    __table_args__ = (
+        Index("ix_waitlist_workemail_lower", func.lower(workemail), unique=True),
+    )
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 import uuid
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, Field, constr
 from typing import Optional, List
 
 
@@ -82,8 +82,42 @@ class ProfileResponseSchema(ProfileBaseSchema):
         orm_mode = True
 
 
-class UpdateProfileSchema(BaseModel):
+class CountrySummarySchema(BaseModel):
+    id: str
+    name: str
+    alpha_2: str
+
+    class Config:
+        orm_mode = True
+
+
+class StateSummarySchema(BaseModel):
     id: str
+    name: str
+
+    class Config:
+        orm_mode = True
+
+
+class OwnerSummarySchema(BaseModel):
+    id: uuid.UUID
+    firstname: str
+    lastname: str
+    companyname: str
+    role: str
+
+    class Config:
+        orm_mode = True
+
+
+class ProfileDetailResponseSchema(ProfileResponseSchema):
+    country: CountrySummarySchema
+    state: StateSummarySchema
+    user: OwnerSummarySchema
+
+
+class UpdateProfileSchema(BaseModel):
+    id: uuid.UUID
     country_id: str | None = None
     state_id: str | None = None
     factory_capacity: int | None = None
@@ -92,10 +126,50 @@ class UpdateProfileSchema(BaseModel):
     # updatedat: datetime | None = None
 
 
+class SupplierSearchResultSchema(BaseModel):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    country_id: str
+    country: str
+    state_id: str
+    state: str
+    factory_capacity: float
+    products: List[str]
+    match_count: int
+
+
+class CountryFacetSchema(BaseModel):
+    id: str
+    name: str
+    count: int
+
+
+class ProductFacetSchema(BaseModel):
+    name: str
+    count: int
+
+
+class SupplierSearchFacetsSchema(BaseModel):
+    countries: List[CountryFacetSchema]
+    products: List[ProductFacetSchema]
+
+
+class SupplierSearchResponseSchema(BaseModel):
+    results: List[SupplierSearchResultSchema]
+    facets: SupplierSearchFacetsSchema
+
+
+class SuggestionSchema(BaseModel):
+    profile_id: uuid.UUID
+    user_id: uuid.UUID
+    score: float
+    shared_products: List[str]
+
+
 class WaitlistBaseSchema(BaseModel):
     workemail: EmailStr
-    firstname: str
-    lastname: str
+    firstname: constr(max_length=255)
+    lastname: constr(max_length=255)
     country_id: str
     state_id: str
 
@@ -127,29 +201,58 @@ class ProductResponseSchema(ProductBaseSchema):
         orm_mode = True
 
 
+class ProductDetailResponseSchema(ProductResponseSchema):
+    user: OwnerSummarySchema
+
+
 class UpdateProductSchema(ProductBaseSchema):
     id: uuid.UUID
 
 
-# class CreatePaymentSchema(BaseModel):
-#     name: str
-#     email: str
-#     phone: str
-#     description: str
-#     start_date: datetime
-#     end_date: datetime
-#     callback: str
-#     cost: str
-#     currency: str
+class CreatePaymentSchema(BaseModel):
+    name: str
+    email: EmailStr
+    phone: str
+    description: str
+    start_date: date
+    end_date: date
+    callback: str
+    cost: float
+    currency: str
+
 
+class PaymentResponseSchema(BaseModel):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    reference: str | None = None
+    status: str
+    cost: float
+    currency: str
+    createdat: datetime
+
+    class Config:
+        orm_mode = True
 
-# class PaymentResponseSchema(BaseModel):
-#     user_id: uuid.UUID
-#     createdat: datetime
 
-#     class Config:
-#         orm_mode = True
+class ProfilerArmSchema(BaseModel):
+    route: str
+    requests: int = Field(1, ge=1, le=50)
+    interval_ms: float = Field(5.0, ge=1, le=100)
 
 
-# class PaymentBaseSchema(BaseModel):
-#     name: str
+class ProfileSummarySchema(BaseModel):
+    id: str
+    route: str
+    method: str
+    status: int
+    duration_ms: float
+    samples: int
+
+
+class QueryFingerprintSchema(BaseModel):
+    fingerprint: str
+    count: int
+    slow: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
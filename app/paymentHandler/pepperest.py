@@ -0,0 +1,343 @@
+import asyncio
+import hashlib
+import hmac
+import random
+import time
+from datetime import date
+from typing import Optional
+
+import httpx
+
+from ..core.config import settings
+from ..core import metrics, tracing
+
+
+CREATE_PAYMENT_PATH = "/payment/createPayment"
+PAYMENT_STATUS_PATH = "/payment/getPaymentStatus"
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Statuses the gateway will not move a payment out of.
+FINAL_STATUSES = ("completed", "cancelled", "refunded", "failed")
+
+
+gateway_requests = metrics.Counter(
+    "gateway_requests",
+    "Pepperest calls per operation and outcome, including retries.",
+    ["operation", "outcome"],
+)
+gateway_request_duration = metrics.Histogram(
+    "gateway_request_duration_seconds",
+    "Latency of Pepperest calls per operation, including retries.",
+    ["operation"],
+)
+
+
+def _observe(operation: str, started: float, error: bool = False):
+    gateway_request_duration.observe(time.perf_counter() - started, operation)
+    gateway_requests.inc(operation, "error" if error else "ok")
+
+
+class GatewayError(Exception):
+    pass
+
+
+class CircuitOpenError(GatewayError):
+    pass
+
+
+class GatewayOutcomeUnknown(GatewayError):
+    """
+    A call that is not idempotent reached the gateway but its outcome is unknown:
+    the gateway may have applied it, so it must not be repeated blindly.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling the gateway after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail
+    fast for `reset_timeout` seconds; then a single trial call is let through and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """
+        Lets another trial call through after one ended without an outcome.
+        """
+        self._trial_in_flight = False
+
+
+class PepperestClient:
+    """
+    Async client for the Pepperest escrow API.
+
+    A single pooled `httpx.AsyncClient` is reused across requests so connections
+    are kept alive. Every call has its own timeout, transient failures are retried
+    with full-jitter exponential backoff and a circuit breaker sheds calls while the
+    gateway is down. Calls that are not idempotent (creating a payment) are only
+    retried when the request never reached the gateway.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.PEPPEREST_BASE_URL,
+        api_key: str = settings.PEPPEREST_API_KEY,
+        timeout: float = settings.PEPPEREST_TIMEOUT_SECONDS,
+        max_retries: int = 3,
+        backoff: float = 0.2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.transport = transport
+        self.breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Api-Key": self.api_key},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=20,
+                    max_keepalive_connections=10,
+                    keepalive_expiry=30,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        """
+        Closes the pooled connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        idempotent: bool,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> dict:
+        trial = self.breaker.state == "half-open"
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Payment gateway unavailable ({operation})")
+        try:
+            return await self._send(
+                operation, method, path, idempotent, timeout, **kwargs
+            )
+        finally:
+            # A cancelled trial, or one that raised before recording its outcome,
+            # must not keep the half-open circuit shut.
+            if trial:
+                self.breaker.release_trial()
+
+    async def _send(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        idempotent: bool,
+        timeout: Optional[float],
+        **kwargs,
+    ) -> dict:
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                with tracing.span(
+                    f"pepperest.{operation}",
+                    **{"http.method": method, "http.path": path, "attempt": attempt},
+                ):
+                    response = await self.client.request(
+                        method,
+                        path,
+                        timeout=timeout or self.timeout,
+                        headers=tracing.propagation_headers(),
+                        **kwargs,
+                    )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                error = e
+            except httpx.TransportError as e:
+                error = e
+                if not idempotent:
+                    _observe(operation, started, error=True)
+                    self.breaker.record_failure()
+                    raise GatewayOutcomeUnknown(f"{operation} failed: {e}") from e
+            else:
+                if response.status_code in RETRYABLE_STATUS_CODES and idempotent:
+                    error = GatewayError(f"{operation} returned {response.status_code}")
+                elif response.status_code >= 500:
+                    _observe(operation, started, error=True)
+                    self.breaker.record_failure()
+                    failure = GatewayError if idempotent else GatewayOutcomeUnknown
+                    raise failure(f"{operation} returned {response.status_code}")
+                elif response.status_code >= 400:
+                    _observe(operation, started, error=True)
+                    self.breaker.record_success()
+                    raise GatewayError(
+                        f"{operation} rejected ({response.status_code}): {response.text}"
+                    )
+                else:
+                    _observe(operation, started)
+                    self.breaker.record_success()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        failure = GatewayError if idempotent else GatewayOutcomeUnknown
+                        raise failure(f"{operation} returned invalid JSON") from e
+
+            _observe(operation, started, error=True)
+            if attempt < self.max_retries:
+                await asyncio.sleep(random.uniform(0, self.backoff * 2**attempt))
+
+        self.breaker.record_failure()
+        raise GatewayError(f"{operation} failed after retries: {error}")
+
+    async def create_payment(
+        self, payment, start_date: date, end_date: date, timeout: Optional[float] = None
+    ) -> dict:
+        """
+        Creates an escrow payment for a `models.Payment` (or an object with the same fields).
+
+        Args:
+            payment: The payment holding the buyer, description, callback and cost.
+            start_date (date): The escrow start date.
+            end_date (date): The escrow end date.
+            timeout (float, optional): Overrides the default timeout for this call.
+
+        Returns:
+            dict: The decoded gateway response.
+
+        Raises:
+            GatewayOutcomeUnknown: If the request reached the gateway but timed out,
+                failed with a 5xx or returned an unreadable body; the escrow may exist.
+            GatewayError: If the request never reached the gateway or was rejected.
+        """
+        payload = {
+            "buyer_name": payment.name,
+            "buyer_email": payment.email,
+            "buyer_phone": payment.phone,
+            "description": payment.description,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "callback": payment.callback,
+            "cost": str(payment.cost),
+            "currency": payment.currency,
+        }
+        return await self._request(
+            "create_payment",
+            "POST",
+            CREATE_PAYMENT_PATH,
+            idempotent=False,
+            timeout=timeout,
+            json=payload,
+        )
+
+    async def get_payment_status(
+        self, reference: str, timeout: Optional[float] = None
+    ) -> dict:
+        """
+        Fetches the current status of an escrow payment.
+
+        Args:
+            reference (str): The gateway reference of the payment.
+            timeout (float, optional): Overrides the default timeout for this call.
+
+        Returns:
+            dict: The decoded gateway response.
+        """
+        return await self._request(
+            "get_payment_status",
+            "GET",
+            PAYMENT_STATUS_PATH,
+            idempotent=True,
+            timeout=timeout,
+            params={"reference": reference},
+        )
+
+
+def payment_reference(body: dict) -> Optional[str]:
+    """
+    Extracts the payment reference from a gateway response.
+    """
+    data = body.get("data") or {}
+    return data.get("reference")
+
+
+def payment_status(body: dict) -> Optional[str]:
+    """
+    Extracts the payment status from a gateway response.
+    """
+    data = body.get("data") or {}
+    return data.get("status")
+
+
+def verify_webhook_signature(raw: bytes, signature: Optional[str]) -> bool:
+    """
+    Checks a webhook's HMAC-SHA256 signature against PEPPEREST_WEBHOOK_SECRET.
+
+    The signature is the hex digest of the raw body, optionally prefixed with
+    "sha256=". Every webhook is rejected while no secret is configured.
+    """
+    if not settings.PEPPEREST_WEBHOOK_SECRET or not signature:
+        return False
+    expected = hmac.new(
+        settings.PEPPEREST_WEBHOOK_SECRET.encode("utf-8"), raw, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256="))
+
+
+pepperest = PepperestClient()
+
+metrics.Gauge(
+    "gateway_circuit_open",
+    "1 while the Pepperest circuit breaker is open.",
+    function=lambda: int(pepperest.breaker.state == "open"),
+)
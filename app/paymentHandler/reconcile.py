@@ -0,0 +1,309 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import String, cast, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID, insert
+
+from ..core.config import settings
+from ..core.database import SessionLocal, advisory_lock
+from ..models import models
+from .pepperest import (
+    FINAL_STATUSES,
+    CircuitOpenError,
+    GatewayError,
+    PepperestClient,
+    payment_status,
+    pepperest,
+)
+
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "payment_reconciliation"
+LOCK_NAME = "payment_reconciliation"
+FULL_SWEEP_WATERMARK_NAME = "payment_reconciliation_full"
+
+
+class RateLimiter:
+    """
+    Spaces calls so that no more than `rate` start per second.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class PaymentReconciler:
+    """
+    Brings stored payment statuses in line with the gateway.
+
+    A run only asks the gateway about open payments whose row changed since the
+    last completed run started (`completedat` in `job_watermark`), which covers
+    new payments and those a webhook moved. Every `full_sweep_interval` seconds a
+    full sweep checks every open payment instead, catching gateway changes whose
+    webhook never arrived.
+
+    Open payments are read in keyset pages ordered by id. The statuses of a page
+    are fetched concurrently, bounded by `concurrency` in-flight calls and `rate`
+    calls per second, and every change in the page is written with a single
+    UPDATE ... FROM (VALUES ...). Rows that already hold the gateway status are
+    not touched, and rows updated after the run started (by a webhook) are left
+    alone.
+
+    The keyset cursor is stored in `job_watermark` in the same transaction as each
+    page's update, so an interrupted run resumes after the last reconciled page
+    instead of starting over. Incremental runs and full sweeps keep separate
+    watermark rows.
+
+    Payments stored as "unknown" (the gateway may or may not have created the
+    escrow, see `routers.peppa.transaction`) have no reference to look up. Each
+    run counts them and logs a warning so they are matched by hand against the
+    gateway's records.
+
+    Every app worker runs the schedule, but a run only starts while its worker
+    holds the `payment_reconciliation` advisory lock, so runs never overlap.
+
+    The job can be exercised locally by passing a `PepperestClient` whose transport
+    is `httpx.ASGITransport(app=app.paymentHandler.stub.app)`.
+    """
+
+    def __init__(
+        self,
+        client: PepperestClient = pepperest,
+        interval: float = settings.RECONCILE_INTERVAL_SECONDS,
+        full_sweep_interval: float = settings.RECONCILE_FULL_SWEEP_SECONDS,
+        page_size: int = settings.RECONCILE_PAGE_SIZE,
+        concurrency: int = settings.RECONCILE_CONCURRENCY,
+        rate: float = settings.RECONCILE_RATE_PER_SECOND,
+        session_factory=SessionLocal,
+    ):
+        self.client = client
+        self.interval = interval
+        self.full_sweep_interval = full_sweep_interval
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.rate = rate
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Starts reconciling every `interval` seconds.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the schedule; a run in progress resumes from its watermark next time.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with advisory_lock(LOCK_NAME) as locked:
+                    if locked:
+                        stats = await self.run_once()
+                        logger.info("Payment reconciliation finished: %s", stats)
+            except Exception:
+                logger.exception("Payment reconciliation failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, int]:
+        """
+        Reconciles the open payments changed since the last run, or all of them
+        when a full sweep is due, resuming from the stored watermark.
+
+        Returns:
+            dict: The number of payments checked, updated and failed, whether it was
+                a full sweep and the number of payments with an unknown outcome.
+        """
+        started_at = datetime.datetime.utcnow()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate)
+
+        watermarks = await asyncio.to_thread(self._load_watermarks)
+        cursor, since = watermarks[WATERMARK_NAME]
+        full_cursor, last_full_sweep = watermarks[FULL_SWEEP_WATERMARK_NAME]
+        full_sweep = (
+            since is None
+            or full_cursor is not None
+            or last_full_sweep is None
+            or started_at - last_full_sweep
+            >= datetime.timedelta(seconds=self.full_sweep_interval)
+        )
+        if full_sweep:
+            name, cursor, since = FULL_SWEEP_WATERMARK_NAME, full_cursor, None
+        else:
+            name = WATERMARK_NAME
+        stats = {"checked": 0, "updated": 0, "errors": 0, "full_sweep": full_sweep}
+
+        while True:
+            page = await asyncio.to_thread(self._fetch_page, cursor, since)
+            if not page:
+                break
+
+            statuses = await asyncio.gather(
+                *(
+                    self._fetch_status(reference, semaphore, limiter)
+                    for _, reference, _ in page
+                )
+            )
+            changes = []
+            for (payment_id, _, current), remote in zip(page, statuses):
+                if remote is None:
+                    stats["errors"] += 1
+                elif remote != current:
+                    changes.append({"id": payment_id, "status": remote})
+
+            cursor = page[-1][0]
+            stats["checked"] += len(page)
+            stats["updated"] += await asyncio.to_thread(
+                self._apply, name, changes, cursor, started_at
+            )
+            if len(page) < self.page_size:
+                break
+
+        await asyncio.to_thread(self._complete, full_sweep, started_at)
+        stats["unknown"] = await asyncio.to_thread(self._count_unknown)
+        if stats["unknown"]:
+            logger.warning(
+                "%d payments have an unknown gateway outcome and need manual "
+                "reconciliation",
+                stats["unknown"],
+            )
+        return stats
+
+    async def _fetch_status(
+        self, reference: str, semaphore: asyncio.Semaphore, limiter: RateLimiter
+    ) -> Optional[str]:
+        async with semaphore:
+            await limiter.wait()
+            try:
+                return payment_status(await self.client.get_payment_status(reference))
+            except CircuitOpenError:
+                # Abort the run; the watermark keeps the last finished page.
+                raise
+            except GatewayError as e:
+                logger.warning("Could not reconcile payment %s: %s", reference, e)
+                return None
+
+    def _load_watermarks(
+        self,
+    ) -> Dict[str, Tuple[Optional[str], Optional[datetime.datetime]]]:
+        """
+        Returns the (cursor, completedat) of both watermark rows, in naive UTC.
+        """
+        names = (WATERMARK_NAME, FULL_SWEEP_WATERMARK_NAME)
+        watermarks = {name: (None, None) for name in names}
+        with self.session_factory() as db:
+            for name, cursor, completedat in db.execute(
+                select(
+                    models.JobWatermark.name,
+                    models.JobWatermark.cursor,
+                    models.JobWatermark.completedat,
+                ).where(models.JobWatermark.name.in_(names))
+            ):
+                if completedat is not None and completedat.tzinfo is not None:
+                    completedat = completedat.astimezone(datetime.timezone.utc).replace(
+                        tzinfo=None
+                    )
+                watermarks[name] = (cursor, completedat)
+        return watermarks
+
+    def _fetch_page(
+        self, cursor: Optional[str], since: Optional[datetime.datetime]
+    ) -> List[Tuple[str, str, str]]:
+        stmt = (
+            select(models.Payment.id, models.Payment.reference, models.Payment.status)
+            .where(models.Payment.reference.is_not(None))
+            .where(models.Payment.status.not_in(FINAL_STATUSES))
+            .order_by(models.Payment.id)
+            .limit(self.page_size)
+        )
+        if cursor is not None:
+            stmt = stmt.where(models.Payment.id > cursor)
+        if since is not None:
+            stmt = stmt.where(models.Payment.updatedat >= since)
+        with self.session_factory() as db:
+            return [tuple(row) for row in db.execute(stmt)]
+
+    def _count_unknown(self) -> int:
+        with self.session_factory() as db:
+            return db.scalar(
+                select(func.count())
+                .select_from(models.Payment)
+                .where(models.Payment.status == "unknown")
+            )
+
+    def _apply(
+        self,
+        name: str,
+        changes: List[dict],
+        cursor: str,
+        started_at: datetime.datetime,
+    ) -> int:
+        with self.session_factory() as db:
+            updated = 0
+            if changes:
+                rows = values(
+                    column("id", String), column("status", String), name="changes"
+                ).data([(change["id"], change["status"]) for change in changes])
+                result = db.execute(
+                    update(models.Payment)
+                    .where(models.Payment.id == cast(rows.c.id, UUID(as_uuid=False)))
+                    .where(models.Payment.status.is_distinct_from(rows.c.status))
+                    .where(models.Payment.updatedat < started_at)
+                    .values(status=rows.c.status)
+                )
+                updated = result.rowcount
+            self._save_watermark(db, name, cursor=cursor)
+            db.commit()
+        return updated
+
+    def _complete(self, full_sweep: bool, started_at: datetime.datetime):
+        with self.session_factory() as db:
+            # A full sweep also covers everything the next incremental run would check.
+            names = (
+                (FULL_SWEEP_WATERMARK_NAME, WATERMARK_NAME)
+                if full_sweep
+                else (WATERMARK_NAME,)
+            )
+            for name in names:
+                self._save_watermark(db, name, cursor=None, completedat=started_at)
+            db.commit()
+
+    @staticmethod
+    def _save_watermark(db, name: str, **fields):
+        stmt = insert(models.JobWatermark).values(name=name, **fields)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[models.JobWatermark.name],
+                set_={
+                    **{name: stmt.excluded[name] for name in fields},
+                    "updatedat": stmt.excluded.updatedat,
+                },
+            )
+        )
+
+
+payment_reconciler = PaymentReconciler()
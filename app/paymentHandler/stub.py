@@ -0,0 +1,77 @@
+"""
+A local stand-in for the Pepperest escrow API.
+
+Run it with `uvicorn app.paymentHandler.stub:app --port 8001` and point
+PEPPEREST_BASE_URL at it, or pass `httpx.ASGITransport(app=app)` as the
+`transport` of a `PepperestClient` to exercise the client in-process.
+"""
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException, status
+from pydantic import BaseModel
+
+
+app = FastAPI(title="Pepperest stub")
+
+payments = {}
+
+
+class StubPaymentSchema(BaseModel):
+    buyer_name: str
+    buyer_email: str
+    buyer_phone: str
+    description: str
+    start_date: str
+    end_date: str
+    callback: str
+    cost: str
+    currency: str
+
+
+class StubStatusSchema(BaseModel):
+    status: str
+
+
+@app.post("/payment/createPayment")
+async def create_payment(payment: StubPaymentSchema, api_key: str = Header(None)):
+    """
+    Records the payment and returns a reference and payment link.
+    """
+    if not api_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    reference = uuid.uuid4().hex
+    payments[reference] = {**payment.dict(), "status": "pending"}
+    return {
+        "status": True,
+        "data": {
+            "reference": reference,
+            "status": "pending",
+            "payment_link": f"https://pepperest.invalid/pay/{reference}",
+        },
+    }
+
+
+@app.get("/payment/getPaymentStatus")
+async def get_payment_status(reference: str, api_key: str = Header(None)):
+    """
+    Returns the stored status of a payment.
+    """
+    if not api_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if reference not in payments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return {
+        "status": True,
+        "data": {"reference": reference, "status": payments[reference]["status"]},
+    }
+
+
+@app.put("/payment/{reference}/status")
+async def set_payment_status(reference: str, body: StubStatusSchema):
+    """
+    Test hook: moves a payment to another status.
+    """
+    if reference not in payments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    payments[reference]["status"] = body.status
+    return {"reference": reference, "status": body.status}
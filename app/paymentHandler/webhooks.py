@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from sqlalchemy import func, or_, select, update
+
+from ..core.config import settings
+from ..core.database import SessionLocal, advisory_lock
+from ..models import models
+from .pepperest import FINAL_STATUSES
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "payment_webhooks"
+
+
+class WebhookWorker:
+    """
+    Applies queued gateway webhooks to their payments.
+
+    The webhook endpoint only stores events, so the gateway gets its
+    acknowledgement without waiting on payment updates. This worker polls the
+    queue and applies each reference's events in arrival order. Only the worker
+    holding the `payment_webhooks` advisory lock polls at a time, and a
+    transaction-scoped advisory lock per payment reference also keeps a manual
+    `process_batch` from applying events for the same payment concurrently.
+
+    A reference's events may arrive out of order, so a final status among them
+    wins over a later non-final one, and a payment that already has a final
+    status is never moved out of it.
+
+    An event can arrive before the payment it refers to is stored. Its events
+    then stay pending and are retried with exponential backoff (`nextattemptat`),
+    so unmatched references do not fill every batch, until they are older than
+    `unmatched_max_age` seconds; only then are they marked processed and logged
+    as unmatched.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.WEBHOOK_POLL_SECONDS,
+        batch_size: int = settings.WEBHOOK_BATCH_SIZE,
+        unmatched_max_age: float = settings.WEBHOOK_UNMATCHED_MAX_AGE_SECONDS,
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.unmatched_max_age = unmatched_max_age
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Starts the background polling loop.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the polling loop; unprocessed events stay queued.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with advisory_lock(LOCK_NAME) as locked:
+                    processed = (
+                        await asyncio.to_thread(self.process_batch) if locked else 0
+                    )
+            except Exception:
+                logger.exception("Payment webhook batch failed")
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def process_batch(self) -> int:
+        """
+        Applies the pending events of up to `batch_size` payment references.
+
+        Returns:
+            int: The number of references whose payment was updated.
+        """
+        with SessionLocal() as db:
+            references = db.scalars(
+                select(models.PaymentWebhook.reference)
+                .where(models.PaymentWebhook.processedat.is_(None))
+                .where(
+                    or_(
+                        models.PaymentWebhook.nextattemptat.is_(None),
+                        models.PaymentWebhook.nextattemptat <= func.now(),
+                    )
+                )
+                .group_by(models.PaymentWebhook.reference)
+                .order_by(func.min(models.PaymentWebhook.createdat))
+                .limit(self.batch_size)
+            ).all()
+
+            processed = 0
+            for reference in references:
+                if self._apply(db, reference):
+                    processed += 1
+            return processed
+
+    def _apply(self, db, reference: str) -> bool:
+        locked = db.scalar(
+            select(func.pg_try_advisory_xact_lock(func.hashtext(reference)))
+        )
+        if not locked:
+            # Another worker owns this payment; its events will be applied there.
+            db.rollback()
+            return False
+
+        events = db.execute(
+            select(
+                models.PaymentWebhook.id,
+                models.PaymentWebhook.status,
+                models.PaymentWebhook.createdat,
+            )
+            .where(models.PaymentWebhook.reference == reference)
+            .where(models.PaymentWebhook.processedat.is_(None))
+            .order_by(models.PaymentWebhook.createdat, models.PaymentWebhook.id)
+        ).all()
+        if not events:
+            db.commit()
+            return False
+
+        event_ids = [event.id for event in events]
+        target = _target_status(events)
+        matched = db.execute(
+            update(models.Payment)
+            .where(models.Payment.reference == reference)
+            .where(models.Payment.status.not_in(FINAL_STATUSES))
+            .values(status=target)
+        ).rowcount
+        now = datetime.datetime.utcnow()
+        if not matched:
+            current = db.scalar(
+                select(models.Payment.status).where(
+                    models.Payment.reference == reference
+                )
+            )
+            if current is not None:
+                if current != target:
+                    logger.warning(
+                        "Ignoring webhook status %s for payment %s, already %s",
+                        target,
+                        reference,
+                        current,
+                    )
+            else:
+                oldest = events[0].createdat
+                if oldest.tzinfo is not None:
+                    oldest = oldest.astimezone(datetime.timezone.utc).replace(
+                        tzinfo=None
+                    )
+                age = (now - oldest).total_seconds()
+                if age < self.unmatched_max_age:
+                    # The payment may not be committed yet; retry once the
+                    # events are twice as old, so unmatched references do not
+                    # crowd out the rest of the queue.
+                    delay = max(age, self.poll_interval)
+                    db.execute(
+                        update(models.PaymentWebhook)
+                        .where(models.PaymentWebhook.id.in_(event_ids))
+                        .values(nextattemptat=now + datetime.timedelta(seconds=delay))
+                    )
+                    db.commit()
+                    return False
+                logger.warning(
+                    "Dropping %d webhook events for unknown payment %s",
+                    len(events),
+                    reference,
+                )
+
+        db.execute(
+            update(models.PaymentWebhook)
+            .where(models.PaymentWebhook.id.in_(event_ids))
+            .values(processedat=now)
+        )
+        db.commit()
+        return bool(matched)
+
+
+def _target_status(events) -> str:
+    """
+    Returns the status a reference's events, in arrival order, leave the payment in.
+
+    The gateway never moves a payment out of a final status, so a final status
+    seen in the events wins over non-final ones delivered after it.
+    """
+    final = [event.status for event in events if event.status in FINAL_STATUSES]
+    return final[-1] if final else events[-1].status
+
+
+webhook_worker = WebhookWorker()
@@ -1,4 +1,3 @@
-import pycountry
 from sqlalchemy.orm import Session
 from ..models import crud
 
@@ -13,6 +12,8 @@ async def get_countries():
         - "alpha_2" (str): The two-letter ISO 3166-1 alpha-2 country code.
         - "alpha_3" (str): The three-letter ISO 3166-1 alpha-3 country code.
     """
+    import pycountry
+
     countries = []
     for country in pycountry.countries:
         countries.append(
@@ -40,6 +41,8 @@ async def get_states(country_alpha_2):
         >>> await get_states("US")
         [{"name": "Alabama"}, {"name": "Alaska"}, ...]
     """
+    import pycountry
+
     subdivisions = pycountry.subdivisions.get(country_code=country_alpha_2)
     states = []
     if subdivisions:
@@ -1,4 +1,3 @@
-import pycountry
 from sqlalchemy.orm import Session
 from ..models import crud
 
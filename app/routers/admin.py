@@ -0,0 +1,101 @@
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, status, APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from ..models import schemas
+from ..core import oauth2
+from ..core.profiler import request_profiler
+from ..core.querylog import query_log
+
+
+router = APIRouter(dependencies=[Depends(oauth2.require_admin)])
+
+
+@router.post("/profiler", status_code=status.HTTP_202_ACCEPTED)
+async def arm_profiler(body: schemas.ProfilerArmSchema):
+    """
+    Profiles the next requests to a route with the sampling profiler.
+
+    Parameters:
+        - body (schemas.ProfilerArmSchema): The route template (e.g. /api/auths/login), the number of requests and the sampling interval.
+
+    Returns:
+        - dict: The armed route and number of requests.
+    """
+    request_profiler.arm(body.route, body.requests, body.interval_ms / 1000)
+    return {"route": body.route, "requests": body.requests}
+
+
+@router.delete("/profiler", status_code=status.HTTP_204_NO_CONTENT)
+async def disarm_profiler(route: Optional[str] = None):
+    """
+    Stops profiling a route, or every route when none is given.
+
+    Parameters:
+        - route (str, optional): The route template to stop profiling.
+    """
+    request_profiler.disarm(route)
+
+
+@router.get(
+    "/profiles",
+    status_code=status.HTTP_200_OK,
+    response_model=List[schemas.ProfileSummarySchema],
+)
+async def get_profiles():
+    """
+    Lists the most recent request profiles, newest last.
+
+    Returns:
+        - List[schemas.ProfileSummarySchema]: The stored profiles without their stacks.
+    """
+    return request_profiler.summaries()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile_stacks(profile_id: str):
+    """
+    Returns a profile as collapsed stacks, ready for flamegraph.pl or speedscope.
+
+    Parameters:
+        - profile_id (str): The ID from the X-Profile-Id response header.
+
+    Returns:
+        - str: One "frame;frame;frame count" line per distinct stack.
+
+    Raises:
+        - HTTPException 404: If the profile is unknown or was evicted.
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+    return profile["stacks"]
+
+
+@router.get(
+    "/slow-queries",
+    status_code=status.HTTP_200_OK,
+    response_model=List[schemas.QueryFingerprintSchema],
+)
+async def get_slow_queries(limit: int = Query(20, ge=1, le=200)):
+    """
+    Lists the statement fingerprints with the most total execution time.
+
+    Parameters:
+        - limit (int, optional): The number of fingerprints to return. Defaults to 20.
+
+    Returns:
+        - List[schemas.QueryFingerprintSchema]: Count, slow count and timings per fingerprint, highest total first.
+    """
+    return query_log.top(limit)
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_slow_queries():
+    """
+    Clears the statement fingerprint statistics.
+    """
+    query_log.reset()
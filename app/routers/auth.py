@@ -1,7 +1,17 @@
 from datetime import datetime
 from datetime import timedelta
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, APIRouter, Response, Request
+from sqlalchemy.exc import IntegrityError
+from fastapi import (
+    Depends,
+    HTTPException,
+    status,
+    APIRouter,
+    Response,
+    Request,
+    BackgroundTasks,
+)
+from fastapi.concurrency import run_in_threadpool
 from random import choices
 from pydantic import EmailStr
 import string
@@ -12,6 +22,7 @@ from ..core.database import get_db
 from ..core.config import settings
 from ..core import utils
 from ..core.oauth2 import AuthJWT
+from ..core.bloom import user_emails
 
 
 from ..mailHandler.email import Email
@@ -29,54 +40,71 @@ REFRESH_TOKEN_EXPIRE_MINUTES = settings.REFRESH_TOKEN_EXPIRES_IN
     response_model=schemas.UserResponseSchema,
 )
 async def signup(
-    user: schemas.CreateUserSchema, request: Request, db: Session = Depends(get_db)
+    user: schemas.CreateUserSchema,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
 ):
     """
     Handle user signup with validation, hashing of password, and sending verification email.
 
+    The email is normalized before the insert, the insert itself detects an existing
+    email, and the verification email is sent after the response has been returned.
+
     Args:
         user (schemas.CreateUserSchema): The user data to be created.
         request (Request): The request object for the HTTP request.
+        background_tasks (BackgroundTasks): Runs the verification email after the response.
         db (Session, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
         schemas.UserResponseSchema: The newly created user data.
     """
     try:
-        user_exists = await crud.get_user_by_email(db, email=user.companyemail)
-        if user_exists:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT, detail="Email already exists"
-            )
-
-        hashed_password = utils.hash_password(user.password)
-        user.password = hashed_password.decode("utf-8")
         user.companyemail = user.companyemail.lower()
 
-        try:
-            otp = "".join(choices(string.digits, k=OTP_Length))
-            user.verificationtoken = otp
-            try:
-                await crud.create_user(db, user)
-            except Exception as e:
+        # Only emails the prefilter cannot rule out cost a lookup; rejecting them
+        # here avoids spending bcrypt time on a signup that would conflict anyway.
+        if user_emails.might_exist(user.companyemail):
+            if await crud.get_user_by_email(db, email=user.companyemail):
                 raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"{e}: Error creating user in the db",
+                    status_code=status.HTTP_409_CONFLICT, detail="Email already exists"
                 )
 
-            await Email(
-                user=user.lastname, token=otp, email=[EmailStr(user.companyemail)]
-            ).sendVerificationEmail()
-
-            new_user = await crud.get_user_by_email(db, email=user.companyemail)
-            return new_user
+        # bcrypt releases the GIL, so hashing in the threadpool keeps the event loop
+        # free to serve other requests' DB round trips in the meantime.
+        hashed_password = await run_in_threadpool(utils.hash_password, user.password)
+        user.password = hashed_password.decode("utf-8")
 
+        otp = "".join(choices(string.digits, k=OTP_Length))
+        user.verificationtoken = otp
+        try:
+            new_user = await crud.create_user(db, user)
+        except IntegrityError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Phone number already exists",
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"{e}: There was an error sending verification mail",
+                detail=f"{e}: Error creating user in the db",
             )
 
+        if not new_user:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Email already exists"
+            )
+        user_emails.add(new_user.companyemail)
+
+        background_tasks.add_task(
+            Email(
+                user=user.lastname, token=otp, email=[EmailStr(user.companyemail)]
+            ).sendVerificationEmail
+        )
+
+        return new_user
+
     except HTTPException as he:
         raise he
 
@@ -106,6 +134,7 @@ async def verify_email(
         dict: A dictionary with the status and message of the verification process.
     """
     try:
+        verification_data.companyemail = verification_data.companyemail.lower()
         user = await crud.get_user_by_email(db, email=verification_data.companyemail)
         if (
             user is not None
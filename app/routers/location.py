@@ -1,14 +1,22 @@
+import uuid
+
 from fastapi import Depends, HTTPException, status, APIRouter
 from sqlalchemy.orm import Session
 
 from ..core.database import get_db
 from ..models import crud
+from ..core.responses import ORJSONResponse
+from ..core.querylog import query_budget
 
 
 router = APIRouter()
 
 
-@router.get("/countries", status_code=status.HTTP_200_OK)
+@router.get(
+    "/countries",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(1))],
+)
 async def get_countries(db: Session = Depends(get_db)):
     """
     Asynchronously retrieves a list of countries from the database.
@@ -17,21 +25,27 @@ async def get_countries(db: Session = Depends(get_db)):
     - db (Session, optional): The database session. Defaults to the result of the get_db function.
 
     Returns:
-    - A list of country objects from the database.
+    - A list of country rows from the database, encoded without pydantic validation.
     """
-    return await crud.get_countries(db)
+    return ORJSONResponse(await crud.get_countries(db, cached=True))
 
 
-@router.get("/states", status_code=status.HTTP_200_OK)
-async def get_states(country_id: str, db: Session = Depends(get_db)):
+@router.get(
+    "/states",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(query_budget(1))],
+)
+async def get_states(country_id: uuid.UUID, db: Session = Depends(get_db)):
     """
     Asynchronously retrieves a list of states from the database based on the provided country ID.
 
     Parameters:
-    - country_id (str): The ID of the country for which states are being retrieved.
+    - country_id (uuid.UUID): The ID of the country for which states are being retrieved.
     - db (Session, optional): The database session. Defaults to the result of the get_db function.
 
     Returns:
-    - A list of state objects from the database that belong to the specified country.
+    - A list of state rows from the database that belong to the specified country, encoded without pydantic validation.
     """
-    return await crud.get_states(db, country_id=country_id)
+    return ORJSONResponse(
+        await crud.get_states(db, country_id=str(country_id), cached=True)
+    )
@@ -1,70 +1,244 @@
-from datetime import datetime
-from datetime import timedelta
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, APIRouter, Response, Request
 import hashlib
-from pydantic import EmailStr
-import string
-import requests
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, status, APIRouter, Header, Request
 
 
 from ..models import schemas, crud
 from ..core.database import get_db
-from ..core.config import settings
-from ..core import utils
 from ..core import oauth2
-from ..core.oauth2 import AuthJWT
+from ..core import idempotency
+from ..paymentHandler.pepperest import (
+    pepperest,
+    payment_reference,
+    payment_status,
+    verify_webhook_signature,
+    CircuitOpenError,
+    GatewayError,
+    GatewayOutcomeUnknown,
+)
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+UNKNOWN_OUTCOME_DETAIL = (
+    "The payment gateway did not confirm the payment; it will be reconciled"
+)
+
 
 @router.post(
     "/payment-transaction",
     status_code=status.HTTP_201_CREATED,
-    response_model=schemas.ProfileResponseSchema,
+    response_model=schemas.PaymentResponseSchema,
 )
 async def transaction(
-    profile: schemas.ProfileBaseSchema,
+    payment: schemas.CreatePaymentSchema,
     db: Session = Depends(get_db),
     user_id=Depends(oauth2.require_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
+    """
+    Creates an escrow payment on the Pepperest gateway and stores it.
+
+    When an Idempotency-Key header is sent, the first response for that key is
+    stored and replayed for every retry, so a retried request never creates a
+    second escrow payment.
+
+    The payment row is stored as "initiated" before the gateway is called. A
+    call the gateway never received or rejected marks it "failed" and frees the
+    Idempotency-Key for a retry. When the gateway may have created the escrow
+    (a timeout after sending, a 5xx or a response without a reference) the
+    payment is stored as "unknown" for reconciliation instead. From then on, as
+    once the escrow is known to exist, the key is never freed: the failure is
+    stored as the key's response, so a retry cannot open a second escrow.
+
+    Parameters:
+        - payment (schemas.CreatePaymentSchema): The buyer, escrow period and cost of the payment.
+        - db (Session, optional): The database session. Defaults to Depends(get_db).
+        - user_id (str, optional): The ID of the user. Defaults to Depends(oauth2.require_user).
+        - idempotency_key (str, optional): The Idempotency-Key header.
+
+    Returns:
+        - schemas.PaymentResponseSchema: The stored payment with its gateway reference.
+
+    Raises:
+        - HTTPException 409: If a request with the same Idempotency-Key is still in progress.
+        - HTTPException 422: If the Idempotency-Key was used with a different request.
+        - HTTPException 503: If the gateway circuit is open.
+        - HTTPException 502: If the gateway call fails or its outcome is unknown.
+        - HTTPException 400: If the payment could not be stored.
+    """
+    if idempotency_key:
+        cached = await idempotency.claim_or_replay(
+            db, user_id=user_id, key=idempotency_key, body=payment
+        )
+        if cached is not None:
+            return cached
+
+    initiated = None
+    reference = None
     try:
-        user = await crud.get_user(db, user_id=user_id)
+        initiated = await crud.create_payment(
+            db, payment, user_id=user_id, reference=None, status="initiated"
+        )
+        body = await pepperest.create_payment(
+            payment, start_date=payment.start_date, end_date=payment.end_date
+        )
+        reference = payment_reference(body)
+        if not reference:
+            raise GatewayOutcomeUnknown("create_payment returned no reference")
+        result = await crud.update_payment(
+            db, initiated.id, status="pending", reference=reference
+        )
 
-        if user:
-            profile.user_id = user_id
-            result = await crud.create_profile(db, profile)
+        if idempotency_key:
+            await crud.complete_idempotency_key(
+                db,
+                user_id=user_id,
+                key=idempotency_key,
+                status_code=status.HTTP_201_CREATED,
+                response_body=schemas.PaymentResponseSchema.from_orm(result).json(),
+            )
 
-            if not result:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"{e}: Profile creation failed",
-                )
+        return result
 
-            return result
-        else:
+    except Exception as e:
+        if reference is not None:
+            # The escrow exists; answer retries with this failure instead of
+            # letting them open another one.
+            logger.error(
+                "Payment %s failed after the gateway created it as %s: %s",
+                initiated.id,
+                reference,
+                e,
+            )
+            if idempotency_key:
+                await _record_failure(db, user_id, idempotency_key)
+        elif isinstance(e, GatewayOutcomeUnknown):
+            # The escrow may exist; keep the key and leave the payment to
+            # reconciliation rather than risk a second escrow on retry.
+            logger.error(
+                "Payment %s has an unknown gateway outcome: %s", initiated.id, e
+            )
+            db.rollback()
+            await crud.update_payment(db, initiated.id, status="unknown")
+            if idempotency_key:
+                await _record_failure(
+                    db,
+                    user_id,
+                    idempotency_key,
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=UNKNOWN_OUTCOME_DETAIL,
+                )
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f"{e}: User not Found"
+                status_code=status.HTTP_502_BAD_GATEWAY, detail=UNKNOWN_OUTCOME_DETAIL
             )
+        else:
+            db.rollback()
+            if initiated is not None:
+                await crud.update_payment(db, initiated.id, status="failed")
+            if idempotency_key:
+                await crud.release_idempotency_key(
+                    db, user_id=user_id, key=idempotency_key
+                )
 
-    except Exception as e:
+        if isinstance(e, CircuitOpenError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{e}"
+            )
+        if isinstance(e, GatewayError):
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"{e}")
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"{e}: Profile creation failed (Internal Server Error)",
+            detail=f"{e}: Payment creation failed (Internal Server Error)",
         )
 
 
+async def _record_failure(
+    db: Session,
+    user_id: str,
+    key: str,
+    status_code: int = status.HTTP_400_BAD_REQUEST,
+    detail: str = "Payment creation failed (Internal Server Error)",
+):
+    db.rollback()
+    try:
+        await crud.complete_idempotency_key(
+            db,
+            user_id=user_id,
+            key=key,
+            status_code=status_code,
+            response_body=json.dumps({"detail": detail}),
+        )
+    except Exception:
+        # The claim then expires after IDEMPOTENCY_CLAIM_TTL_SECONDS.
+        logger.exception("Could not record the failed payment for key %s", key)
 
-import requests
-
-url = "http://v2.pepperest.com/EscrowBackend/api/ThirdParty/payment/createPayment"
 
-payload = "{\n    \"buyer_name\": \"Yusuf Jamiu\",\n    \"buyer_email\": \"jamo@gmail.com\",\n    \"buyer_phone\": \"08123434371\",\n    \"description\": \"payment for Television\",\n    \"start_date\": \"2023-05-12\",\n    \"end_date\": \"2023-05-20\",\n    \"callback\": \"localhost:8000/verify-payment\",\n    \"cost\": \"10000\",\n    \"currency\": \"NGN\"\n}"
-headers = {
-  'Api-Key': 'peppa_MmGC9gq7JYXmHluLZ1LMEtkYEo6TGX4bmr3VefOXBoGEOHbdx49fKsCBzep7Z6dE'
-}
+@router.post("/webhook", status_code=status.HTTP_202_ACCEPTED)
+async def payment_webhook(
+    request: Request,
+    db: Session = Depends(get_db),
+    x_pepperest_signature: Optional[str] = Header(None),
+):
+    """
+    Receives a gateway webhook and queues it for the webhook worker.
+
+    The webhook must carry an HMAC-SHA256 signature of its body made with the
+    shared PEPPEREST_WEBHOOK_SECRET. It is acknowledged as soon as it is stored;
+    redelivered events with the same event id are acknowledged without being
+    queued again.
+
+    Parameters:
+        - request (Request): The webhook request.
+        - db (Session, optional): The database session. Defaults to Depends(get_db).
+        - x_pepperest_signature (str, optional): The X-Pepperest-Signature header.
+
+    Returns:
+        - dict: A dictionary with the status of the operation.
+
+    Raises:
+        - HTTPException 401: If the signature is missing or does not match.
+        - HTTPException 422: If the webhook is not JSON or has no payment reference or status.
+    """
+    raw = await request.body()
+    if not verify_webhook_signature(raw, x_pepperest_signature):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature",
+        )
+    try:
+        body = json.loads(raw)
+        if not isinstance(body, dict):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Webhook body is not valid JSON",
+        )
 
-response = requests.request("POST", url, headers=headers, data=payload)
+    reference = payment_reference(body)
+    payment_state = payment_status(body)
+    if not reference or not payment_state:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Webhook has no payment reference or status",
+        )
 
-print(response.text)
+    await crud.create_payment_webhook(
+        db,
+        {
+            "event_id": body.get("event_id") or hashlib.sha256(raw).hexdigest(),
+            "reference": reference,
+            "status": payment_state,
+            "payload": raw.decode("utf-8"),
+        },
+    )
+    return {"status": "accepted"}
@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from ..core.database import get_db
 from ..populators import locations, product
 from ..models import crud
-from ..models import crud
+from ..core.reference import reference_cache
 
 
 router = APIRouter()
@@ -24,6 +24,7 @@ async def populate_location(db: Session = Depends(get_db)):
         - dict: A dictionary with a single key-value pair. The key is "status" and the value is "ok".
     """
     await locations.populate_db(db)
+    reference_cache.clear()
     return {"status": "Successfully populated the location database"}
 
 
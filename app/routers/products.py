@@ -3,9 +3,11 @@ from datetime import timedelta
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, APIRouter, Response, Request
 import hashlib
+import uuid
 from random import randbytes, choices
 from pydantic import EmailStr
 import string
+from typing import List
 
 
 from ..models import schemas, crud
@@ -13,6 +15,8 @@ from ..core.database import get_db
 from ..core.config import settings
 from ..core import utils
 from ..core import oauth2
+from ..core.responses import ORJSONResponse
+from ..core.querylog import query_budget
 from ..core.oauth2 import AuthJWT
 
 
@@ -142,9 +146,10 @@ async def update_product(
 @router.get(
     "/product",
     status_code=status.HTTP_200_OK,
+    response_model=schemas.ProductDetailResponseSchema,
 )
 async def get_product(
-    product_id: str,
+    product_id: uuid.UUID,
     db: Session = Depends(get_db),
     user_id: str = Depends(oauth2.require_user),
 ):
@@ -152,12 +157,12 @@ async def get_product(
     Retrieves a product from the database based on the provided product ID.
 
     Args:
-        product_id (str): The ID of the product to retrieve.
+        product_id (uuid.UUID): The ID of the product to retrieve.
         db (Session, optional): The database session. Defaults to the session obtained from `get_db` dependency.
         user_id (str, optional): The ID of the user. Defaults to the user ID obtained from the `oauth2.require_user` dependency.
 
     Returns:
-        Union[schemas.ProductResponseSchema, HTTPException]: The retrieved product if found, or an HTTPException with a 404 status code if the product or user is not found.
+        Union[schemas.ProductDetailResponseSchema, HTTPException]: The retrieved product with its owner summary if found, or an HTTPException with a 404 status code if the product or user is not found.
 
     Raises:
         HTTPException: If an error occurs during the retrieval process, an HTTPException with a 400 status code is raised, indicating an internal server error.
@@ -166,7 +171,7 @@ async def get_product(
         user = await crud.get_user(db, user_id=user_id)
 
         if user:
-            result = await crud.get_product(db=db, product_id=product_id)
+            result = await crud.get_product(db=db, product_id=product_id, cached=True)
 
             if result:
                 return result
@@ -193,6 +198,8 @@ async def get_product(
 @router.get(
     "/all-product",
     status_code=status.HTTP_200_OK,
+    response_model=List[schemas.ProductDetailResponseSchema],
+    dependencies=[Depends(query_budget(3))],
 )
 async def get_all_product(
     db: Session = Depends(get_db),
@@ -206,7 +213,7 @@ async def get_all_product(
         - user_id (str, optional): The ID of the user. Defaults to the user ID obtained from the `oauth2.require_user` dependency.
 
     Returns:
-        - List[schemas.ProductResponseSchema]: A list of products if found, or an HTTPException with a 404 status code if the products or user is not found.
+        - List[schemas.ProductDetailResponseSchema]: A list of products with their owner summaries if found, or an HTTPException with a 404 status code if the products or user is not found.
 
     Raises:
         - HTTPException: If an error occurs during the retrieval process, an HTTPException with a 400 status code is raised, indicating an internal server error.
@@ -215,10 +222,10 @@ async def get_all_product(
         user = await crud.get_user(db, user_id=user_id)
 
         if user:
-            result = await crud.get_products(db=db)
+            result = await crud.get_product_rows(db=db)
 
             if result:
-                return result
+                return ORJSONResponse(result)
             else:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND, detail="Products not found"
@@ -244,7 +251,7 @@ async def get_all_product(
     status_code=status.HTTP_204_NO_CONTENT,
 )
 async def delete_profile(
-    product_id: str,
+    product_id: uuid.UUID,
     db: Session = Depends(get_db),
     user_id: str = Depends(oauth2.require_user),
 ):
@@ -252,7 +259,7 @@ async def delete_profile(
     Deletes a profile from the database.
 
     Args:
-        product_id (str): The ID of the product to be deleted.
+        product_id (uuid.UUID): The ID of the product to be deleted.
         db (Session, optional): The database session. Defaults to the session obtained from the `get_db` dependency.
         user_id (str, optional): The ID of the user who owns the profile. Defaults to the user ID obtained from the `oauth2.require_user` dependency.
 
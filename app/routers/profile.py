@@ -1,11 +1,18 @@
+import asyncio
+import uuid
 from sqlalchemy.orm import Session
 from datetime import datetime
-from fastapi import Depends, HTTPException, status, APIRouter, Response
+from typing import List, Optional
+from fastapi import Depends, HTTPException, status, APIRouter, Response, Query
 
 
 from ..models import schemas, crud
 from ..core.database import get_db
 from ..core import oauth2
+from ..core.matching import match_index, MAX_SUGGESTIONS
+from ..core.reference import reference_cache
+from ..core.responses import ORJSONResponse
+from ..core.querylog import query_budget
 
 
 router = APIRouter()
@@ -29,34 +36,30 @@ async def create_profile(
         - user_id: A user ID obtained from the OAuth2 authentication.
     Returns:
         - The created profile response schema.
+    Raises:
+        - HTTPException 422: If the country or state does not exist, or the state is not in the country.
+        - HTTPException 409: If the user already has a profile.
     """
     try:
-        user = await crud.get_user(db, user_id=user_id)
-
-        if user:
-            check_profile = await crud.get_profile_by_user(db, user_id=user_id)
-
-            if check_profile:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Profile already exists",
-                )
-
-            profile.user_id = user_id
-            result = await crud.create_profile(db, profile)
+        if not reference_cache.is_valid_location(
+            db, country_id=profile.country_id, state_id=profile.state_id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid country or state",
+            )
 
-            if not result:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"{e}: Profile creation failed",
-                )
+        profile.user_id = user_id
+        result = await crud.create_profile(db, profile)
 
-            return result
-        else:
+        if not result:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f"{e}: User not Found"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Profile already exists",
             )
 
+        return result
+
     except HTTPException as he:
         raise he
 
@@ -129,9 +132,11 @@ async def update_profile(
 @router.get(
     "/profile",
     status_code=status.HTTP_200_OK,
+    response_model=schemas.ProfileDetailResponseSchema,
+    dependencies=[Depends(query_budget(3))],
 )
 async def get_profile(
-    profile_id: str,
+    profile_id: uuid.UUID,
     db: Session = Depends(get_db),
     user_id: str = Depends(oauth2.require_user),
 ):
@@ -143,7 +148,7 @@ async def get_profile(
         user_id (str): The ID of the user whose profile is being retrieved.
 
     Returns:
-        Union[schemas.ProfileResponseSchema, Dict[str, Dict[str, bool]]]: The profile object if found, otherwise a dictionary with a "data" key containing a "value" key set to False.
+        schemas.ProfileDetailResponseSchema: The profile with its country, state and owner summaries.
 
     Raises:
         HTTPException: If the user is not found or if there is a bad request.
@@ -152,7 +157,7 @@ async def get_profile(
         user = await crud.get_user(db, user_id=user_id)
 
         if user:
-            result = await crud.get_profile(db=db, profile_id=profile_id)
+            result = await crud.get_profile(db=db, profile_id=profile_id, cached=True)
 
             if result:
                 return result
@@ -176,12 +181,122 @@ async def get_profile(
         )
 
 
+@router.get(
+    "/search",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.SupplierSearchResponseSchema,
+    dependencies=[Depends(query_budget(4))],
+)
+async def search_suppliers(
+    products: Optional[List[str]] = Query(None),
+    country_id: Optional[uuid.UUID] = None,
+    state_id: Optional[uuid.UUID] = None,
+    min_capacity: Optional[float] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(oauth2.require_user),
+):
+    """
+    Searches supplier profiles by material, location and minimum factory capacity.
+
+    Parameters:
+        products (List[str], optional): Materials the supplier should handle, e.g. ?products=HDPE&products=PET.
+        country_id (uuid.UUID, optional): The ID of the country the supplier is located in.
+        state_id (uuid.UUID, optional): The ID of the state the supplier is located in.
+        min_capacity (float, optional): The minimum factory capacity.
+        limit (int, optional): The number of ranked results to return. Defaults to 20.
+        db (Session, optional): The database session. Defaults to Depends(get_db).
+        user_id (str, optional): The ID of the user. Defaults to Depends(oauth2.require_user).
+
+    Returns:
+        schemas.SupplierSearchResponseSchema: The ranked suppliers and facet counts per country and product.
+
+    Raises:
+        HTTPException: If there is an internal server error.
+    """
+    try:
+        # The rows already match the response model; encode them directly.
+        result = await crud.search_suppliers(
+            db,
+            products=products,
+            country_id=country_id,
+            state_id=state_id,
+            min_capacity=min_capacity,
+            limit=limit,
+            cached=True,
+        )
+        return ORJSONResponse(result)
+
+    except HTTPException as he:
+        raise he
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{e}: Supplier search failed (Internal Server Error)",
+        )
+
+
+@router.get(
+    "/suggestions",
+    status_code=status.HTTP_200_OK,
+    response_model=List[schemas.SuggestionSchema],
+)
+async def get_suggestions(
+    profile_id: uuid.UUID,
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_db),
+    user_id: str = Depends(oauth2.require_user),
+):
+    """
+    Returns suggested counterparties for a profile.
+
+    Only profiles of users with the other role are suggested. Suggestions are
+    scored on shared products, country and state proximity and factory capacity
+    fit, and are cached until an overlapping profile changes.
+
+    Parameters:
+        profile_id (uuid.UUID): The ID of the profile to suggest counterparties for.
+        limit (int, optional): The number of suggestions to return. Defaults to 10.
+        db (Session, optional): The database session. Defaults to Depends(get_db).
+        user_id (str, optional): The ID of the user. Defaults to Depends(oauth2.require_user).
+
+    Returns:
+        List[schemas.SuggestionSchema]: The suggested counterparties, best match first.
+
+    Raises:
+        HTTPException: If the profile is not found.
+        HTTPException: If there is an internal server error.
+    """
+    try:
+        # Loading or refreshing the index queries the database.
+        result = await asyncio.to_thread(
+            match_index.suggestions, db, profile_id=profile_id, limit=limit
+        )
+
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+            )
+
+        return result
+
+    except HTTPException as he:
+        raise he
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{e}: Suggestions fetching failed (Internal Server Error)",
+        )
+
+
 @router.delete(
     "/profile",
     status_code=status.HTTP_204_NO_CONTENT,
 )
 async def delete_profile(
-    profile_id: str,
+    profile_id: uuid.UUID,
     db: Session = Depends(get_db),
     user_id: str = Depends(oauth2.require_user),
 ):
@@ -1,18 +1,19 @@
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, APIRouter
-from pydantic import EmailStr
 
 
 from ..models import schemas, crud
 from ..core.database import get_db
-from ..mailHandler.waitlistmail import Email
+from ..core.reference import reference_cache
+from ..core.bloom import waitlist_emails
+from ..core.waitlist_batcher import WaitlistQueueFull, waitlist_batcher
 
 router = APIRouter()
 
 
 @router.post(
     "/waitlist",
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
     response_model=schemas.WaitlistResponseSchema,
 )
 async def create_waitlist(
@@ -20,41 +21,59 @@ async def create_waitlist(
     db: Session = Depends(get_db),
 ):
     """
-    Creates a new waitlist user and sends a confirmation email.
+    Accepts a waitlist signup and queues it for the next batched insert.
+
+    The signup is acknowledged as soon as it is validated; the row is written by
+    the waitlist batcher a few milliseconds later together with other signups, and
+    the confirmation email is sent once the row is stored. Emails the waitlist
+    prefilter cannot rule out are checked against the table first; anything that
+    slips past it is silently ignored by the batched insert.
 
     Parameters:
     - waitlist (schemas.WaitlistBaseSchema): The waitlist user information.
     - db (Session, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
-    - new_user (schemas.WaitlistResponseSchema): The newly created waitlist user.
+    - new_user (schemas.WaitlistResponseSchema): The ID the waitlist user will be stored under.
 
     Raises:
-    - HTTPException: If the email already exists in the waitlist.
-    - HTTPException: If there is an error creating the waitlist user in the database.
+    - HTTPException: If the country or state is invalid.
+    - HTTPException: If the email is already waitlisted or waiting to be stored.
+    - HTTPException: If too many signups are waiting to be stored (503, with Retry-After).
     - HTTPException: If there is an internal server error during waitlist creation.
     """
     try:
-        user_exists = await crud.get_waitlist_by_email(db, workemail=waitlist.workemail)
-        if user_exists:
+        waitlist.workemail = waitlist.workemail.lower()
+
+        if not reference_cache.is_valid_location(
+            db, country_id=waitlist.country_id, state_id=waitlist.state_id
+        ):
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT, detail="Email Already Waitlisted"
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Invalid country or state",
             )
 
+        if waitlist_emails.might_exist(waitlist.workemail):
+            if await crud.get_waitlist_by_email(db, workemail=waitlist.workemail):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Email Already Waitlisted",
+                )
+
         try:
-            await crud.create_waitlist_user(db, waitlist)
-        except Exception as e:
+            waitlist_id = waitlist_batcher.submit(waitlist)
+        except WaitlistQueueFull:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"{e}: Error creating waitlist user in the db",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        if waitlist_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Email Already Waitlisted"
             )
 
-        await Email(
-            user=waitlist.lastname, email=[EmailStr(waitlist.workemail)]
-        ).sendWaitlistEmail()
-
-        new_user = await crud.get_waitlist_by_email(db, workemail=waitlist.workemail)
-        return new_user
+        return {"id": waitlist_id}
 
     except HTTPException as he:
         raise he
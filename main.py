@@ -1,18 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 
 from app.core.config import settings
-from app.routers import auth, profile, waitlist, location, products, populators
-from app.models import models
-from app.core.database import engine
+from app.routers import (
+    auth,
+    profile,
+    waitlist,
+    location,
+    products,
+    populators,
+    peppa,
+    admin,
+)
+from app.core.startup import warmup
+from app.core.cache import cache_listener
+from app.core.responses import ORJSONResponse
+from app.core import metrics, timing, tracing
+from app.core.profiler import ProfilerMiddleware
+from app.core.querylog import QueryBudgetMiddleware
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.concurrency import ConcurrencyLimitMiddleware
+from app.core.waitlist_batcher import waitlist_batcher
+from app.core.bloom import prefilters, rebuild_periodically
+from app.paymentHandler.pepperest import pepperest
+from app.paymentHandler.webhooks import webhook_worker
+from app.paymentHandler.reconcile import payment_reconciler
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warmup()
+    cache_listener.start()
+    await waitlist_batcher.start()
+    await webhook_worker.start()
+    await payment_reconciler.start()
+    prefilter_rebuilds = asyncio.create_task(
+        rebuild_periodically(prefilters, settings.EMAIL_PREFILTER_REBUILD_SECONDS)
+    )
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
-models.Base.metadata.create_all(bind=engine)
+    yield
+
+    prefilter_rebuilds.cancel()
+    await waitlist_batcher.stop()
+    await webhook_worker.stop()
+    await payment_reconciler.stop()
+    await pepperest.aclose()
+    await asyncio.to_thread(cache_listener.stop)
+    if tracing.processor.exporter is not None:
+        await asyncio.to_thread(tracing.processor.flush)
+
+
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    version=settings.PROJECT_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 origins = [settings.CLIENT_ORIGIN]
+# Innermost, so a 429 or 503 still gets CORS headers and is recorded by the
+# metrics, and rate-limited requests never take a concurrency slot.
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -20,17 +75,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(timing.ServerTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
 
 
 app.include_router(auth.router, tags=["Auth"], prefix="/api/auths")
 app.include_router(profile.router, tags=["Profile"], prefix="/api/profiles")
 app.include_router(waitlist.router, tags=["Waitlist"], prefix="/api/waitlists")
 app.include_router(location.router, tags=["Location"], prefix="/api/locations")
-# app.include_router(products.router, tags=["Products"], prefix="/api/products")
+app.include_router(products.router, tags=["Products"], prefix="/api/products")
+app.include_router(peppa.router, tags=["Payments"], prefix="/api/payments")
 
 app.include_router(populators.router, tags=["Populators"], prefix="/api/populators")
+app.include_router(admin.router, tags=["Admin"], prefix="/api/admin")
 
 
 @app.get("/api/check")
 async def check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
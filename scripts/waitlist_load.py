@@ -0,0 +1,97 @@
+"""
+Load test for the waitlist signup route.
+
+Sends unique signups to POST /api/waitlists/waitlist from `--concurrency`
+clients for `--duration` seconds and reports the accepted signups per second,
+latency percentiles and the count of each status code. A 503 means the
+batcher's queue was full. Run it against a local server started with
+RATE_LIMIT_ENABLED=false, or the per-IP limit answers almost everything with 429:
+
+    RATE_LIMIT_ENABLED=false uvicorn main:app --workers 4
+    python scripts/waitlist_load.py --url http://localhost:8000 --concurrency 200
+
+Afterwards compare the accepted count with the rows written:
+
+    SELECT count(*) FROM waitlist WHERE workemail LIKE 'load-<run id>-%';
+"""
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+async def pick_location(client: httpx.AsyncClient):
+    countries = (await client.get("/api/locations/countries")).json()
+    for country in countries:
+        states = (
+            await client.get(
+                "/api/locations/states", params={"country_id": country["id"]}
+            )
+        ).json()
+        if states:
+            return country["id"], states[0]["id"]
+    raise SystemExit("No country with states; populate the location tables first")
+
+
+async def worker(client, run_id, number, deadline, location, latencies, statuses):
+    country_id, state_id = location
+    sent = 0
+    while time.perf_counter() < deadline:
+        body = {
+            "workemail": f"load-{run_id}-{number}-{sent}@example.com",
+            "firstname": "Load",
+            "lastname": "Test",
+            "country_id": country_id,
+            "state_id": state_id,
+        }
+        sent += 1
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/waitlists/waitlist", json=body)
+            statuses[response.status_code] += 1
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def main(url: str, concurrency: int, duration: float):
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        location = await pick_location(client)
+        latencies = []
+        statuses = collections.Counter()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            *(
+                worker(client, run_id, n, deadline, location, latencies, statuses)
+                for n in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    print(f"run id:      {run_id}")
+    print(f"requests:    {sum(statuses.values())} in {elapsed:.1f}s")
+    print(f"accepted/s:  {statuses[202] / elapsed:.0f}")
+    print(f"statuses:    {dict(statuses)}")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(
+            "latency ms:  p50 %.1f  p95 %.1f  p99 %.1f"
+            % (cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.duration))
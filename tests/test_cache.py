@@ -0,0 +1,110 @@
+"""
+The shared cache tier, against an in-memory stand-in for Redis.
+"""
+import asyncio
+import threading
+import uuid
+
+import pytest
+
+from app.core import cache
+
+
+class FakeRedis:
+    """
+    The part of the redis-py client SharedTier uses, recording the calling threads.
+    """
+
+    def __init__(self, down=False):
+        self.down = down
+        self.data = {}
+        self.threads = set()
+
+    def _call(self):
+        self.threads.add(threading.get_ident())
+        if self.down:
+            raise ConnectionError("redis is down")
+
+    def get(self, key):
+        self._call()
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._call()
+        self.data[key] = value
+
+    def delete(self, *keys):
+        self._call()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        self._call()
+        prefix = match.rstrip("*")
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(cache, "shared_tier", cache.SharedTier(client, ttl=60))
+    return client
+
+
+def loader(value):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return value
+
+    return load, calls
+
+
+def test_a_value_loaded_by_one_worker_is_served_to_another(redis):
+    profile_id = uuid.uuid4()
+    load, calls = loader({"id": profile_id, "factory_capacity": 100})
+
+    first = asyncio.run(cache.profiles.get_or_load("key", load))
+    # Another worker: its local tier is empty, the shared tier is not.
+    cache.profiles.local.clear()
+    second = asyncio.run(cache.profiles.get_or_load("key", load))
+
+    assert len(calls) == 1
+    assert first["id"] == profile_id
+    assert second == {"id": str(profile_id), "factory_capacity": 100}
+
+
+def test_redis_is_not_called_on_the_event_loop(redis):
+    load, _ = loader({"name": "Lagos"})
+
+    async def run():
+        await cache.states.get_or_load("key", load)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert redis.threads
+    assert loop_thread not in redis.threads
+
+
+def test_an_invalidation_reaches_the_shared_tier(redis):
+    load, calls = loader({"name": "Nigeria"})
+
+    asyncio.run(cache.countries.get_or_load("key", load))
+    cache.countries.invalidate()
+    asyncio.run(cache.countries.get_or_load("key", load))
+
+    assert len(calls) == 2
+
+
+def test_an_unreachable_server_counts_as_a_miss(monkeypatch):
+    client = FakeRedis(down=True)
+    monkeypatch.setattr(cache, "shared_tier", cache.SharedTier(client, ttl=60))
+    load, calls = loader({"name": "Lagos"})
+    errors = cache.cache_shared_requests.value("states", "error")
+
+    value = asyncio.run(cache.states.get_or_load("key", load))
+
+    assert value == {"name": "Lagos"}
+    assert len(calls) == 1
+    assert cache.cache_shared_requests.value("states", "error") == errors + 2
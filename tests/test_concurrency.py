@@ -0,0 +1,132 @@
+"""
+Adaptive per-class concurrency limits and load shedding.
+"""
+import asyncio
+
+import pytest
+
+from app.core import concurrency
+from app.core.concurrency import BACKOFF, AIMDLimiter, ConcurrencyLimitMiddleware
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    return now
+
+
+def full(limit=4, **kwargs) -> AIMDLimiter:
+    limiter = AIMDLimiter(
+        initial=limit, minimum=2, maximum=8, target_latency=0.5, **kwargs
+    )
+    while limiter.try_acquire():
+        pass
+    return limiter
+
+
+def test_a_full_class_rejects_until_a_slot_is_released():
+    limiter = full()
+    assert limiter.in_flight == 4
+    assert not limiter.try_acquire()
+
+    limiter.release(0.1, failed=False)
+
+    assert limiter.in_flight == 3
+    assert limiter.try_acquire()
+
+
+def test_fast_requests_at_the_limit_grow_it_additively():
+    limiter = full()
+
+    limiter.release(0.1, failed=False)
+
+    assert limiter.limit == pytest.approx(4 + 1 / 4)
+
+
+def test_fast_requests_below_the_limit_leave_it_alone():
+    limiter = full()
+    limiter.release(0.1, failed=False)
+    grown = limiter.limit
+
+    limiter.release(0.1, failed=False)
+
+    assert limiter.limit == grown
+
+
+def test_the_limit_stops_at_its_maximum():
+    limiter = full(limit=8)
+
+    limiter.release(0.1, failed=False)
+
+    assert limiter.limit == 8
+
+
+@pytest.mark.parametrize("latency, failed", [(0.9, False), (0.1, True)])
+def test_a_slow_or_failed_request_cuts_the_limit(clock, latency, failed):
+    limiter = full()
+
+    limiter.release(latency, failed)
+
+    assert limiter.limit == pytest.approx(4 * BACKOFF)
+    assert limiter.in_flight == 3
+
+
+def test_the_limit_is_cut_at_most_once_per_cooldown(clock):
+    limiter = full()
+
+    limiter.release(0.9, failed=False)
+    limiter.release(0.9, failed=False)
+    assert limiter.limit == pytest.approx(4 * BACKOFF)
+
+    clock[0] += limiter.cooldown
+    limiter.release(0.9, failed=False)
+    assert limiter.limit == pytest.approx(4 * BACKOFF**2)
+
+
+def test_the_limit_stops_at_its_minimum(clock):
+    limiter = full(limit=2)
+
+    limiter.release(0.9, failed=True)
+
+    assert limiter.limit == 2
+
+
+def run_request(app, path="/api/products/all-product"):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    asyncio.run(ConcurrencyLimitMiddleware(app)(scope, receive, send))
+    return messages
+
+
+def test_a_request_over_the_limit_is_shed_with_503(monkeypatch):
+    limiter = full()
+    monkeypatch.setitem(concurrency.limiters, "db_read", limiter)
+
+    async def app(scope, receive, send):
+        raise AssertionError("the request should have been shed")
+
+    start = run_request(app)[0]
+    assert start["status"] == 503
+    assert (b"retry-after", b"1") in start["headers"]
+
+
+def test_a_request_that_raises_frees_its_slot(monkeypatch, clock):
+    limiter = AIMDLimiter(initial=4, minimum=2, maximum=8, target_latency=0.5)
+    monkeypatch.setitem(concurrency.limiters, "db_read", limiter)
+
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_request(app)
+
+    assert limiter.in_flight == 0
+    assert limiter.limit == pytest.approx(4 * BACKOFF)
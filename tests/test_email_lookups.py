@@ -0,0 +1,25 @@
+"""
+The case-insensitive email lookups must be answered by the lower(email) indexes.
+"""
+from app.models import crud
+
+
+def assert_index_scan(plans, relation, index):
+    nodes = [node for plan in plans for node in plan]
+    scans = [node for node in nodes if node.get("Relation Name") == relation]
+    assert scans, f"no scan of {relation}"
+    assert all(node["Node Type"] != "Seq Scan" for node in scans)
+    # A bitmap scan names the index on its child node, not on the heap scan.
+    assert index in {node.get("Index Name") for node in nodes}
+
+
+def test_user_email_lookup_uses_lower_index(query_plans):
+    plans = query_plans(lambda db: crud.get_user_by_email(db, "USER7@example.COM"))
+    assert_index_scan(plans, "users", "ix_users_companyemail_lower")
+
+
+def test_waitlist_email_lookup_uses_lower_index(query_plans):
+    plans = query_plans(
+        lambda db: crud.get_waitlist_by_email(db, "Waiter3@Example.com")
+    )
+    assert_index_scan(plans, "waitlist", "ix_waitlist_workemail_lower")
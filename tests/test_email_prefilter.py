@@ -0,0 +1,34 @@
+"""
+The email prefilters answer definite misses and export their size and error rate.
+"""
+from app.core import bloom, metrics
+
+
+def test_a_definite_miss_skips_the_database(monkeypatch):
+    monkeypatch.setattr(bloom.user_emails, "_filter", bloom.BloomFilter(capacity=100))
+    bloom.user_emails.add("Taken@Example.com")
+
+    assert bloom.user_emails.might_exist("taken@example.com")
+    assert not bloom.user_emails.might_exist("free@example.com")
+
+
+def test_size_and_error_rate_are_exported(monkeypatch):
+    bloom_filter = bloom.BloomFilter(capacity=1000)
+    for number in range(500):
+        bloom_filter.add(f"user{number}@example.com")
+    monkeypatch.setattr(bloom.user_emails, "_filter", bloom_filter)
+    monkeypatch.setattr(bloom.waitlist_emails, "_filter", None)
+
+    lines = metrics.render().splitlines()
+
+    assert (
+        f'email_prefilter_memory_bytes{{table="users"}} {bloom_filter.memory_bytes}'
+        in lines
+    )
+    assert 'email_prefilter_memory_bytes{table="waitlist"} 0' in lines
+    rate = next(
+        line
+        for line in lines
+        if line.startswith('email_prefilter_false_positive_rate{table="users"}')
+    )
+    assert 0 < float(rate.split()[-1]) < 0.01
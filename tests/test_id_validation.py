@@ -0,0 +1,36 @@
+"""
+Malformed ids are rejected with 422 before they reach Postgres.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import oauth2
+from main import app
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def signed_in():
+    app.dependency_overrides[oauth2.require_user] = lambda: str(uuid.uuid4())
+    yield
+    app.dependency_overrides.pop(oauth2.require_user)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/locations/states?country_id=abc",
+        "/api/profiles/profile?profile_id=abc",
+        "/api/profiles/suggestions?profile_id=abc",
+        "/api/profiles/search?country_id=abc",
+        "/api/profiles/search?state_id=abc",
+        "/api/products/product?product_id=abc",
+    ],
+)
+def test_malformed_id_is_422(path):
+    response = client.get(path)
+    assert response.status_code == 422
@@ -0,0 +1,43 @@
+"""
+Background jobs take a cross-worker advisory lock so only one worker runs them at a time.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.core import bloom
+
+
+def test_a_held_lock_is_refused_elsewhere(engine):
+    from app.core.database import advisory_lock
+
+    async def run():
+        async with advisory_lock("test_job") as first:
+            async with advisory_lock("test_job") as second:
+                pass
+        async with advisory_lock("test_job") as again:
+            pass
+        return first, second, again
+
+    assert asyncio.run(run()) == (True, False, True)
+
+
+def test_a_busy_prefilter_rebuild_is_retried(monkeypatch):
+    answers = [False, False, True]
+    rebuilds = []
+
+    @asynccontextmanager
+    async def advisory_lock(name):
+        yield answers.pop(0)
+
+    class Prefilter:
+        cache_name = "users_email_prefilter"
+
+        async def rebuild(self):
+            rebuilds.append(self.cache_name)
+
+    monkeypatch.setattr(bloom, "advisory_lock", advisory_lock)
+    monkeypatch.setattr(bloom, "REBUILD_RETRY_SECONDS", (0, 0))
+
+    asyncio.run(bloom._rebuild_exclusively(Prefilter()))
+    assert rebuilds == ["users_email_prefilter"]
+    assert not answers
@@ -0,0 +1,77 @@
+"""
+Counterparty suggestions from the in-process match index.
+"""
+from types import SimpleNamespace
+
+from app.core.matching import MatchIndex
+
+
+def profile(number, role, products, country="ng", state="lagos", capacity=100):
+    return SimpleNamespace(
+        id=f"profile-{number}",
+        user_id=f"user-{number}",
+        role=role,
+        products=products,
+        country_id=country,
+        state_id=state,
+        factory_capacity=capacity,
+    )
+
+
+class FakeSession:
+    """
+    Answers every query with the stored rows, filtered by id for rereads.
+    """
+
+    def __init__(self, rows):
+        self.rows = {row.id: row for row in rows}
+        self.queries = 0
+
+    def execute(self, statement):
+        self.queries += 1
+        ids = statement.compile().params.get("id_1")
+        if ids is None:
+            return list(self.rows.values())
+        return [self.rows[i] for i in ids if i in self.rows]
+
+
+def suggested(index, db, profile_id):
+    return [s["profile_id"] for s in index.suggestions(db, profile_id, limit=10)]
+
+
+def test_only_the_other_role_is_suggested():
+    db = FakeSession(
+        [
+            profile(1, "buyer", ["pet", "hdpe"]),
+            profile(2, "supplier", ["pet"]),
+            profile(3, "buyer", ["pet", "hdpe"]),
+            profile(4, "supplier", ["hdpe"], country="gh"),
+        ]
+    )
+    index = MatchIndex()
+
+    assert suggested(index, db, "profile-1") == ["profile-2", "profile-4"]
+    assert set(suggested(index, db, "profile-2")) == {"profile-1", "profile-3"}
+
+
+def test_an_edited_profile_is_reread_before_the_next_suggestions():
+    db = FakeSession([profile(1, "buyer", ["pet"]), profile(2, "supplier", ["pp"])])
+    index = MatchIndex()
+    index.load(db)
+    assert suggested(index, db, "profile-1") == []
+
+    db.rows["profile-2"] = profile(2, "supplier", ["pet"])
+    index.upsert(db.rows["profile-2"])
+
+    assert suggested(index, db, "profile-1") == ["profile-2"]
+
+
+def test_a_deleted_profile_is_no_longer_suggested():
+    db = FakeSession([profile(1, "buyer", ["pet"]), profile(2, "supplier", ["pet"])])
+    index = MatchIndex()
+    assert suggested(index, db, "profile-1") == ["profile-2"]
+
+    del db.rows["profile-2"]
+    index.remove("profile-2")
+
+    assert suggested(index, db, "profile-1") == []
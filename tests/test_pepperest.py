@@ -0,0 +1,211 @@
+"""
+Pepperest client: which failures are safe to retry and which leave the outcome
+unknown, the circuit breaker and the metrics, against the local gateway stub
+(app/paymentHandler/stub.py) or a scripted transport.
+"""
+import asyncio
+import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.paymentHandler import stub
+from app.paymentHandler.pepperest import (
+    CircuitOpenError,
+    GatewayError,
+    GatewayOutcomeUnknown,
+    PepperestClient,
+    gateway_request_duration,
+    gateway_requests,
+    payment_reference,
+    payment_status,
+)
+
+
+PAYMENT = SimpleNamespace(
+    name="Buyer",
+    email="buyer@example.com",
+    phone="+2348000000000",
+    description="10t PET",
+    callback="http://localhost/callback",
+    cost=Decimal("1000"),
+    currency="NGN",
+)
+TODAY = datetime.date(2026, 1, 1)
+
+
+def make_client(handler, **kwargs) -> PepperestClient:
+    return PepperestClient(
+        base_url="http://gateway",
+        api_key="test",
+        backoff=0,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+def stub_client(**kwargs) -> PepperestClient:
+    return PepperestClient(
+        base_url="http://stub",
+        backoff=0,
+        transport=httpx.ASGITransport(app=stub.app),
+        **kwargs,
+    )
+
+
+def create_payment(client: PepperestClient):
+    async def run():
+        try:
+            return await client.create_payment(PAYMENT, TODAY, TODAY)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+async def get_payment_status(client: PepperestClient):
+    try:
+        return await client.get_payment_status("reference")
+    finally:
+        await client.aclose()
+
+
+def test_a_read_timeout_leaves_the_outcome_unknown():
+    def handler(request):
+        raise httpx.ReadTimeout("read timed out", request=request)
+
+    with pytest.raises(GatewayOutcomeUnknown):
+        create_payment(make_client(handler))
+
+
+def test_a_server_error_leaves_the_outcome_unknown():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    with pytest.raises(GatewayOutcomeUnknown):
+        create_payment(make_client(handler))
+    assert len(calls) == 1
+
+
+def test_a_request_that_never_connected_is_retried_and_fails_cleanly():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(GatewayError) as raised:
+        create_payment(make_client(handler, max_retries=2))
+    assert not isinstance(raised.value, GatewayOutcomeUnknown)
+    assert len(calls) == 3
+
+
+def test_a_rejected_payment_fails_cleanly():
+    def handler(request):
+        return httpx.Response(400, json={"message": "invalid phone"})
+
+    with pytest.raises(GatewayError) as raised:
+        create_payment(make_client(handler))
+    assert not isinstance(raised.value, GatewayOutcomeUnknown)
+
+
+def test_a_payment_round_trips_through_the_stub():
+    client = stub_client(api_key="test")
+
+    async def run():
+        try:
+            created = await client.create_payment(PAYMENT, TODAY, TODAY)
+            reference = payment_reference(created)
+            stub.payments[reference]["status"] = "completed"
+            return reference, await client.get_payment_status(reference)
+        finally:
+            await client.aclose()
+
+    reference, body = asyncio.run(run())
+    assert stub.payments[reference]["buyer_email"] == PAYMENT.email
+    assert payment_status(body) == "completed"
+
+
+def test_a_rejection_does_not_open_the_circuit():
+    client = stub_client(api_key="")
+    client.breaker.failure_threshold = 1
+
+    with pytest.raises(GatewayError):
+        create_payment(client)
+    assert client.breaker.state == "closed"
+
+
+def test_requests_are_counted_and_timed_per_operation():
+    requests = gateway_requests.value("create_payment", "ok")
+    errors = gateway_requests.value("create_payment", "error")
+    timed = gateway_request_duration._values.get(("create_payment",), [[0], 0])
+    observed = sum(timed[0])
+
+    create_payment(stub_client(api_key="test"))
+    with pytest.raises(GatewayError):
+        create_payment(stub_client(api_key=""))
+
+    assert gateway_requests.value("create_payment", "ok") == requests + 1
+    assert gateway_requests.value("create_payment", "error") == errors + 1
+    timed = gateway_request_duration._values[("create_payment",)]
+    assert sum(timed[0]) == observed + 2
+
+
+def open_circuit(client: PepperestClient):
+    client.breaker.opened_at = 0.0
+    client.breaker.failures = client.breaker.failure_threshold
+    assert client.breaker.state == "half-open"
+
+
+def test_a_cancelled_trial_lets_the_next_call_through():
+    started = asyncio.Event()
+
+    async def hang(scope, receive, send):
+        started.set()
+        await asyncio.sleep(60)
+
+    client = PepperestClient(
+        base_url="http://gateway",
+        api_key="test",
+        transport=httpx.ASGITransport(app=hang),
+    )
+    open_circuit(client)
+
+    async def run():
+        trial = asyncio.create_task(client.create_payment(PAYMENT, TODAY, TODAY))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        await client.aclose()
+
+    asyncio.run(run())
+    assert client.breaker.state == "half-open"
+    assert client.breaker.allow()
+
+
+def test_an_unreadable_trial_response_lets_the_next_call_through():
+    def handler(request):
+        return httpx.Response(200, content=b"<html>")
+
+    client = make_client(handler)
+    open_circuit(client)
+
+    with pytest.raises(GatewayError):
+        asyncio.run(get_payment_status(client))
+    assert client.breaker.allow()
+
+
+def test_an_open_circuit_fails_fast():
+    client = make_client(lambda request: httpx.Response(500))
+    client.breaker.failure_threshold = 1
+
+    with pytest.raises(GatewayOutcomeUnknown):
+        create_payment(client)
+    with pytest.raises(CircuitOpenError):
+        create_payment(client)
@@ -0,0 +1,76 @@
+"""
+Query-count tests: each read path runs a fixed number of statements, however many
+rows it returns, so an N+1 regression fails here instead of in production.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models import crud, schemas
+
+
+@pytest.fixture(scope="module")
+def client(seed):
+    from main import app
+
+    # Without the context manager the lifespan (listeners, workers) is not started.
+    return TestClient(app)
+
+
+def test_profile_detail_is_one_query(db, seed, count_queries):
+    with count_queries() as log:
+        profile = asyncio.run(crud.get_profile(db, seed["profiles"][0], detail=True))
+        schemas.ProfileDetailResponseSchema.from_orm(profile)
+    assert len(log) == 1
+
+
+def test_product_detail_is_one_query(db, seed, count_queries):
+    with count_queries() as log:
+        product = asyncio.run(crud.get_product(db, seed["products"][0], detail=True))
+        schemas.ProductDetailResponseSchema.from_orm(product)
+    assert len(log) == 1
+
+
+def test_product_list_with_owners_is_two_queries(db, count_queries):
+    with count_queries() as log:
+        products = asyncio.run(crud.get_products(db, detail=True))
+        for product in products:
+            schemas.ProductDetailResponseSchema.from_orm(product)
+    assert len(products) > 1
+    assert len(log) == 2
+
+
+def test_product_rows_is_one_query(db, count_queries):
+    with count_queries() as log:
+        rows = asyncio.run(crud.get_product_rows(db))
+    assert len(rows) > 1
+    assert len(log) == 1
+
+
+def test_search_suppliers_is_three_queries(db, count_queries):
+    with count_queries() as log:
+        found = asyncio.run(crud.search_suppliers(db, products=["pet", "hdpe"]))
+    assert found["results"]
+    assert len(log) == 3
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/api/locations/countries", "/api/locations/states?country_id={country_id}"],
+)
+def test_location_routes_stay_within_budget(client, seed, count_queries, path):
+    with count_queries() as log:
+        response = client.get(path.format(country_id=seed["countries"][0]))
+    assert response.status_code == 200
+    assert response.json()
+    assert "x-query-budget-exceeded" not in response.headers
+    assert len(log) == 1
+
+
+def test_cached_search_suppliers_is_computed_once(db, count_queries):
+    asyncio.run(crud.search_suppliers(db, products=["pet"], cached=True))
+    with count_queries() as log:
+        found = asyncio.run(crud.search_suppliers(db, products=["pet"], cached=True))
+    assert found["facets"]["products"]
+    assert len(log) == 0
@@ -0,0 +1,91 @@
+"""
+Plan-regression harness for the crud read queries.
+
+Each case runs a crud call against the seeded database and EXPLAINs the SELECTs
+it issued (see the `query_plans` fixture). A case fails when any of its plans
+scans a table sequentially, and when the tables and indexes its plans read
+differ from the snapshot in tests/plans/<case>.txt. The snapshot records how
+each table is reached, not the node types or join order, which the planner
+may change with the data. A missing snapshot fails the case; after an
+intended change, rerun with UPDATE_PLAN_SNAPSHOTS=1 to (re)write the
+snapshots and review their diff.
+"""
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+from app.models import crud
+
+
+SNAPSHOTS = Path(__file__).parent / "plans"
+UPDATE = os.environ.get("UPDATE_PLAN_SNAPSHOTS") == "1"
+
+CASES = {
+    "get_profile_detail": lambda db, seed: crud.get_profile(
+        db, seed["profiles"][0], detail=True
+    ),
+    "get_profile_by_user": lambda db, seed: crud.get_profile_by_user(
+        db, seed["users"][0]
+    ),
+    "get_product_detail": lambda db, seed: crud.get_product(
+        db, seed["products"][0], detail=True
+    ),
+    "delete_product_lookup": lambda db, seed: crud.delete_product(
+        db, str(uuid.uuid4()), seed["users"][0]
+    ),
+    "get_states": lambda db, seed: crud.get_states(db, seed["countries"][0]),
+    "search_suppliers_filtered": lambda db, seed: crud.search_suppliers(
+        db,
+        products=["pet", "hdpe"],
+        country_id=seed["states"][0][1],
+        state_id=seed["states"][0][0],
+        min_capacity=100,
+    ),
+    "search_suppliers_by_material": lambda db, seed: crud.search_suppliers(
+        db, products=["aluminium"]
+    ),
+}
+
+
+def plan_shape(plans) -> str:
+    """
+    Renders, per statement, one sorted line per table read and the index reading it.
+    """
+    lines = []
+    for number, nodes in enumerate(plans):
+        lines.append(f"statement {number}")
+        access = {
+            f"  {node['Relation Name']}: {node.get('Index Name', node['Node Type'])}"
+            for node in nodes
+            if node.get("Relation Name") and node["Node Type"] != "Bitmap Heap Scan"
+        }
+        lines.extend(sorted(access))
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_query_plan(query_plans, seed, case):
+    plans = query_plans(lambda db: CASES[case](db, seed))
+    assert plans, f"{case} ran no SELECT"
+
+    seq_scans = [
+        node["Relation Name"]
+        for nodes in plans
+        for node in nodes
+        if node["Node Type"] == "Seq Scan"
+    ]
+    assert not seq_scans, f"{case} scans {seq_scans} sequentially"
+
+    shape = plan_shape(plans)
+    snapshot = SNAPSHOTS / f"{case}.txt"
+    if UPDATE:
+        SNAPSHOTS.mkdir(exist_ok=True)
+        snapshot.write_text(shape)
+        return
+    assert snapshot.exists(), (
+        f"no plan snapshot for {case}; run with UPDATE_PLAN_SNAPSHOTS=1 and "
+        "commit tests/plans/"
+    )
+    assert shape == snapshot.read_text(), f"the plan of {case} changed"
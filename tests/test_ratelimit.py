@@ -0,0 +1,134 @@
+"""
+Sliding-window rate limits: the counters, Retry-After and the client address.
+"""
+import asyncio
+
+import pytest
+
+from app.core import ratelimit
+from app.core.ratelimit import (
+    RateLimiter,
+    RateLimitRule,
+    SlidingWindowCounter,
+    client_ip,
+    retry_after,
+)
+
+
+RULE = RateLimitRule("/limited", None, per_ip=5, per_email=5, window=60.0)
+# The start of a fixed window.
+START = 6000.0
+
+
+def check_at(monkeypatch, history, at):
+    """
+    Replays requests at the `history` times on a fresh in-process limiter, then
+    returns the check of one more request at `at`.
+    """
+    limiter = RateLimiter({RULE.path: RULE})
+    limiter.shared = None
+    result = None
+    for now in [*history, at]:
+        monkeypatch.setattr(ratelimit.time, "time", lambda now=now: now)
+        result = asyncio.run(limiter.check(RULE, "10.0.0.1", None))
+    return result
+
+
+@pytest.mark.parametrize(
+    "history",
+    [
+        # A burst inside one window.
+        [START + 10] * 6,
+        # A full previous window, then one more request early in the next.
+        [START + 50] * 5 + [START + 70],
+    ],
+)
+def test_a_retry_after_retry_after_is_allowed(monkeypatch, history):
+    limited = check_at(monkeypatch, history[:-1], history[-1])
+    assert limited is not None
+    kind, wait = limited
+    assert kind == "ip"
+
+    assert check_at(monkeypatch, history, history[-1] + wait) is None
+    # Retry-After is no longer than it has to be.
+    assert check_at(monkeypatch, history, history[-1] + wait - 1) is not None
+
+
+def test_retry_after_is_at_least_a_second():
+    assert retry_after(10, 0, 59.9, 5, 60.0) == 1
+
+
+def test_a_limit_of_one_waits_for_both_windows_to_empty():
+    assert retry_after(0, 2, 20, 1, 60.0) == 100
+
+
+def test_requests_are_counted_per_key():
+    counter = SlidingWindowCounter()
+
+    assert counter.hit("a", 60, START + 1) == (0, 1)
+    assert counter.hit("a", 60, START + 2) == (0, 2)
+    assert counter.hit("b", 60, START + 3) == (0, 1)
+
+
+def test_the_current_window_becomes_the_previous_one():
+    counter = SlidingWindowCounter()
+    counter.hit("a", 60, START + 1)
+    counter.hit("a", 60, START + 2)
+
+    assert counter.hit("a", 60, START + 61) == (2, 1)
+    # After a window without requests, nothing is carried over.
+    assert counter.hit("a", 60, START + 181) == (0, 1)
+
+
+def test_stale_keys_are_pruned_when_the_counter_is_full():
+    counter = SlidingWindowCounter(max_keys=2)
+    counter.hit("old", 60, START + 1)
+    counter.hit("recent", 60, START + 61)
+
+    counter.hit("new", 60, START + 121)
+
+    assert len(counter) == 2
+    assert counter.hit("recent", 60, START + 122) == (1, 1)
+    assert counter.hit("old", 60, START + 123) == (0, 1)
+
+
+def scope(*forwarded, peer="10.0.0.9"):
+    return {
+        "client": (peer, 50000),
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+    }
+
+
+def test_without_trusted_proxies_the_peer_is_the_client():
+    assert client_ip(scope("1.1.1.1"), 0) == "10.0.0.9"
+
+
+def test_the_entry_appended_by_the_trusted_proxy_is_the_client():
+    assert client_ip(scope("6.6.6.6, 1.1.1.1"), 1) == "1.1.1.1"
+
+
+def test_entries_are_read_across_headers_from_the_right():
+    assert client_ip(scope("6.6.6.6, 1.1.1.1", "10.0.0.2"), 2) == "1.1.1.1"
+
+
+def test_fewer_entries_than_trusted_hops_gives_the_leftmost():
+    assert client_ip(scope("1.1.1.1"), 2) == "1.1.1.1"
+
+
+def test_without_the_header_the_peer_is_the_client():
+    assert client_ip(scope(), 1) == "10.0.0.9"
+
+
+def test_login_failures_from_one_address_do_not_lock_out_another(monkeypatch):
+    login = ratelimit.RULES["/api/auths/login"]
+    limiter = RateLimiter(ratelimit.RULES)
+    limiter.shared = None
+    monkeypatch.setattr(ratelimit.time, "time", lambda: START + 1)
+
+    def attempt(ip):
+        return asyncio.run(limiter.check(login, ip, "owner@example.com"))
+
+    results = [attempt("6.6.6.6") for _ in range(login.per_email + 1)]
+
+    assert results[-1][0] == "email"
+    assert attempt("1.1.1.1") is None
@@ -0,0 +1,55 @@
+"""
+The payment reconciler brings stored statuses in line with the local gateway stub.
+"""
+import asyncio
+import datetime
+
+import httpx
+from sqlalchemy import select
+
+from app.models import models
+from app.paymentHandler import stub
+from app.paymentHandler.pepperest import PepperestClient, payment_reference
+from app.paymentHandler.reconcile import PaymentReconciler
+
+
+def test_a_run_applies_the_gateway_status(db, seed):
+    client = PepperestClient(
+        base_url="http://stub",
+        api_key="test",
+        backoff=0,
+        transport=httpx.ASGITransport(app=stub.app),
+    )
+    payment = models.Payment(
+        user_id=seed["users"][0],
+        cost=1000,
+        currency="NGN",
+        callback="http://localhost/callback",
+        description="10t PET",
+        name="Buyer",
+        email="buyer@example.com",
+        phone="+2348000000000",
+        status="pending",
+    )
+    today = datetime.date.today()
+
+    async def run():
+        try:
+            created = await client.create_payment(payment, today, today)
+            payment.reference = payment_reference(created)
+            db.add(payment)
+            db.commit()
+            stub.payments[payment.reference]["status"] = "completed"
+            return await PaymentReconciler(client=client, rate=1000).run_once()
+        finally:
+            await client.aclose()
+
+    stats = asyncio.run(run())
+
+    db.expire_all()
+    status = db.scalar(
+        select(models.Payment.status).where(models.Payment.id == payment.id)
+    )
+    assert status == "completed"
+    assert stats["full_sweep"]
+    assert stats["updated"] >= 1
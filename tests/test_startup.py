@@ -0,0 +1,44 @@
+"""
+Importing the app must stay cheap: no database work and no heavy optional modules.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Generous for a cold worker on a small instance; importing main takes about a
+# second on a developer machine.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "3.0"))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def import_main():
+    # Port 1 refuses connections, so an import that touched the database fails.
+    env = {**os.environ, "POSTGRES_HOSTNAME": "127.0.0.1", "DATABASE_PORT": "1"}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=Path(__file__).resolve().parents[1],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_importing_the_app_stays_within_budget():
+    probe = import_main()
+    assert probe["seconds"] < IMPORT_BUDGET_SECONDS
+    # Loaded on first use by the location populators.
+    assert "pycountry" not in probe["modules"]
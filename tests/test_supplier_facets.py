@@ -0,0 +1,67 @@
+"""
+The supplier facet counts match the profiles as they are created, edited and deleted.
+"""
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.models import crud, models, schemas
+
+
+def live_product_facets(db, **filters):
+    material = func.unnest(models.Profile.products).label("name")
+    where = [getattr(models.Profile, name) == value for name, value in filters.items()]
+    filtered = select(models.Profile.id, material).where(*where).subquery()
+    return dict(
+        db.execute(
+            select(filtered.c.name, func.count(filtered.c.id.distinct())).group_by(
+                filtered.c.name
+            )
+        ).all()
+    )
+
+
+def searched_product_facets(db, **filters):
+    found = asyncio.run(crud.search_suppliers(db, **filters))
+    return {row["name"]: row["count"] for row in found["facets"]["products"]}
+
+
+def test_the_counts_match_the_profiles(db, seed):
+    country_id = seed["countries"][0]
+    assert searched_product_facets(db) == live_product_facets(db)
+    assert searched_product_facets(db, country_id=country_id) == live_product_facets(
+        db, country_id=country_id
+    )
+
+
+def test_profile_writes_keep_the_counts(db, seed):
+    state_id, country_id = seed["states"][0]
+    user_id = seed["users"][-1]
+
+    created = asyncio.run(
+        crud.create_profile(
+            db,
+            schemas.ProfileBaseSchema(
+                user_id=user_id,
+                country_id=country_id,
+                state_id=state_id,
+                factory_capacity=10,
+                products=["glass"],
+            ),
+        )
+    )
+    assert searched_product_facets(db)["glass"] == 1
+
+    asyncio.run(
+        crud.edit_profile(
+            db,
+            user_id,
+            schemas.UpdateProfileSchema(id=created.id, products=["glass", "tin"]),
+        )
+    )
+    assert searched_product_facets(db)["tin"] == 1
+
+    asyncio.run(crud.delete_profile(db, created.id, user_id))
+    facets = searched_product_facets(db)
+    assert "glass" not in facets and "tin" not in facets
+    assert facets == live_product_facets(db)
@@ -0,0 +1,85 @@
+"""
+Benchmark: native uuid keys against the text keys they replaced.
+
+Builds a parent and a child table of each kind in temporary tables and compares
+the size of their key indexes and the latency of the parent-child join. The
+numbers are printed (run pytest with -s to see them); the test fails if the
+uuid indexes are not clearly smaller.
+"""
+import time
+
+from sqlalchemy import text
+
+PARENTS = 20000
+CHILDREN_PER_PARENT = 2
+JOIN_RUNS = 5
+
+
+def build(connection, kind: str, key_type: str):
+    connection.execute(
+        text(f"CREATE TEMP TABLE bench_{kind}_parent (id {key_type} PRIMARY KEY)")
+    )
+    connection.execute(
+        text(
+            f"CREATE TEMP TABLE bench_{kind}_child "
+            f"(id {key_type} PRIMARY KEY, parent_id {key_type} NOT NULL)"
+        )
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO bench_{kind}_parent "
+            f"SELECT gen_random_uuid()::{key_type} FROM generate_series(1, :n)"
+        ),
+        {"n": PARENTS},
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO bench_{kind}_child "
+            f"SELECT gen_random_uuid()::{key_type}, id FROM bench_{kind}_parent, "
+            f"generate_series(1, :n)"
+        ),
+        {"n": CHILDREN_PER_PARENT},
+    )
+    connection.execute(text(f"CREATE INDEX ON bench_{kind}_child (parent_id)"))
+    connection.execute(text(f"ANALYZE bench_{kind}_parent"))
+    connection.execute(text(f"ANALYZE bench_{kind}_child"))
+
+
+def index_bytes(connection, kind: str) -> int:
+    return connection.execute(
+        text(
+            "SELECT sum(pg_relation_size(indexrelid)) FROM pg_index "
+            "WHERE indrelid IN (CAST(:parent AS regclass), CAST(:child AS regclass))"
+        ),
+        {"parent": f"bench_{kind}_parent", "child": f"bench_{kind}_child"},
+    ).scalar()
+
+
+def join_seconds(connection, kind: str) -> float:
+    query = text(
+        f"SELECT count(*) FROM bench_{kind}_child c "
+        f"JOIN bench_{kind}_parent p ON p.id = c.parent_id"
+    )
+    best = float("inf")
+    for _ in range(JOIN_RUNS):
+        started = time.perf_counter()
+        assert connection.execute(query).scalar() == PARENTS * CHILDREN_PER_PARENT
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def test_uuid_keys_are_smaller_than_text_keys(engine):
+    with engine.connect() as connection:
+        build(connection, "text", "varchar")
+        build(connection, "uuid", "uuid")
+        sizes = {kind: index_bytes(connection, kind) for kind in ("text", "uuid")}
+        joins = {kind: join_seconds(connection, kind) for kind in ("text", "uuid")}
+        connection.rollback()
+
+    print(
+        f"\n{PARENTS} parents, {PARENTS * CHILDREN_PER_PARENT} children: "
+        f"key indexes text {sizes['text'] / 1024:.0f} KiB, "
+        f"uuid {sizes['uuid'] / 1024:.0f} KiB; "
+        f"join text {joins['text'] * 1000:.1f} ms, uuid {joins['uuid'] * 1000:.1f} ms"
+    )
+    assert sizes["uuid"] < 0.75 * sizes["text"]
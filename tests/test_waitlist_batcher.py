@@ -0,0 +1,143 @@
+"""
+The waitlist batcher isolates rejected rows instead of dropping whole batches.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DataError, OperationalError
+
+from app.core import waitlist_batcher as batcher_module
+from app.core.waitlist_batcher import WaitlistBatcher, WaitlistQueueFull
+from app.models import schemas
+
+
+class Row:
+    def __init__(self, row):
+        self.workemail = row["workemail"]
+        self.lastname = row["lastname"]
+
+
+class FakeDatabase:
+    """
+    Stands in for WaitlistBatcher._insert: rejects any statement containing a bad email.
+    """
+
+    def __init__(self, bad=(), down=False):
+        self.bad = set(bad)
+        self.down = down
+        self.statements = 0
+        self.rows = []
+
+    def insert(self, batch):
+        self.statements += 1
+        if self.down:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row["workemail"] in self.bad for row in batch):
+            raise DataError("INSERT", {}, Exception("value too long"))
+        self.rows.extend(batch)
+        return [Row(row) for row in batch]
+
+
+@pytest.fixture(autouse=True)
+def no_mail(monkeypatch):
+    sent = []
+
+    class Email:
+        def __init__(self, user, email):
+            self.email = email
+
+        async def sendWaitlistEmail(self):
+            sent.extend(self.email)
+
+    monkeypatch.setattr(batcher_module, "Email", Email)
+    monkeypatch.setattr(batcher_module.waitlist_emails, "add", lambda email: None)
+    return sent
+
+
+def make_batcher(database, **kwargs):
+    batcher = WaitlistBatcher(**kwargs)
+    batcher._insert = database.insert
+    return batcher
+
+
+def signup(number):
+    return schemas.WaitlistBaseSchema(
+        workemail=f"waiter{number}@example.com",
+        firstname="Wait",
+        lastname="List",
+        country_id="country",
+        state_id="state",
+    )
+
+
+def test_names_are_limited_to_the_column_length():
+    with pytest.raises(ValueError):
+        schemas.WaitlistBaseSchema(
+            workemail="waiter@example.com",
+            firstname="x" * 256,
+            lastname="List",
+            country_id="country",
+            state_id="state",
+        )
+
+
+def test_a_rejected_row_is_dropped_alone(no_mail):
+    database = FakeDatabase(bad={"waiter13@example.com"})
+    batcher = make_batcher(database)
+
+    async def run():
+        for number in range(64):
+            batcher.submit(signup(number))
+        await batcher.flush()
+        await asyncio.gather(*batcher._mail_tasks)
+
+    asyncio.run(run())
+    assert len(database.rows) == 63
+    assert "waiter13@example.com" not in {row["workemail"] for row in database.rows}
+    assert len(no_mail) == 63
+    assert not batcher._pending
+    # Bisection costs a logarithmic number of statements, not one per row.
+    assert database.statements < 20
+
+
+def test_an_unreachable_database_requeues_the_batch():
+    database = FakeDatabase(down=True)
+    batcher = make_batcher(database)
+
+    async def run():
+        for number in range(10):
+            batcher.submit(signup(number))
+        with pytest.raises(OperationalError):
+            await batcher.flush()
+
+    asyncio.run(run())
+    assert database.statements == 1
+    assert len(batcher._pending) == 10
+
+
+def test_a_full_queue_refuses_signups():
+    batcher = make_batcher(FakeDatabase(), max_pending=2)
+    batcher.submit(signup(0))
+    batcher.submit(signup(1))
+    with pytest.raises(WaitlistQueueFull):
+        batcher.submit(signup(2))
+
+
+def test_the_route_answers_503_when_the_queue_is_full(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.core.config import settings
+    from app.routers import waitlist
+    from main import app
+
+    full = make_batcher(FakeDatabase(), max_pending=0)
+    monkeypatch.setattr(waitlist, "waitlist_batcher", full)
+    monkeypatch.setattr(
+        waitlist.reference_cache, "is_valid_location", lambda db, **ids: True
+    )
+    monkeypatch.setattr(waitlist.waitlist_emails, "might_exist", lambda email: False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+    response = TestClient(app).post("/api/waitlists/waitlist", json=signup(0).dict())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
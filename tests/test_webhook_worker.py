@@ -0,0 +1,83 @@
+"""
+The webhook worker never leaves a final status and backs off unmatched references.
+"""
+import datetime
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app.models import models
+from app.paymentHandler.webhooks import WebhookWorker, _target_status
+
+
+def events(*statuses):
+    return [SimpleNamespace(status=status) for status in statuses]
+
+
+def test_the_last_status_is_applied():
+    assert _target_status(events("pending", "paid")) == "paid"
+
+
+def test_a_final_status_wins_over_a_later_one():
+    assert _target_status(events("pending", "completed", "pending")) == "completed"
+
+
+def store_payment(db, seed, status):
+    reference = uuid.uuid4().hex
+    db.add(
+        models.Payment(
+            user_id=seed["users"][0],
+            cost=1000,
+            currency="NGN",
+            callback="http://localhost/callback",
+            description="10t PET",
+            name="Buyer",
+            email="buyer@example.com",
+            phone="+2348000000000",
+            reference=reference,
+            status=status,
+        )
+    )
+    db.commit()
+    return reference
+
+
+def queue_webhook(db, reference, status):
+    webhook = models.PaymentWebhook(
+        event_id=uuid.uuid4().hex, reference=reference, status=status, payload="{}"
+    )
+    db.add(webhook)
+    db.commit()
+    return webhook.id
+
+
+def test_a_final_payment_keeps_its_status(db, seed):
+    reference = store_payment(db, seed, "completed")
+    webhook_id = queue_webhook(db, reference, "pending")
+
+    WebhookWorker().process_batch()
+
+    db.expire_all()
+    payment_status = db.scalar(
+        select(models.Payment.status).where(models.Payment.reference == reference)
+    )
+    assert payment_status == "completed"
+    assert db.get(models.PaymentWebhook, webhook_id).processedat is not None
+
+
+def test_an_unmatched_reference_is_backed_off(db, seed):
+    webhook_id = queue_webhook(db, uuid.uuid4().hex, "pending")
+    worker = WebhookWorker(poll_interval=60)
+
+    worker.process_batch()
+    db.expire_all()
+    webhook = db.get(models.PaymentWebhook, webhook_id)
+    assert webhook.processedat is None
+    next_attempt = webhook.nextattemptat
+    assert next_attempt > datetime.datetime.now(datetime.timezone.utc)
+
+    # Not picked up again before its next attempt.
+    worker.process_batch()
+    db.expire_all()
+    assert db.get(models.PaymentWebhook, webhook_id).nextattemptat == next_attempt